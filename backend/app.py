@@ -1,19 +1,32 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Blueprint, Flask, Response, current_app, g, request, stream_with_context
 from flask_cors import CORS
+from werkzeug.local import LocalProxy
 import json 
+import time
 import traceback
+import contextvars
+import hmac
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 import os
 
 #import modular components
-from services.database_service import DatabaseService
-from models.user import UserProfile
-from models.nutrition import DietaryPattern
-from services.nutrition_service import NutritionService
-from services.risk_assessment_service import RiskAssessmentService
-from services.disease_prediction_service import DiseasePredictionService
+from services.container import ServiceContainer
+from services.errors import SessionNotFoundError
+from config.settings import STREAM_CONFIG, JOB_CONFIG, HTTP_CACHE_CONFIG, ADMIN_CONFIG, RESULT_CACHE_CONFIG, STATIC_CONFIG
 from utils.validators import InputValidator
+from utils.http_cache import nutrition_etag, representation_etag, etag_matches
+from utils.serialization import encode_response, negotiate_media_type
+from utils.metrics import METRICS, REQUEST_SECONDS, service_metrics, stats_summary
+from utils.tracing import begin_request_trace, end_request_trace, is_debug_request, with_debug_trace
+from utils.profiler import PROFILES
+from utils.static_assets import AssetBundle
+from utils.admission import RATE_LIMITER, CONCURRENCY, is_exempt, admission_metrics
+from utils.api_payloads import (
+    parse_user_profile, parse_lifestyle_request, requested_foods, nutrition_payload, food_result_payload, lifestyle_payload,
+    STREAM_FORMATS, stream_format, stream_event, food_result_event, analysis_summary
+)
 
 
 BASE_DIR = Path(__file__).parent
@@ -21,34 +34,8 @@ BASE_DIR = Path(__file__).parent
 TEMPLATE_DIR = BASE_DIR.parent / 'frontend' / 'templates'
 STATIC_DIR = BASE_DIR.parent / 'frontend' / 'static'
 
-# Create folders if they don't exist
-TEMPLATE_DIR.mkdir(parents=True, exist_ok=True)
-STATIC_DIR.mkdir(parents=True, exist_ok=True)
-
-# Verify CSS and JS subdirectories exist
-(STATIC_DIR / 'css').mkdir(exist_ok=True)
-(STATIC_DIR / 'js').mkdir(exist_ok=True)
-
-app = Flask(__name__, template_folder=str(TEMPLATE_DIR), static_folder=str(STATIC_DIR))
-CORS(app)
-
-#Initialize services
-db_service = DatabaseService()
-nutrition_service = NutritionService(db_service)
-risk_service = RiskAssessmentService(db_service)
-disease_service = DiseasePredictionService(nutrition_service, db_service)
-
-#API Routs
-
-@app.route('/')
-def index():
-    """ Serve the main HTML interface """
-    try: 
-        with open(TEMPLATE_DIR/'index.html', 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
-        return render_template_string("""
-        <!DOCTYPE html>
+# Served at / when the frontend template is missing
+FALLBACK_INDEX_HTML = """<!DOCTYPE html>
         <html>
         <head>
             <title>Food Health App</title>
@@ -72,257 +59,540 @@ def index():
             </div>
         </body>
         </html>
-        """)
-@app.route('/api/health', methods=['GET'])
+"""
+
+api = Blueprint('api', __name__)
+
+def current_services() -> ServiceContainer:
+    """ Service container of the current app """
+    return current_app.extensions['services']
+
+# Services of the current app, built on first use in each process
+nutrition_service = LocalProxy(lambda: current_services().nutrition_service)
+risk_service = LocalProxy(lambda: current_services().risk_service)
+disease_service = LocalProxy(lambda: current_services().disease_service)
+diet_optimizer_service = LocalProxy(lambda: current_services().diet_optimizer_service)
+session_service = LocalProxy(lambda: current_services().session_service)
+job_service = LocalProxy(lambda: current_services().job_service)
+
+def api_response(payload, status=200, etag=None, cache_control=None, hash_body=False):
+    """ Payload as JSON or MessagePack (Accept), compressed when large (Accept-Encoding).
+
+    With an etag (or hash_body) the response carries a per-representation ETag and a
+    matching If-None-Match is answered with 304.
+    """
+    body, headers = encode_response(with_debug_trace(payload), request.headers.get('Accept'),
+                                    request.headers.get('Accept-Encoding'), etag, hash_body)
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    if 'ETag' in headers and etag_matches(request.headers.get('If-None-Match'), headers['ETag']):
+        return not_modified(headers['ETag'], cache_control)
+    return Response(body, status=status, headers=headers)
+
+def cached_response(result_cache, entry):
+    """ A result cache hit, encoded once per Accept/Accept-Encoding pair (debug requests get a fresh trace) """
+    if is_debug_request(request.args.get('debug'), request.headers.get('X-Debug-Trace')):
+        response = api_response(entry.payload)
+    else:
+        body, headers = result_cache.encoded(entry, request.headers.get('Accept'), request.headers.get('Accept-Encoding'))
+        response = Response(body, headers=headers)
+    response.headers['X-Result-Cache'] = 'hit'
+    return response
+
+def not_modified(etag, cache_control=None):
+    """ Empty 304 response repeating the validator and caching policy """
+    headers = {'ETag': etag, 'Vary': 'Accept, Accept-Encoding'}
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    return Response(status=304, headers=headers)
+
+#API Routs
+
+@api.route('/')
+def index():
+    """ Serve the main HTML interface from memory """
+    assets = current_app.extensions['assets']
+    assets.ensure_loaded()
+    assets.reload_if_changed()
+    return asset_response(assets.index, STATIC_CONFIG['index_cache_control'])
+
+@api.route(STATIC_CONFIG['url_prefix'] + '/<path:filename>')
+def static_file(filename):
+    """ Serve a static file from memory; content-hashed URLs are cached as immutable """
+    assets = current_app.extensions['assets']
+    assets.ensure_loaded()
+    assets.reload_if_changed()
+    asset, hashed = assets.get(filename)
+    if asset is None:
+        return api_response({'error': 'Not found'}), 404
+    return asset_response(asset, STATIC_CONFIG['hashed_cache_control' if hashed else 'plain_cache_control'])
+
+def asset_response(asset, cache_control):
+    """ Precompressed body for the request's Accept-Encoding, or 304 when the client has it """
+    body, coding, etag = asset.variant(request.headers.get('Accept-Encoding'))
+    headers = {'ETag': etag, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status=304, headers=headers)
+    if coding:
+        headers['Content-Encoding'] = coding
+    return Response(body, content_type=asset.content_type, headers=headers)
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """ Check API health """
-    return jsonify({
+    return api_response({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'message': 'Food Health API is running'})
 
-@app.route('/api/analyze-foods', methods=['POST'])
+@api.route('/api/analyze-foods', methods=['POST'])
 def analyze_foods_api():
     """ Analyze food items for nutritional information and risk assessment """
     try:
         data = request.get_json()
 
         if not data or 'foods' not in data:
-            return jsonify({'error': 'Missing food parameter'}), 400
+            return api_response({'error': 'Missing food parameter'}), 400
         
         is_valid, error_msg, cleaned_foods = InputValidator.validate_food_list(data['foods'])
         if not is_valid:
-            return jsonify({'error': f'Validation error: {error_msg}'}), 400
+            return api_response({'error': f'Validation error: {error_msg}'}), 400
 
         if not cleaned_foods:
-            return jsonify({'error': 'No foods provided'}), 400
+            return api_response({'error': 'No foods provided'}), 400
+
+        fmt = stream_format(request.headers.get('Accept'), request.args.get('stream'))
+        if fmt:
+            return stream_food_analysis(cleaned_foods, fmt)
         
+        # Identical analyses are answered from the result cache
+        result_cache = current_services().result_cache
+        if result_cache.enabled:
+            cache_key = result_cache.key('analyze-foods', cleaned_foods)
+            cached = result_cache.get('analyze-foods', cache_key)
+            if cached:
+                if RESULT_CACHE_CONFIG['persist_on_hit']:
+                    for risk_assessment in cached.records:
+                        risk_service.db_service.save_risk_assessment(risk_assessment)
+                return cached_response(result_cache, cached)
+            generation = result_cache.generation()
+
         results = []
+        risk_assessments = []
+        risky_categories = set()
 
         for food_name in cleaned_foods:
             #get nutrition information
             nutrition_info = nutrition_service.get_food_nutrition(food_name)
-            if nutrition_info:
-                risk_assessment = risk_service.calculate_risk_score(nutrition_info)
-                results.append({
-                    'food_name': food_name,
-                    'nutrition': {
-                        'name': nutrition_info.food_name,
-                        'calories_per_100g': float(nutrition_info.calories_per_100g),
-                        'sugar_g': float(nutrition_info.sugar_g),
-                        'saturated_fat_g': float(nutrition_info.saturated_fat_g),
-                        'sodium_mg': float(nutrition_info.sodium_mg),
-                        'category': nutrition_info.category,
-                        'source': nutrition_info.source
-                    },
-                    'risk_assessment': {
-                        'risk_score': risk_assessment.risk_score,
-                        'is_risky': risk_assessment.is_risky,
-                        'risk_factors': risk_assessment.risk_factors,
-                        'alternatives': risk_assessment.alternatives
-                    }
-                })
-            else:
-                results.append({
-                    'food_name': food_name,
-                    'nutrition': None,
-                    'risk_assessment': None,
-                    'error': 'Nutrition info not found'})
-
-        return jsonify({
+            risk_assessment = risk_service.calculate_risk_score(nutrition_info) if nutrition_info else None
+            results.append(food_result_payload(food_name, nutrition_info, risk_assessment))
+            if risk_assessment:
+                risk_assessments.append(risk_assessment)
+                if risk_assessment.is_risky:
+                    # Alternatives come from the catalog of the food's category
+                    risky_categories.add(nutrition_info.category)
+
+        payload = {
             'success': True,
             'results': results,
-            'analyzed_at': datetime.now().isoformat()})
+            'analyzed_at': datetime.now().isoformat()}
+        if result_cache.enabled:
+            result_cache.put(cache_key, generation, payload, risk_assessments,
+                             cleaned_foods + [risk_assessment.food_name for risk_assessment in risk_assessments],
+                             risky_categories)
+        return api_response(payload)
 
     except Exception as e:
-        return jsonify({
+        return api_response({
             'success': False,
             'error': str(e),
             'traceback': traceback.format_exc()}), 500
-@app.route('/api/lifestyle-assessment', methods=['POST'])
+
+def stream_food_analysis(foods, fmt):
+    """ Stream each food's result as soon as its lookup finishes, then a summary event """
+    positions = {}
+    for index, food_name in enumerate(foods):
+        positions.setdefault(food_name, []).append(index)
+
+    def generate():
+        results = []
+        executor = ThreadPoolExecutor(max_workers=STREAM_CONFIG['lookup_workers'])
+        try:
+            # Each lookup runs in a copy of the request context so its spans join the request trace;
+            # pool threads must never fall back to prompting on the server's stdin
+            futures = {executor.submit(contextvars.copy_context().run, nutrition_service.get_food_nutrition, food_name,
+                                       interactive=False): food_name for food_name in positions}
+            for future in as_completed(futures):
+                food_name = futures[future]
+                nutrition_info = future.result()
+                risk_assessment = risk_service.calculate_risk_score(nutrition_info) if nutrition_info else None
+                for index in positions[food_name]:
+                    event = food_result_event(index, food_name, nutrition_info, risk_assessment)
+                    results.append(event)
+                    yield stream_event(fmt, 'result', event)
+            yield stream_event(fmt, 'summary', analysis_summary(results))
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-stream
+            yield stream_event(fmt, 'error', {'success': False, 'error': str(e)})
+        finally:
+            # Stop queued lookups if the client went away
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(stream_with_context(generate()), mimetype=STREAM_FORMATS[fmt],
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@api.route('/api/lifestyle-assessment', methods=['POST'])
 def lifestyle_assessent_api():
     """Perform lifestyle disease risk assessment"""
     try:
         data = request.get_json()
         
-        # Validate user profile data
-        is_valid, error_msg = InputValidator.validate_user_profile_data(data)
-        if not is_valid:
-            return jsonify({'error': f'Profile validation error: {error_msg}'}), 400
+        user_profile, dietary_pattern, error = parse_lifestyle_request(data)
+        if error:
+            return api_response({'error': error}), 400
         
-        # Validate dietary pattern data
-        is_valid, error_msg = InputValidator.validate_dietary_pattern_data(data)
+        # Optional Monte Carlo confidence intervals
+        is_valid, error_msg, uncertainty_draws = InputValidator.validate_uncertainty_option(data.get('uncertainty'))
         if not is_valid:
-            return jsonify({'error': f'Dietary validation error: {error_msg}'}), 400
+            return api_response({'error': f'Uncertainty validation error: {error_msg}'}), 400
         
-        # Validate family history and current conditions
-        family_history = data.get('family_history', [])
-        is_valid, error_msg, clean_family_history = InputValidator.validate_health_conditions(family_history)
-        if not is_valid:
-            return jsonify({'error': f'Family history validation error: {error_msg}'}), 400
+        # Identical assessments are answered from the result cache (Monte Carlo draws are never reused)
+        result_cache = current_services().result_cache
+        cacheable = result_cache.enabled and not uncertainty_draws
+        if cacheable:
+            cache_key = result_cache.key('lifestyle-assessment', [user_profile, dietary_pattern])
+            cached = result_cache.get('lifestyle-assessment', cache_key)
+            if cached:
+                if RESULT_CACHE_CONFIG['persist_on_hit']:
+                    disease_service.save_assessment(cached.records)
+                return cached_response(result_cache, cached)
+            generation = result_cache.generation()
+        
+        # Perform assessment (resolves each unique food once and carries the computed intake)
+        resolved = disease_service.resolve_foods(dietary_pattern.daily_foods)
+        assessment = disease_service.assess_lifestyle_disease_risk(user_profile, dietary_pattern, uncertainty_draws,
+                                                                   resolved=resolved)
         
-        current_conditions = data.get('current_conditions', [])
-        is_valid, error_msg, clean_current_conditions = InputValidator.validate_health_conditions(current_conditions)
+        payload = lifestyle_payload(assessment)
+        if cacheable:
+            result_cache.put(cache_key, generation, payload, assessment, dietary_pattern.daily_foods
+                             + [info.food_name for info in resolved.values() if info])
+        return api_response(payload)
+        
+    except ValueError as e:
+        return api_response({
+            'success': False,
+            'error': f'Data validation error: {str(e)}'
+        }), 400
+    except Exception as e:
+        return api_response({
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@api.route('/api/assessment-sessions', methods=['POST'])
+def create_assessment_session():
+    """Start an incremental assessment session, optionally seeded with intake entries"""
+    try:
+        data = request.get_json() or {}
+        
+        user_profile, error = parse_user_profile(data)
+        if error:
+            return api_response({'error': error}), 400
+        
+        is_valid, error_msg, days_tracked, meal_frequency = InputValidator.validate_session_options(data)
         if not is_valid:
-            return jsonify({'error': f'Current conditions validation error: {error_msg}'}), 400
+            return api_response({'error': f'Session validation error: {error_msg}'}), 400
+        
+        entries = []
+        for entry in data.get('entries', []):
+            is_valid, error_msg, food, portion = InputValidator.validate_intake_entry(entry)
+            if not is_valid:
+                return api_response({'error': f'Intake validation error: {error_msg}'}), 400
+            entries.append((food, portion))
         
-        # Create user profile
-        user_profile = UserProfile(
-            age=int(data['age']),
-            gender=data['gender'],
-            weight_kg=float(data['weight']),
-            height_cm=float(data['height']),
-            activity_level=data['activity_level'],
-            family_history=data.get('family_history', []),
-            current_conditions=data.get('current_conditions', [])
-        )
+        session = session_service.create_session(user_profile, days_tracked, meal_frequency)
+        for food, portion in entries:
+            session_service.add_intake(session.session_id, food, portion)
         
-        # Process and validate dietary pattern data
-        is_valid, error_msg, cleaned_foods = InputValidator.validate_food_list(data['daily_foods'])
+        result = session_service.get_result(session.session_id, include_entries=True)
+        result['success'] = True
+        return api_response(result), 201
+        
+    except Exception as e:
+        return api_response({
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@api.route('/api/assessment-sessions/<session_id>', methods=['GET'])
+def get_assessment_session(session_id):
+    """Current assessment and intake entries of a session"""
+    try:
+        result = session_service.get_result(session_id, include_entries=True)
+        result['success'] = True
+        return api_response(result)
+    except SessionNotFoundError:
+        return api_response({'error': 'Session not found or expired'}), 404
+
+@api.route('/api/assessment-sessions/<session_id>', methods=['DELETE'])
+def delete_assessment_session(session_id):
+    """End a session"""
+    if not session_service.delete_session(session_id):
+        return api_response({'error': 'Session not found or expired'}), 404
+    return api_response({'success': True})
+
+@api.route('/api/assessment-sessions/<session_id>/intake', methods=['POST'])
+def add_session_intake(session_id):
+    """Add one food entry to a session and return the updated assessment"""
+    try:
+        is_valid, error_msg, food, portion = InputValidator.validate_intake_entry(request.get_json())
         if not is_valid:
-            return jsonify({'error': f'Foods validation error: {error_msg}'}), 400
+            return api_response({'error': f'Intake validation error: {error_msg}'}), 400
         
-        portion_sizes = data['portion_sizes']
-        if isinstance(portion_sizes, str):
-            try:
-                portion_sizes = [float(p.strip()) for p in portion_sizes.split(',') if p.strip()]
-            except ValueError:
-                return jsonify({'error': 'Invalid portion sizes format'}), 400
-        elif isinstance(portion_sizes, list):
-            try:
-                portion_sizes = [float(p) for p in portion_sizes]
-            except (ValueError, TypeError):
-                return jsonify({'error': 'Invalid portion sizes values'}), 400
-        # Ensure foods and portions match in length
-        if len(cleaned_foods) != len(portion_sizes):
-            # If lengths don't match, pad with default values or truncate
-            min_length = min(len(cleaned_foods), len(portion_sizes))
-            if min_length == 0:
-                return jsonify({'error': 'No valid foods or portion sizes provided'}), 400
-            
-            cleaned_foods = cleaned_foods[:min_length]
-            portion_sizes = portion_sizes[:min_length]
+        entry_id = session_service.add_intake(session_id, food, portion)
+        if entry_id is None:
+            return api_response({'error': 'Session has reached its entry limit'}), 400
         
-        # Remove any foods with zero or negative portion sizes
-        valid_pairs = [(food, portion) for food, portion in zip(cleaned_foods, portion_sizes) 
-                      if portion > 0 and food.strip()]
+        result = session_service.get_result(session_id)
+        result.update({'success': True, 'entry_id': entry_id})
+        return api_response(result)
         
-        if not valid_pairs:
-            return jsonify({'error': 'No valid food and portion size pairs found'}), 400
+    except SessionNotFoundError:
+        return api_response({'error': 'Session not found or expired'}), 404
+    except Exception as e:
+        return api_response({
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@api.route('/api/assessment-sessions/<session_id>/intake/<entry_id>', methods=['DELETE'])
+def remove_session_intake(session_id, entry_id):
+    """Remove one food entry from a session and return the updated assessment"""
+    try:
+        if not session_service.remove_intake(session_id, entry_id):
+            return api_response({'error': 'Intake entry not found'}), 404
         
-        cleaned_foods, portion_sizes = zip(*valid_pairs)
-        cleaned_foods = list(cleaned_foods)
-        portion_sizes = list(portion_sizes)
+        result = session_service.get_result(session_id)
+        result['success'] = True
+        return api_response(result)
         
-        # Create dietary pattern using the DietaryPattern model structure
-        dietary_pattern = DietaryPattern(
-            daily_foods=cleaned_foods,
-            portion_sizes_g=portion_sizes,
-            meal_frequency=data.get('meal_frequency', 3),
-            days_tracked=data.get('days_tracked', 1)
-        )
+    except SessionNotFoundError:
+        return api_response({'error': 'Session not found or expired'}), 404
+
+@api.route('/api/optimize-diet', methods=['POST'])
+def optimize_diet_api():
+    """Suggest the fewest food swaps or portion changes that lower each disease to a target risk level"""
+    try:
+        data = request.get_json()
         
-        # Perform assessment
-        assessment = disease_service.assess_lifestyle_disease_risk(user_profile, dietary_pattern)
-
-        maintenance_calories = disease_service.health_calculator.calculate_daily_maintenance_calories(
-            assessment.user_profile
-        ) 
-        # Analyze dietary intake
-        dietary_analysis = disease_service.analyze_dietary_intake(dietary_pattern)
+        user_profile, dietary_pattern, error = parse_lifestyle_request(data)
+        if error:
+            return api_response({'error': error}), 400
         
-        # Format results with proper error handling
-        result = {
-            'success': True,
-            'user_profile': {
-                'age': assessment.user_profile.age,
-                'gender': assessment.user_profile.gender,
-                'weight_kg': assessment.user_profile.weight_kg,
-                'height_cm': assessment.user_profile.height_cm,
-                'activity_level': assessment.user_profile.activity_level,
-                'family_history': assessment.user_profile.family_history,
-                'current_conditions': assessment.user_profile.current_conditions,
-                'maintenance_calories': maintenance_calories
-            },
-            'dietary_pattern': {
-                'daily_foods': dietary_pattern.daily_foods,
-                'portion_sizes_g': dietary_pattern.portion_sizes_g,
-                'meal_frequency': dietary_pattern.meal_frequency,
-                'days_tracked': dietary_pattern.days_tracked,
-                'total_foods_analyzed': len(dietary_pattern.daily_foods)
-            },
-            'dietary_analysis': {
-                'calories': dietary_analysis.get('calories', 0),
-                'sugar_g': dietary_analysis.get('sugar_g', 0),
-                'saturated_fat_g': dietary_analysis.get('saturated_fat_g', 0),
-                'sodium_mg': dietary_analysis.get('sodium_mg', 0)
-            },
-            'disease_risks': [
-                {
-                    'disease_name': risk.disease_name,
-                    'risk_percentage': risk.risk_percentage,
-                    'risk_level': risk.risk_level,
-                    'contributing_factors': risk.contributing_factors,
-                    'recommendations': risk.recommendations
-                }
-                for risk in assessment.disease_risks
-            ],
-            'overall_risk_score': assessment.overall_risk_score,
-            'key_dietary_factors': assessment.key_dietary_factors,
-            'intervention_priority': assessment.intervention_priority,
-            'assessed_at': datetime.now().isoformat()
-        }
+        is_valid, error_msg, target_level, max_changes = InputValidator.validate_optimizer_options(data)
+        if not is_valid:
+            return api_response({'error': f'Optimizer validation error: {error_msg}'}), 400
         
-        return jsonify(result)
+        result = diet_optimizer_service.optimize_diet(user_profile, dietary_pattern, target_level, max_changes)
+        result['success'] = True
+        result['optimized_at'] = datetime.now().isoformat()
+        return api_response(result)
         
-    except ValueError as e:
-        return jsonify({
+    except Exception as e:
+        return api_response({
             'success': False,
-            'error': f'Data validation error: {str(e)}'
-        }), 400
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@api.route('/api/cohort-assessment', methods=['POST'])
+def cohort_assessment_api():
+    """Score lifestyle disease risk for a cohort of profiles given as columns"""
+    try:
+        data = request.get_json()
+
+        is_valid, error_msg, profiles, intake = InputValidator.validate_cohort_data(data)
+        if not is_valid:
+            return api_response({'error': f'Cohort validation error: {error_msg}'}), 400
+
+        results = disease_service.assess_cohort(profiles, intake)
+
+        return api_response({
+            'success': True,
+            'count': len(profiles['age']),
+            'results': results,
+            'assessed_at': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        return api_response({
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@api.before_app_request
+def start_request_timer():
+    """Note when the request started, for the latency histogram, and trace it if sampled"""
+    g.request_started = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.trace = begin_request_trace(
+        f'{request.method} {route}', request.headers.get('traceparent'),
+        is_debug_request(request.args.get('debug'), request.headers.get('X-Debug-Trace')),
+        **{'http.method': request.method, 'http.route': route})
+
+@api.before_app_request
+def admit_request():
+    """Charge the client's token bucket and take a concurrency slot, or turn the request away with Retry-After"""
+    if is_exempt(request.path, request.method):
+        return None
+    services = current_services()
+    cache = services.nutrition_service.cache if services.is_built('nutrition_service') else None
+    foods = requested_foods(request.get_json(silent=True), (request.view_args or {}).get('food_name'))
+    client = RATE_LIMITER.client_id(request.headers.get('X-API-Key'), request.remote_addr,
+                                    request.headers.get('X-Forwarded-For'))
+    rejection, g.rate_limit_remaining = RATE_LIMITER.check(client, RATE_LIMITER.request_cost(foods, cache))
+    if rejection is None:
+        # Tokens stay spent if the request is then shed, so overload does not invite instant retries
+        rejection = CONCURRENCY.acquire()
+        g.admission_slot = rejection is None
+    if rejection is not None:
+        return api_response({'success': False, 'error': rejection.error, 'retry_after': rejection.retry_after}), \
+            rejection.status, {'Retry-After': str(rejection.retry_after)}
+
+@api.teardown_app_request
+def release_admission_slot(error=None):
+    """Free the request's concurrency slot once the response (including a streamed body) is done"""
+    if g.pop('admission_slot', False):
+        CONCURRENCY.release()
+
+@api.after_app_request
+def record_request_latency(response):
+    """Observe the request latency under its route pattern and add Server-Timing (streams: time to the first byte)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(elapsed, route, request.method, str(response.status_code))
+        trace = g.get('trace')
+        if trace is not None:
+            response.headers['Server-Timing'] = trace.server_timing()
+            response.headers['X-Trace-Id'] = trace.trace_id
+        else:
+            response.headers['Server-Timing'] = f'total;dur={elapsed * 1000:.2f}'
+    remaining = g.pop('rate_limit_remaining', None)
+    if remaining is not None:
+        response.headers['X-RateLimit-Remaining'] = str(int(remaining))
+    g.status_code = response.status_code
+    return response
+
+@api.teardown_app_request
+def finish_request_trace(error=None):
+    """Close the request's trace once the response (including a streamed body) is done"""
+    end_request_trace(g.pop('trace', None), g.get('status_code', 500 if error else None))
+
+@api.before_app_request
+def start_job_workers():
+    """Start the batch job workers in the serving process, which also resumes interrupted jobs"""
+    if current_app.config['START_JOB_WORKERS']:
+        job_service.start()
+
+@api.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue a food analysis or lifestyle assessment too large for a single request"""
+    try:
+        data = request.get_json()
+
+        is_valid, error_msg, job_type = InputValidator.validate_job_request(data)
+        if not is_valid:
+            return api_response({'error': f'Job validation error: {error_msg}'}), 400
+
+        if job_type == 'foods':
+            is_valid, error_msg, foods = InputValidator.validate_food_list(data['foods'], JOB_CONFIG['max_items'])
+            if not is_valid:
+                return api_response({'error': f'Validation error: {error_msg}'}), 400
+            payload = {'foods': foods}
+        else:
+            _, dietary_pattern, error = parse_lifestyle_request(data, JOB_CONFIG['max_items'], JOB_CONFIG['max_days'])
+            if error:
+                return api_response({'error': error}), 400
+            is_valid, error_msg, _ = InputValidator.validate_uncertainty_option(data.get('uncertainty'))
+            if not is_valid:
+                return api_response({'error': f'Uncertainty validation error: {error_msg}'}), 400
+            foods = dietary_pattern.daily_foods
+            payload = data
+
+        job_id = job_service.submit(job_type, payload, foods)
+        if job_id is None:
+            return api_response({'success': False, 'error': 'Job queue database is unavailable'}), 503
+
+        return api_response({
+            'success': True,
+            'job_id': job_id,
+            'status': 'queued',
+            'total_items': len(set(foods)),
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
+
     except Exception as e:
-        return jsonify({
+        return api_response({
             'success': False,
             'error': str(e),
             'traceback': traceback.format_exc()
         }), 500
 
-@app.route('/api/get-food-info/<food_name>', methods=['GET'])
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Progress of a batch job, and its result once completed (omit with ?include_result=false)"""
+    include_result = request.args.get('include_result', 'true').lower() not in ('0', 'false', 'no')
+    status = job_service.get_status(job_id, include_result)
+    if status is None:
+        return api_response({'error': 'Job not found'}), 404
+    status['success'] = True
+    return api_response(status)
+
+@api.route('/api/get-food-info/<food_name>', methods=['GET'])
 def get_food_info(food_name):
     """Get nutrition information for a specific food"""
     try:
         is_valid, error_msg = InputValidator.validate_food_name(food_name)
         if not is_valid:
-            return jsonify({'success': False,
-                            'error': f'Invalid food name: {error_msg}'}), 400
-        nutrition_info = nutrition_service.get_food_nutrition(food_name.strip().lower())
+            return api_response({'success': False,
+                                 'error': f'Invalid food name: {error_msg}'}), 400
+        food_name = food_name.strip().lower()
+        cache_control = HTTP_CACHE_CONFIG['food_info']
+
+        # Revalidation of a cached food: no database query and no serialization
+        cached_etag = nutrition_service.cache.get_etag(food_name)
+        if cached_etag:
+            cached_etag = representation_etag(cached_etag, negotiate_media_type(request.headers.get('Accept')))
+            if etag_matches(request.headers.get('If-None-Match'), cached_etag):
+                return not_modified(cached_etag, cache_control)
+
+        nutrition_info = nutrition_service.get_food_nutrition(food_name)
         
         if nutrition_info:
-            return jsonify({
+            return api_response({
                 'success': True,
-                'nutrition': {
-                    'name': nutrition_info.food_name,
-                    'calories_per_100g': float(nutrition_info.calories_per_100g),
-                    'sugar_g': float(nutrition_info.sugar_g),
-                    'saturated_fat_g': float(nutrition_info.saturated_fat_g),
-                    'sodium_mg': float(nutrition_info.sodium_mg),
-                    'category': nutrition_info.category,
-                    'source': nutrition_info.source
-                }
-            })
+                'nutrition': nutrition_payload(nutrition_info)
+            }, etag=nutrition_etag(nutrition_info), cache_control=cache_control)
         else:
-            return jsonify({
+            return api_response({
                 'success': False,
                 'error': 'Nutrition data not found'
             }), 404
             
     except Exception as e:
-        return jsonify({
+        return api_response({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/demo/<demo_type>', methods=['GET'])
+@api.route('/api/demo/<demo_type>', methods=['GET'])
 def demo_endpoint(demo_type):
     """Run demo scenarios"""
     try:
@@ -335,7 +605,7 @@ def demo_endpoint(demo_type):
         elif demo_type == 'junk':
             foods = ['french fries', 'ice cream', 'coca cola']
         else:
-            return jsonify({'error': 'Invalid demo type'}), 400
+            return api_response({'error': 'Invalid demo type'}), 400
         
         # Analyze the demo foods
         results = risk_service.analyze_foods(foods, nutrition_service)
@@ -346,58 +616,132 @@ def demo_endpoint(demo_type):
             nutrition_info = nutrition_service.get_food_nutrition(food_name)
             
             if nutrition_info:
-                demo_results.append({
-                    'food_name': food_name,
-                    'nutrition': {
-                        'name': nutrition_info.food_name,
-                        'calories_per_100g': float(nutrition_info.calories_per_100g),
-                        'sugar_g': float(nutrition_info.sugar_g),
-                        'saturated_fat_g': float(nutrition_info.saturated_fat_g),
-                        'sodium_mg': float(nutrition_info.sodium_mg),
-                        'category': nutrition_info.category,
-                        'source': nutrition_info.source
-                    },
-                    'risk_assessment': {
-                        'risk_score': assessment.risk_score,
-                        'is_risky': assessment.is_risky,
-                        'risk_factors': assessment.risk_factors,
-                        'alternatives': assessment.alternatives
-                    }
-                })
+                demo_results.append(food_result_payload(food_name, nutrition_info, assessment))
         
-        return jsonify({
+        # Demo results change only with the catalog, so the body hash is a stable validator
+        return api_response({
             'success': True,
             'demo_type': demo_type,
             'results': demo_results
-        })
+        }, cache_control=HTTP_CACHE_CONFIG['demo'], hash_body=True)
         
     except Exception as e:
-        return jsonify({
+        return api_response({
             'success': False,
             'error': str(e)
         }), 500
     
-@app.route('/api/nutrition-stats', methods=['GET'])
+@api.route('/api/nutrition-stats', methods=['GET'])
 def nutrition_stats():
-    stats = nutrition_service.get_stats()
-    return jsonify(stats)
+    """Lookup, cache, USDA quota, database and request counters of this process as JSON"""
+    try:
+        stats = stats_summary(current_services())
+        stats.update({'success': True, 'generated_at': datetime.now().isoformat()})
+        return api_response(stats)
+    except Exception as e:
+        return api_response({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Runtime metrics of this process in the Prometheus text format"""
+    body = METRICS.render([lambda: service_metrics(current_services()), admission_metrics])
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+def admin_denied():
+    """403 response unless the request carries the admin token, None if it does"""
+    token = ADMIN_CONFIG['token']
+    if not token:
+        return api_response({'error': 'Admin endpoints are disabled (set ADMIN_TOKEN)'}), 403
+    supplied = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        return api_response({'error': 'Admin token required'}), 403
+    return None
+
+@api.route('/api/admin/profile', methods=['POST'])
+def start_profile():
+    """Sample this worker's stacks (and allocations) for a number of seconds without restarting it"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    
+    is_valid, error_msg, seconds, interval_ms, allocations = InputValidator.validate_profile_request(
+        request.get_json(silent=True) or {})
+    if not is_valid:
+        return api_response({'error': f'Profile validation error: {error_msg}'}), 400
+    
+    profile = PROFILES.start(seconds, interval_ms, allocations)
+    if profile is None:
+        return api_response({'success': False, 'error': 'A profile is already running in this process'}), 409
+    
+    result = profile.summary()
+    result.update({'success': True, 'status_url': f'/api/admin/profile/{profile.profile_id}'})
+    return api_response(result), 202
+
+@api.route('/api/admin/profile/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Profile status and summary; ?format=collapsed or ?format=allocations returns the raw output"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    
+    profile = PROFILES.get(profile_id)
+    if profile is None:
+        return api_response({'error': 'Profile not found in this process'}), 404
+    
+    output = request.args.get('format')
+    if output in ('collapsed', 'allocations'):
+        if profile.status != 'completed':
+            return api_response({'error': f'Profile is {profile.status}'}), 409
+        if output == 'allocations' and not profile.allocations:
+            return api_response({'error': 'Profile was run without allocation tracking'}), 404
+        path = profile.collapsed_path if output == 'collapsed' else profile.allocations_path
+        with open(path, 'r', encoding='utf-8') as f:
+            return Response(f.read(), mimetype='text/plain')
+    
+    result = profile.summary()
+    result['success'] = True
+    return api_response(result)
 
 # Error handlers
-@app.errorhandler(400)
+@api.app_errorhandler(400)
 def bad_request(error):
-    return jsonify({'error': 'Bad request - Please check your input data'}), 400
+    return api_response({'error': 'Bad request - Please check your input data'}), 400
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
-    return jsonify({'error': 'Endpoint not found'}), 404
+    return api_response({'error': 'Endpoint not found'}), 404
 
-@app.errorhandler(422)
+@api.app_errorhandler(422)
 def validation_error(error):
-    return jsonify({'error': 'Validation error - Invalid input format'}), 422
+    return api_response({'error': 'Validation error - Invalid input format'}), 422
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
-    return jsonify({'error': 'Internal server error'}), 500
+    return api_response({'error': 'Internal server error'}), 500
+
+def create_app(config=None, services=None):
+    """ Build the Flask app.
+
+    config is applied on top of the defaults (e.g. ``{'START_JOB_WORKERS': False}`` for
+    tools that only need the routes). services is a ServiceContainer to use instead of a
+    new one. Nothing here touches the database or the disk: services are built by the first
+    request that needs them, separately in every worker process, and the frontend files are
+    read and compressed by the first page or static request (or the ASGI lifespan).
+    """
+    # Static files are served from memory by the blueprint rather than Flask's static route
+    app = Flask(__name__, template_folder=str(TEMPLATE_DIR), static_folder=None)
+    app.config['START_JOB_WORKERS'] = True
+    app.config.update(config or {})
+    CORS(app)
+    app.extensions['services'] = services or ServiceContainer()
+    app.extensions['assets'] = AssetBundle(TEMPLATE_DIR / 'index.html', STATIC_DIR, FALLBACK_INDEX_HTML, STATIC_CONFIG)
+    app.register_blueprint(api)
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
     
@@ -407,8 +751,13 @@ if __name__ == '__main__':
     print("  - GET  /api/health          - Health check")
     print("  - POST /api/analyze-foods   - Analyze foods")
     print("  - POST /api/lifestyle-assessment - Lifestyle assessment")
+    print("  - POST /api/cohort-assessment - Bulk lifestyle risk scoring")
+    print("  - POST /api/optimize-diet   - Suggest diet swaps to lower risk levels")
+    print("  - POST /api/assessment-sessions - Incremental assessment sessions")
+    print("  - POST /api/jobs            - Queue a large batch analysis (GET /api/jobs/<id> for progress)")
     print("  - GET  /api/get-food-info/<food> - Get food info")
     print("  - GET  /api/demo/<type>     - Run demos")
+    print("  - GET  /api/nutrition-stats - Lookup, cache and quota counters (GET /metrics for Prometheus)")
     
     # Run the Flask app
     app.run(debug=True, host='0.0.0.0', port=5000)   
@@ -0,0 +1,406 @@
+"""ASGI entry point: the Food Health API with non-blocking database and HTTP lookups.
+
+Run with an ASGI server from the backend directory, e.g.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Endpoints that look foods up (analyze-foods, lifestyle-assessment, optimize-diet,
+get-food-info) are served natively on the event loop; concurrent lookups overlap and
+duplicates share one fetch. Every other endpoint is the Flask app from app.py run on a
+worker thread, so both modes share the same service instances and responses.
+"""
+
+import asyncio
+import contextlib
+import time
+import traceback
+from datetime import datetime
+
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app
+from utils.admission import RATE_LIMITER, CONCURRENCY, Rejection, is_exempt
+from utils.api_payloads import (
+    parse_lifestyle_request, requested_foods, nutrition_payload, food_result_payload, lifestyle_payload,
+    STREAM_FORMATS, stream_format, stream_event, food_result_event, analysis_summary
+)
+from config.settings import HTTP_CACHE_CONFIG, RESULT_CACHE_CONFIG
+from utils.http_cache import nutrition_etag, representation_etag, etag_matches
+from utils.serialization import encode_response, negotiate_media_type
+from utils.metrics import REQUEST_SECONDS
+from utils.tracing import begin_request_trace, end_request_trace, is_debug_request, with_debug_trace
+from utils.validators import InputValidator
+
+# The Flask app's lazily built services, shared by both halves of the server
+services = flask_app.extensions['services']
+
+
+def api_response(request: Request, payload, status_code: int = 200, etag=None, cache_control=None) -> Response:
+    """Payload as JSON or MessagePack (Accept), compressed when large (Accept-Encoding), as in app.api_response"""
+    body, headers = encode_response(with_debug_trace(payload), request.headers.get('accept'),
+                                    request.headers.get('accept-encoding'), etag)
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    if 'ETag' in headers and etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+        return not_modified(headers['ETag'], cache_control)
+    return Response(body, status_code=status_code, headers=headers)
+
+
+def not_modified(etag: str, cache_control=None) -> Response:
+    """Empty 304 response repeating the validator and caching policy"""
+    headers = {'ETag': etag, 'Vary': 'Accept, Accept-Encoding'}
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    return Response(status_code=304, headers=headers)
+
+
+def cached_response(request: Request, result_cache, entry) -> Response:
+    """A result cache hit, as app.cached_response"""
+    if is_debug_request(request.query_params.get('debug'), request.headers.get('x-debug-trace')):
+        response = api_response(request, entry.payload)
+    else:
+        body, headers = result_cache.encoded(entry, request.headers.get('accept'), request.headers.get('accept-encoding'))
+        response = Response(body, headers=headers)
+    response.headers['X-Result-Cache'] = 'hit'
+    return response
+
+
+def error_response(request: Request, e: Exception) -> Response:
+    """500 response in the same shape as the Flask endpoints"""
+    return api_response(request, {
+        'success': False,
+        'error': str(e),
+        'traceback': traceback.format_exc()
+    }, status_code=500)
+
+
+async def read_json(request: Request):
+    """Request body as JSON, or None if it is not valid JSON"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def analyze_foods_api(request: Request):
+    """ Analyze food items for nutritional information and risk assessment """
+    try:
+        data = await read_json(request)
+
+        if not data or 'foods' not in data:
+            return api_response(request, {'error': 'Missing food parameter'}, status_code=400)
+
+        is_valid, error_msg, cleaned_foods = InputValidator.validate_food_list(data['foods'])
+        if not is_valid:
+            return api_response(request, {'error': f'Validation error: {error_msg}'}, status_code=400)
+
+        fmt = stream_format(request.headers.get('accept'), request.query_params.get('stream'))
+        if fmt:
+            return StreamingResponse(stream_food_analysis(cleaned_foods, fmt), media_type=STREAM_FORMATS[fmt],
+                                     headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        result_cache = services.result_cache
+        if result_cache.enabled:
+            cache_key = result_cache.key('analyze-foods', cleaned_foods)
+            cached = result_cache.get('analyze-foods', cache_key)
+            if cached:
+                if RESULT_CACHE_CONFIG['persist_on_hit']:
+                    await asyncio.gather(*(services.async_db_service.save_risk_assessment(risk_assessment)
+                                           for risk_assessment in cached.records))
+                return cached_response(request, result_cache, cached)
+            generation = result_cache.generation()
+
+        resolved = await services.async_nutrition_service.resolve_foods(cleaned_foods)
+        results = []
+        risk_assessments = []
+        risky_categories = set()
+        for food_name in cleaned_foods:
+            nutrition_info = resolved[food_name]
+            risk_assessment = None
+            if nutrition_info:
+                risk_assessment = services.risk_service.calculate_risk_score(nutrition_info, persist=False)
+                risk_assessments.append(risk_assessment)
+                if risk_assessment.is_risky:
+                    risky_categories.add(nutrition_info.category)
+            results.append(food_result_payload(food_name, nutrition_info, risk_assessment))
+        await asyncio.gather(*(services.async_db_service.save_risk_assessment(risk_assessment)
+                               for risk_assessment in risk_assessments))
+
+        payload = {
+            'success': True,
+            'results': results,
+            'analyzed_at': datetime.now().isoformat()}
+        if result_cache.enabled:
+            result_cache.put(cache_key, generation, payload, risk_assessments,
+                             cleaned_foods + [risk_assessment.food_name for risk_assessment in risk_assessments],
+                             risky_categories)
+        return api_response(request, payload)
+
+    except Exception as e:
+        return error_response(request, e)
+
+
+async def stream_food_analysis(foods, fmt):
+    """ Yield each food's result as soon as its lookup finishes, then a summary event """
+    positions = {}
+    for index, food_name in enumerate(foods):
+        positions.setdefault(food_name, []).append(index)
+
+    async def resolve(food_name):
+        return food_name, await services.async_nutrition_service.get_food_nutrition(food_name)
+
+    tasks = [asyncio.ensure_future(resolve(food_name)) for food_name in positions]
+    results = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            food_name, nutrition_info = await next_done
+            risk_assessment = None
+            if nutrition_info:
+                risk_assessment = services.risk_service.calculate_risk_score(nutrition_info, persist=False)
+                await services.async_db_service.save_risk_assessment(risk_assessment)
+            for index in positions[food_name]:
+                event = food_result_event(index, food_name, nutrition_info, risk_assessment)
+                results.append(event)
+                yield stream_event(fmt, 'result', event)
+        yield stream_event(fmt, 'summary', analysis_summary(results))
+    except Exception as e:
+        # Headers are already sent, so failures are reported in-stream
+        yield stream_event(fmt, 'error', {'success': False, 'error': str(e)})
+    finally:
+        # Lookups shared with other requests keep running behind their shield
+        for task in tasks:
+            task.cancel()
+
+
+async def lifestyle_assessment_api(request: Request):
+    """Perform lifestyle disease risk assessment"""
+    try:
+        data = await read_json(request)
+        if data is None:
+            return api_response(request, {'error': 'Bad request - Please check your input data'}, status_code=400)
+
+        user_profile, dietary_pattern, error = parse_lifestyle_request(data)
+        if error:
+            return api_response(request, {'error': error}, status_code=400)
+
+        is_valid, error_msg, uncertainty_draws = InputValidator.validate_uncertainty_option(data.get('uncertainty'))
+        if not is_valid:
+            return api_response(request, {'error': f'Uncertainty validation error: {error_msg}'}, status_code=400)
+
+        result_cache = services.result_cache
+        cacheable = result_cache.enabled and not uncertainty_draws
+        if cacheable:
+            cache_key = result_cache.key('lifestyle-assessment', [user_profile, dietary_pattern])
+            cached = result_cache.get('lifestyle-assessment', cache_key)
+            if cached:
+                if RESULT_CACHE_CONFIG['persist_on_hit']:
+                    await save_lifestyle_assessment(cached.records)
+                return cached_response(request, result_cache, cached)
+            generation = result_cache.generation()
+
+        resolved = await services.async_nutrition_service.resolve_foods(dietary_pattern.daily_foods)
+        assess = lambda: services.disease_service.assess_lifestyle_disease_risk(
+            user_profile, dietary_pattern, uncertainty_draws, resolved=resolved, persist=False)
+        # Scoring is a millisecond of CPU; Monte Carlo draws are moved off the event loop
+        assessment = await asyncio.to_thread(assess) if uncertainty_draws else assess()
+        await save_lifestyle_assessment(assessment)
+
+        payload = lifestyle_payload(assessment)
+        if cacheable:
+            result_cache.put(cache_key, generation, payload, assessment, dietary_pattern.daily_foods
+                             + [info.food_name for info in resolved.values() if info])
+        return api_response(request, payload)
+
+    except ValueError as e:
+        return api_response(request, {
+            'success': False,
+            'error': f'Data validation error: {str(e)}'
+        }, status_code=400)
+    except Exception as e:
+        return error_response(request, e)
+
+
+async def save_lifestyle_assessment(assessment):
+    """Save the profile, dietary pattern and disease risks of an assessment, as DiseasePredictionService.save_assessment"""
+    user_id = await services.async_db_service.save_user_profile(assessment.user_profile)
+    if user_id > 0:
+        await services.async_db_service.save_dietary_pattern(assessment.dietary_pattern, user_id)
+        await asyncio.gather(*(services.async_db_service.save_disease_assessment(user_id, risk)
+                               for risk in assessment.disease_risks))
+
+
+async def optimize_diet_api(request: Request):
+    """Suggest the fewest food swaps or portion changes that lower each disease to a target risk level"""
+    try:
+        data = await read_json(request)
+        if data is None:
+            return api_response(request, {'error': 'Bad request - Please check your input data'}, status_code=400)
+
+        user_profile, dietary_pattern, error = parse_lifestyle_request(data)
+        if error:
+            return api_response(request, {'error': error}, status_code=400)
+
+        is_valid, error_msg, target_level, max_changes = InputValidator.validate_optimizer_options(data)
+        if not is_valid:
+            return api_response(request, {'error': f'Optimizer validation error: {error_msg}'}, status_code=400)
+
+        resolved = await services.async_nutrition_service.resolve_foods(dietary_pattern.daily_foods)
+        result = await asyncio.to_thread(services.diet_optimizer_service.optimize_diet, user_profile, dietary_pattern,
+                                         target_level, max_changes, resolved)
+        result['success'] = True
+        result['optimized_at'] = datetime.now().isoformat()
+        return api_response(request, result)
+
+    except Exception as e:
+        return error_response(request, e)
+
+
+async def get_food_info(request: Request):
+    """Get nutrition information for a specific food"""
+    try:
+        food_name = request.path_params['food_name']
+        is_valid, error_msg = InputValidator.validate_food_name(food_name)
+        if not is_valid:
+            return api_response(request, {'success': False,
+                                          'error': f'Invalid food name: {error_msg}'}, status_code=400)
+        food_name = food_name.strip().lower()
+        cache_control = HTTP_CACHE_CONFIG['food_info']
+
+        # Revalidation of a cached food: no database query and no serialization
+        cached_etag = services.nutrition_service.cache.get_etag(food_name)
+        if cached_etag:
+            cached_etag = representation_etag(cached_etag, negotiate_media_type(request.headers.get('accept')))
+            if etag_matches(request.headers.get('if-none-match'), cached_etag):
+                return not_modified(cached_etag, cache_control)
+
+        nutrition_info = await services.async_nutrition_service.get_food_nutrition(food_name)
+
+        if nutrition_info:
+            return api_response(request, {
+                'success': True,
+                'nutrition': nutrition_payload(nutrition_info)
+            }, etag=nutrition_etag(nutrition_info), cache_control=cache_control)
+        return api_response(request, {
+            'success': False,
+            'error': 'Nutrition data not found'
+        }, status_code=404)
+
+    except Exception as e:
+        return api_response(request, {
+            'success': False,
+            'error': str(e)
+        }, status_code=500)
+
+
+async def admit(request: Request):
+    """Charge the client's token bucket and take a concurrency slot, as app.admit_request.
+
+    Returns (rejection or None, whether a slot is held, tokens left). A shared bucket store is
+    a SQLite write, so it is charged on a thread; queued requests wait on the limiter's
+    futures, so neither blocks the event loop or parks executor threads.
+    """
+    if is_exempt(request.url.path, request.method):
+        return None, False, None
+    data = await read_json(request) if request.method == 'POST' else None
+    cache = services.nutrition_service.cache if services.is_built('nutrition_service') else None
+    foods = requested_foods(data, request.path_params.get('food_name'))
+    client = RATE_LIMITER.client_id(request.headers.get('x-api-key'), request.client.host if request.client else None,
+                                    request.headers.get('x-forwarded-for'))
+    cost = RATE_LIMITER.request_cost(foods, cache)
+    if RATE_LIMITER.blocking:
+        rejection, remaining = await asyncio.to_thread(RATE_LIMITER.check, client, cost)
+    else:
+        rejection, remaining = RATE_LIMITER.check(client, cost)
+    if rejection is None:
+        rejection = await CONCURRENCY.acquire_async()
+    return rejection, rejection is None, remaining
+
+
+def rejected(request: Request, rejection: Rejection) -> Response:
+    """429 or 503 response with Retry-After"""
+    response = api_response(request, {'success': False, 'error': rejection.error,
+                                      'retry_after': rejection.retry_after}, status_code=rejection.status)
+    response.headers['Retry-After'] = str(rejection.retry_after)
+    return response
+
+
+async def release_after(body_iterator):
+    """Stream a body, then free the request's concurrency slot"""
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        CONCURRENCY.release()
+
+
+def timed_route(path: str, endpoint, methods, route: str) -> Route:
+    """Route whose latency is observed and traced under the same route label as the Flask endpoint"""
+    async def handler(request: Request):
+        started = time.perf_counter()
+        trace = begin_request_trace(
+            f'{request.method} {route}', request.headers.get('traceparent'),
+            is_debug_request(request.query_params.get('debug'), request.headers.get('x-debug-trace')),
+            **{'http.method': request.method, 'http.route': route})
+        status_code = 500
+        holds_slot = False
+        try:
+            rejection, holds_slot, remaining = await admit(request)
+            response = rejected(request, rejection) if rejection else await endpoint(request)
+            if holds_slot and isinstance(response, StreamingResponse):
+                # The slot covers the whole stream, not just the time to the first byte
+                response.body_iterator = release_after(response.body_iterator)
+                holds_slot = False
+            if remaining is not None:
+                response.headers['X-RateLimit-Remaining'] = str(int(remaining))
+            status_code = response.status_code
+            elapsed = time.perf_counter() - started
+            REQUEST_SECONDS.observe(elapsed, route, request.method, str(status_code))
+            if trace is not None:
+                response.headers['Server-Timing'] = trace.server_timing()
+                response.headers['X-Trace-Id'] = trace.trace_id
+            else:
+                response.headers['Server-Timing'] = f'total;dur={elapsed * 1000:.2f}'
+            return response
+        finally:
+            if holds_slot:
+                CONCURRENCY.release()
+            # Streamed bodies are produced after this returns, so their trace covers time to first byte
+            end_request_trace(trace, status_code)
+    return Route(path, handler, methods=methods)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_):
+    """Open the connection pool and HTTP session, load the in-memory catalogs and frontend off the event loop and start the job workers"""
+    # Build this worker's services (schema check included) off the event loop
+    await asyncio.to_thread(lambda: services.async_nutrition_service)
+    await services.async_db_service.start()
+    await services.async_nutrition_service.start()
+    await asyncio.to_thread(services.risk_service._load_alternatives_index)
+    await asyncio.to_thread(services.diet_optimizer_service._load_catalog)
+    await asyncio.to_thread(flask_app.extensions['assets'].ensure_loaded)
+    if flask_app.config['START_JOB_WORKERS']:
+        services.job_service.start()
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(services.shutdown)
+        await services.async_nutrition_service.close()
+        await services.async_db_service.close()
+
+
+app = Starlette(
+    routes=[
+        timed_route('/api/analyze-foods', analyze_foods_api, ['POST'], '/api/analyze-foods'),
+        timed_route('/api/lifestyle-assessment', lifestyle_assessment_api, ['POST'], '/api/lifestyle-assessment'),
+        timed_route('/api/optimize-diet', optimize_diet_api, ['POST'], '/api/optimize-diet'),
+        timed_route('/api/get-food-info/{food_name}', get_food_info, ['GET'], '/api/get-food-info/<food_name>'),
+        # Everything else (health, sessions, cohort, demo, static files, ...) is the Flask app
+        Mount('/', app=WsgiToAsgi(flask_app)),
+    ],
+    lifespan=lifespan
+)
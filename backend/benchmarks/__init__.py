@@ -0,0 +1,6 @@
+""" Micro-benchmarks of the scoring, aggregation and lookup hot paths
+
+Run from the backend directory with ``python -m benchmarks``. Every benchmark runs on
+deterministic synthetic data against an in-memory SQLite stand-in for the MySQL catalog,
+so results need no database server or network and are comparable between runs.
+"""
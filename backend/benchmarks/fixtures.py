@@ -0,0 +1,175 @@
+""" Deterministic synthetic catalogs and diaries, and an in-memory SQLite stand-in for the catalog database """
+
+import itertools
+import random
+import sqlite3
+from typing import List, Optional, Tuple
+
+from config.settings import ACTIVITY_MULTIPLIERS, FOOD_TAXONOMY
+from models.nutrition import DietaryPattern, NutritionInfo
+from models.user import UserProfile
+from services.database_service import DatabaseService, SELECT_FOOD_SQL, food_params
+
+PREPARATIONS = ('raw', 'cooked', 'boiled', 'fried', 'roasted', 'canned', 'frozen', 'dried', 'salted', 'sweetened',
+                'low fat', 'whole', 'with added sugar', 'prepared', 'homemade', 'fast food')
+
+# Per-100g nutrient ranges of synthetic foods: calories, sugar (g), saturated fat (g), sodium (mg)
+NUTRIENT_RANGES = ((10, 600), (0, 40), (0, 15), (0, 1500))
+
+_database_ids = itertools.count()
+
+
+def synthetic_catalog(size: int, seed: int) -> List[NutritionInfo]:
+    """ size foods named like USDA descriptions ('Cheddar, roasted 17'), same output for the same seed """
+    rng = random.Random(seed)
+    keywords = [(keyword, category['name']) for category in FOOD_TAXONOMY['categories']
+                for keyword in category['keywords']]
+    foods = []
+    for i in range(size):
+        keyword, category = rng.choice(keywords)
+        calories, sugar, saturated_fat, sodium = (round(rng.uniform(low, high), 2) for low, high in NUTRIENT_RANGES)
+        foods.append(NutritionInfo(
+            food_name=f'{keyword.capitalize()}, {rng.choice(PREPARATIONS)} {i}',
+            calories_per_100g=calories,
+            sugar_g=sugar,
+            saturated_fat_g=saturated_fat,
+            sodium_mg=sodium,
+            category=category,
+            source='api'
+        ))
+    return foods
+
+
+def synthetic_profiles(count: int, seed: int) -> List[UserProfile]:
+    """ count adult profiles spread over ages, sizes, activity levels and family histories """
+    rng = random.Random(seed)
+    histories = ([], [], ['diabetes'], ['hypertension'], ['heart disease', 'obesity'])
+    return [UserProfile(
+        age=rng.randint(18, 85),
+        gender=rng.choice(('male', 'female')),
+        weight_kg=round(rng.uniform(45, 140), 1),
+        height_cm=round(rng.uniform(150, 200), 1),
+        activity_level=rng.choice(list(ACTIVITY_MULTIPLIERS)),
+        family_history=list(rng.choice(histories)),
+        current_conditions=[]
+    ) for _ in range(count)]
+
+
+def synthetic_diaries(catalog: List[NutritionInfo], count: int, entries: int, days: int,
+                      seed: int) -> List[Tuple[UserProfile, DietaryPattern]]:
+    """ count profile and diary pairs of entries foods from the catalog, spread over days and 3 meals """
+    rng = random.Random(seed)
+    names = [food.food_name.lower() for food in catalog]
+    diaries = []
+    for profile in synthetic_profiles(count, seed):
+        foods = [rng.choice(names) for _ in range(entries)]
+        diaries.append((profile, DietaryPattern(
+            daily_foods=foods,
+            portion_sizes_g=[round(rng.uniform(20, 400), 1) for _ in foods],
+            meal_frequency=3,
+            days_tracked=days,
+            day_indices=[i * days // entries for i in range(entries)],
+            meal_indices=[rng.randrange(3) for _ in foods]
+        )))
+    return diaries
+
+
+def synthetic_descriptions(count: int, seed: int) -> List[str]:
+    """ USDA-style descriptions for categorization, about one in ten matching no keyword """
+    rng = random.Random(seed)
+    keywords = [keyword for category in FOOD_TAXONOMY['categories'] for keyword in category['keywords']]
+    unmatched = ('xylitol', 'gelatin', 'vinegar', 'soup', 'sauce', 'seasoning', 'yeast', 'broth')
+    descriptions = []
+    for _ in range(count):
+        head = rng.choice(unmatched) if rng.random() < 0.1 else rng.choice(keywords)
+        descriptions.append(', '.join([head.capitalize()] + rng.sample(PREPARATIONS, 3)))
+    return descriptions
+
+
+class SQLiteDatabaseService(DatabaseService):
+    """ The catalog queries of DatabaseService on an in-memory SQLite database.
+
+    Runs the same food lookup SQL and opens a connection per call like the MySQL service,
+    but needs no server. Writes other than foods are discarded.
+    """
+
+    def __init__(self, foods: Optional[List[NutritionInfo]] = None):
+        self._food_listeners = []
+        self._uri = f'file:foodhealth-bench-{next(_database_ids)}?mode=memory&cache=shared'
+        # The database lives as long as one connection to it is open
+        self._keepalive = sqlite3.connect(self._uri, uri=True)
+        self._keepalive.execute('''
+            CREATE TABLE foods (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name VARCHAR(255) UNIQUE NOT NULL,
+                calories_per_100g REAL,
+                sugar_g REAL,
+                saturated_fat_g REAL,
+                sodium_mg REAL,
+                category VARCHAR(100),
+                source VARCHAR(50)
+            )
+        ''')
+        self._keepalive.executemany(
+            'INSERT INTO foods (name, calories_per_100g, sugar_g, saturated_fat_g, sodium_mg, category, source) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', [food_params(food) for food in foods or []])
+        self._keepalive.commit()
+        self._select_food_sql = SELECT_FOOD_SQL.replace('%s', '?')
+
+    def _connect(self) -> sqlite3.Connection:
+        """ A new connection per call, as DatabaseService opens one per query """
+        return sqlite3.connect(self._uri, uri=True)
+
+    def init_database(self):
+        """ The schema is created in __init__ """
+        pass
+
+    def get_food_from_db(self, food_name: str) -> Optional[NutritionInfo]:
+        """ Get food from the stand-in with the service's lookup SQL """
+        connection = self._connect()
+        try:
+            row = connection.execute(self._select_food_sql, (food_name,)).fetchone()
+            return NutritionInfo(*row) if row else None
+        finally:
+            connection.close()
+
+    def get_all_foods_from_db(self) -> List[NutritionInfo]:
+        """ Get every food in the stand-in catalog """
+        connection = self._connect()
+        try:
+            return [NutritionInfo(*row) for row in connection.execute(
+                'SELECT name, calories_per_100g, sugar_g, saturated_fat_g, sodium_mg, category, source FROM foods')]
+        finally:
+            connection.close()
+
+    def save_food_to_db(self, nutrition_info: NutritionInfo):
+        """ Save a food and run the food listeners """
+        connection = self._connect()
+        try:
+            connection.execute(
+                'INSERT OR REPLACE INTO foods (name, calories_per_100g, sugar_g, saturated_fat_g, sodium_mg, '
+                'category, source) VALUES (?, ?, ?, ?, ?, ?, ?)', food_params(nutrition_info))
+            connection.commit()
+        finally:
+            connection.close()
+        self.notify_food_saved(nutrition_info)
+
+    def save_risk_assessment(self, assessment):
+        """ Discarded """
+        pass
+
+    def save_user_profile(self, profile) -> int:
+        """ Discarded; returns a user id """
+        return 1
+
+    def save_dietary_pattern(self, pattern, user_id) -> bool:
+        """ Discarded """
+        return True
+
+    def save_disease_assessment(self, user_id, risk) -> bool:
+        """ Discarded """
+        return True
+
+    def log_user_query(self, *args, **kwargs):
+        """ Discarded """
+        pass
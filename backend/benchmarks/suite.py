@@ -0,0 +1,333 @@
+""" Benchmark registry, timing loop, JSON baselines and regression comparison """
+
+import argparse
+import fnmatch
+import gc
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import BENCHMARK_CONFIG
+
+# name -> setup(fixtures) returning the operation to time; one call is one operation
+BENCHMARKS: Dict[str, Callable[['Fixtures'], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str):
+    """ Register a benchmark setup under name """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class Fixtures:
+    """ Synthetic data and services shared by the benchmarks of one run, built on first use """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self._built: Dict[str, Any] = {}
+
+    def _get(self, name: str, build: Callable[[], Any]) -> Any:
+        """ The named fixture, built the first time a benchmark needs it """
+        if name not in self._built:
+            self._built[name] = build()
+        return self._built[name]
+
+    @property
+    def catalog(self):
+        """ Synthetic foods, also loaded into the SQLite stand-in """
+        from benchmarks.fixtures import synthetic_catalog
+        return self._get('catalog', lambda: synthetic_catalog(self.config['catalog_size'], self.config['seed']))
+
+    @property
+    def diaries(self):
+        """ Synthetic profile and diary pairs over the catalog """
+        from benchmarks.fixtures import synthetic_diaries
+        return self._get('diaries', lambda: synthetic_diaries(
+            self.catalog, self.config['diaries'], self.config['diary_entries'], self.config['days_tracked'],
+            self.config['seed']))
+
+    @property
+    def db_service(self):
+        """ SQLite stand-in for the catalog database """
+        from benchmarks.fixtures import SQLiteDatabaseService
+        return self._get('db_service', lambda: SQLiteDatabaseService(self.catalog))
+
+    @property
+    def nutrition_service(self):
+        """ Nutrition lookups over the stand-in (catalog foods never reach the network) """
+        from services.nutrition_service import NutritionService
+        return self._get('nutrition_service', lambda: NutritionService(self.db_service))
+
+    @property
+    def risk_service(self):
+        """ Food risk scoring over the stand-in """
+        from services.risk_assessment_service import RiskAssessmentService
+        return self._get('risk_service', lambda: RiskAssessmentService(self.db_service))
+
+    @property
+    def disease_service(self):
+        """ Lifestyle disease assessment over the stand-in """
+        from services.disease_prediction_service import DiseasePredictionService
+        return self._get('disease_service', lambda: DiseasePredictionService(self.nutrition_service, self.db_service))
+
+    def warm_nutrition_cache(self):
+        """ Resolve every diary food once, as a serving process would have """
+        for _, pattern in self.diaries:
+            self.disease_service.resolve_foods(pattern.daily_foods, interactive=False)
+
+
+@benchmark('risk.calculate_risk_score')
+def _risk_score(fixtures: Fixtures):
+    risk_service = fixtures.risk_service
+    foods = itertools.cycle(fixtures.catalog)
+    return lambda: risk_service.calculate_risk_score(next(foods), persist=False)
+
+
+@benchmark('disease.aggregate_intake_table')
+def _aggregate_intake_table(fixtures: Fixtures):
+    disease_service = fixtures.disease_service
+    inputs = itertools.cycle([(pattern, disease_service.resolve_foods(pattern.daily_foods, interactive=False))
+                              for _, pattern in fixtures.diaries])
+
+    def aggregate():
+        pattern, resolved = next(inputs)
+        return disease_service.aggregate_intake_table(pattern, resolved, track_foods=True)
+    return aggregate
+
+
+@benchmark('disease.attribute_risks')
+def _attribute_risks(fixtures: Fixtures):
+    disease_service = fixtures.disease_service
+    calculator = disease_service.health_calculator
+    inputs = []
+    for profile, pattern in fixtures.diaries:
+        resolved = disease_service.resolve_foods(pattern.daily_foods, interactive=False)
+        table, aggregator = disease_service.aggregate_intake_table(pattern, resolved, track_foods=True)
+        inputs.append((profile, calculator.calculate_bmi(profile.weight_kg, profile.height_cm),
+                       calculator.calculate_daily_maintenance_calories(profile), table, aggregator, resolved))
+    inputs = itertools.cycle(inputs)
+    return lambda: disease_service.attribute_risks(*next(inputs))
+
+
+@benchmark('disease.predict_disease_risks')
+def _predict_disease_risks(fixtures: Fixtures):
+    fixtures.warm_nutrition_cache()
+    disease_service = fixtures.disease_service
+    calculator = disease_service.health_calculator
+    inputs = []
+    for profile, pattern in fixtures.diaries:
+        inputs.append((profile, disease_service.analyze_dietary_intake(pattern),
+                       calculator.calculate_bmi(profile.weight_kg, profile.height_cm),
+                       calculator.calculate_daily_maintenance_calories(profile)))
+    inputs = itertools.cycle(inputs)
+    return lambda: disease_service.predict_disease_risks(*next(inputs))
+
+
+@benchmark('disease.assess_lifestyle_disease_risk')
+def _assess_lifestyle(fixtures: Fixtures):
+    fixtures.warm_nutrition_cache()
+    disease_service = fixtures.disease_service
+    diaries = itertools.cycle(fixtures.diaries)
+
+    def assess():
+        profile, pattern = next(diaries)
+        return disease_service.assess_lifestyle_disease_risk(profile, pattern, persist=False)
+    return assess
+
+
+@benchmark('categorizer.categorize')
+def _categorize(fixtures: Fixtures):
+    from benchmarks.fixtures import synthetic_descriptions
+    from utils.food_categorizer import FoodCategorizer
+    categorizer = FoodCategorizer()
+    descriptions = itertools.cycle(synthetic_descriptions(10000, fixtures.config['seed']))
+    return lambda: categorizer.categorize(next(descriptions))
+
+
+@benchmark('db.get_food_from_db')
+def _get_food_from_db(fixtures: Fixtures):
+    db_service = fixtures.db_service
+    names = itertools.cycle([food.food_name.lower() for food in fixtures.catalog[:1000]])
+    return lambda: db_service.get_food_from_db(next(names))
+
+
+@benchmark('nutrition.get_food_nutrition_cached')
+def _get_food_nutrition_cached(fixtures: Fixtures):
+    fixtures.warm_nutrition_cache()
+    nutrition_service = fixtures.nutrition_service
+    names = itertools.cycle(sorted({food for _, pattern in fixtures.diaries for food in pattern.daily_foods}))
+    return lambda: nutrition_service.get_food_nutrition(next(names), interactive=False)
+
+
+def measure(operation: Callable[[], Any], config: Dict[str, Any]) -> Dict[str, float]:
+    """ Time single operations in rounds of min_time_s after a warmup; the fastest round is reported.
+
+    Returns ops/s and latency percentiles in microseconds. Other load on the machine only
+    slows a round down, so the best of several rounds is the most repeatable figure.
+    """
+    clock = time.perf_counter_ns
+    deadline = clock() + int(config['warmup_s'] * 1e9)
+    while clock() < deadline:
+        operation()
+
+    best = None
+    for _ in range(config['rounds']):
+        gc.collect()
+        latencies = []
+        deadline = clock() + int(config['min_time_s'] * 1e9)
+        while len(latencies) < config['max_iterations']:
+            started = clock()
+            operation()
+            finished = clock()
+            latencies.append(finished - started)
+            if finished >= deadline:
+                break
+        ops_per_s = len(latencies) / (sum(latencies) / 1e9)
+        if best is None or ops_per_s > best[0]:
+            best = (ops_per_s, latencies)
+
+    ops_per_s, latencies = best
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] / 1000
+
+    return {
+        'iterations': len(latencies),
+        'ops_per_s': ops_per_s,
+        'p50_us': percentile(50),
+        'p95_us': percentile(95),
+        'p99_us': percentile(99),
+    }
+
+
+def run_benchmarks(config: Dict[str, Any], patterns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """ Run the benchmarks whose names match any pattern (all by default); returns a baseline document """
+    fixtures = Fixtures(config)
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if patterns and not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            continue
+        results[name] = measure(setup(fixtures), config)
+        print(format_result(name, results[name]), file=sys.stderr)
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'catalog_size': config['catalog_size'],
+            'diaries': config['diaries'],
+            'diary_entries': config['diary_entries'],
+            'days_tracked': config['days_tracked'],
+            'seed': config['seed'],
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """ Each current result against the baseline; a throughput drop over threshold is a regression """
+    comparisons = []
+    for name, result in current['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            comparisons.append({'name': name, 'status': 'new', 'change': None})
+            continue
+        change = result['ops_per_s'] / previous['ops_per_s'] - 1
+        status = 'regression' if change < -threshold else 'improved' if change > threshold else 'ok'
+        comparisons.append({'name': name, 'status': status, 'change': change,
+                            'baseline_ops_per_s': previous['ops_per_s'], 'ops_per_s': result['ops_per_s']})
+    return comparisons
+
+
+def format_result(name: str, result: Dict[str, float]) -> str:
+    """ One line of results """
+    return (f"{name:<40} {result['ops_per_s']:>12,.1f} ops/s  p50 {result['p50_us']:>10.1f} us  "
+            f"p95 {result['p95_us']:>10.1f} us  p99 {result['p99_us']:>10.1f} us")
+
+
+def _load(path: str) -> Dict[str, Any]:
+    """ A saved run """
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save(document: Dict[str, Any], path: str):
+    """ Write a run as indented JSON, creating its directory """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+        f.write('\n')
+
+
+def parse_args(argv=None):
+    """ Command line options; sizes and timings default to BENCHMARK_CONFIG """
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Food Health hot-path micro-benchmarks")
+    parser.add_argument('patterns', nargs='*', help="Only run benchmarks matching these globs (e.g. 'disease.*')")
+    parser.add_argument('--list', action='store_true', help="List the benchmarks and exit")
+    parser.add_argument('--catalog-size', type=int, help="Synthetic foods in the catalog")
+    parser.add_argument('--diaries', type=int, help="Synthetic profile and diary pairs")
+    parser.add_argument('--diary-entries', type=int, help="Entries per diary")
+    parser.add_argument('--seed', type=int, help="Seed of the synthetic data")
+    parser.add_argument('--min-time', type=float, help="Seconds timed per round")
+    parser.add_argument('--rounds', type=int, help="Timed rounds per benchmark; the fastest is reported")
+    parser.add_argument('--baseline', help=f"Baseline JSON to compare with (default {BENCHMARK_CONFIG['baseline_path']})")
+    parser.add_argument('--save-baseline', action='store_true', help="Write this run as the baseline")
+    parser.add_argument('--threshold', type=float, help="Throughput drop counted as a regression (0.10 = 10%%)")
+    parser.add_argument('-o', '--output', help="Also write this run's results to a JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """ Run, report, and compare with or save the baseline; exits 1 on regressions """
+    args = parse_args(argv)
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+        return 0
+    config = dict(BENCHMARK_CONFIG)
+    for option, key in (('catalog_size', 'catalog_size'), ('diaries', 'diaries'), ('diary_entries', 'diary_entries'),
+                        ('seed', 'seed'), ('min_time', 'min_time_s'), ('rounds', 'rounds'), ('threshold', 'regression_threshold')):
+        if getattr(args, option) is not None:
+            config[key] = getattr(args, option)
+    baseline_path = args.baseline or config['baseline_path']
+
+    current = run_benchmarks(config, args.patterns)
+    if args.output:
+        _save(current, args.output)
+    if args.save_baseline:
+        _save(current, baseline_path)
+        print(f"✓ Saved baseline -> {baseline_path}", file=sys.stderr)
+        return 0
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; run with --save-baseline to create one", file=sys.stderr)
+        return 0
+
+    baseline = _load(baseline_path)
+    sizes = ('catalog_size', 'diaries', 'diary_entries', 'days_tracked', 'seed')
+    if any(baseline['meta'].get(key) != current['meta'][key] for key in sizes):
+        print("⚠️ Baseline was recorded with other data sizes or seed; comparisons may not be meaningful",
+              file=sys.stderr)
+    regressions = 0
+    for comparison in compare(current, baseline, config['regression_threshold']):
+        if comparison['change'] is None:
+            print(f"{comparison['name']:<40} new (not in baseline)")
+            continue
+        marker = {'regression': '❌', 'improved': '🚀', 'ok': '✓'}[comparison['status']]
+        print(f"{comparison['name']:<40} {comparison['baseline_ops_per_s']:>12,.1f} -> "
+              f"{comparison['ops_per_s']:>12,.1f} ops/s  {comparison['change']:+7.1%} {marker}")
+        regressions += comparison['status'] == 'regression'
+    if regressions:
+        print(f"❌ {regressions} benchmark(s) regressed by more than {config['regression_threshold']:.0%}",
+              file=sys.stderr)
+        return 1
+    return 0
@@ -1,6 +1,23 @@
-""" Configuration package for Food Health App """
+""" Configuration package for Food Health App
 
-from .database import DB_CONFIG, get_db_connection
-from .settings import API_CONFIG, RISK_THRESHOLDS, FOOD_CATEGORIES
+Names are imported on first attribute access, so reading settings does not load the
+MySQL driver (and config.database can use the utils that read settings).
+"""
 
-__all__ = ['DB_CONFIG', 'get_db_connection', 'API_CONFIG', 'RISK_THRESHOLDS', 'FOOD_CATEGORIES']
\ No newline at end of file
+import importlib
+
+_EXPORTS = {
+    'DB_CONFIG': 'database',
+    'get_db_connection': 'database',
+    'API_CONFIG': 'settings',
+    'RISK_THRESHOLDS': 'settings',
+    'FOOD_CATEGORIES': 'settings',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
@@ -5,6 +5,9 @@ from typing import Optional
 import os
 from dotenv import load_dotenv
 
+from utils.metrics import DB_CONNECTIONS
+from utils.tracing import span
+
 load_dotenv()
 
 # MySQL database configuration
@@ -26,8 +29,11 @@ def get_db_connection(use_database: bool = True) -> Optional[mysql.connector.con
         else:
             config = DB_CONFIG.copy()
             config.pop('database', None)  # Remove database if not needed
-        connection = mysql.connector.connect(**config)
+        with span('db.connect', host=config['host']):
+            connection = mysql.connector.connect(**config)
+        DB_CONNECTIONS.inc('opened')
         return connection
     except Error as e:
+        DB_CONNECTIONS.inc('failed')
         print(f"Error connecting to MySQL: {e}")
         return None
\ No newline at end of file
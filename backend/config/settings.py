@@ -1,12 +1,14 @@
 """ Application settings and configuration constants """
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 #USDA API Configuration
 API_CONFIG = {
     'api_key': os.getenv('USDA_API_KEY'),
-    'base_url': "https://api.nal.usda.gov/fdc/v1"
+    'base_url': "https://api.nal.usda.gov/fdc/v1",
+    'request_budget': 950, # USDA calls per process before falling back to Wikipedia (keys allow 1,000/hour)
 }
 
 #Risk threshholds (per 100g)
@@ -26,7 +28,75 @@ FOOD_CATEGORIES = {
     'grains': ['quinoa', 'brown rice', 'oats', 'whole wheat bread'],
     'proteins': ['chicken breast', 'salmon', 'tofu', 'lentils', 'eggs'],
     'dairy': ['Greek yogurt', 'cottage cheese', 'almond milk'],
-    'snacks': ['nuts', 'seeds', 'air-popped popcorn', 'dark chocolate']
+    'snacks': ['nuts', 'seeds', 'air-popped popcorn', 'dark chocolate'],
+    'beverages': ['water', 'sparkling water', 'unsweetened tea', 'black coffee']
+}
+
+# Keyword taxonomy compiled by utils.food_categorizer into a token index.
+# Keywords match whole words or phrases of a food description, singular or plural; suffixes
+# also match the end of a compound word (strawberry, cornbread). The longest matching phrase
+# wins, and equally long matches go to the category listed first. Descriptions matching
+# nothing get the default category.
+# Set FOOD_TAXONOMY_FILE to a JSON file with the same structure to override this taxonomy.
+FOOD_TAXONOMY = {
+    'default': 'unknown',
+    'categories': [
+        {'name': 'fruits',
+         'keywords': ['apple', 'banana', 'orange', 'berry', 'grape', 'fruit', 'citrus', 'mango', 'pineapple',
+                      'pear', 'peach', 'plum', 'cherry', 'apricot', 'kiwi', 'lemon', 'lime', 'melon', 'watermelon',
+                      'papaya', 'fig', 'date', 'raisin', 'prune', 'avocado', 'pomegranate', 'nectarine',
+                      'tangerine', 'clementine', 'applesauce', 'fruit cocktail', 'fruit salad'],
+         'suffixes': ['berry', 'fruit', 'melon']},
+        {'name': 'vegetables',
+         'keywords': ['broccoli', 'spinach', 'carrot', 'lettuce', 'tomato', 'pepper', 'onion', 'vegetable',
+                      'cabbage', 'cauliflower', 'celery', 'cucumber', 'zucchini', 'squash', 'pumpkin', 'kale',
+                      'potato', 'sweet potato', 'corn', 'pea', 'green bean', 'asparagus', 'eggplant', 'mushroom',
+                      'garlic', 'beet', 'radish', 'turnip', 'okra', 'artichoke', 'brussels sprout', 'leek',
+                      'salad', 'greens', 'french fries'],
+         'suffixes': []},
+        {'name': 'grains',
+         'keywords': ['bread', 'rice', 'pasta', 'cereal', 'wheat', 'oat', 'quinoa', 'barley', 'flour', 'noodle',
+                      'spaghetti', 'macaroni', 'tortilla', 'bagel', 'muffin', 'pancake', 'waffle',
+                      'couscous', 'bulgur', 'millet', 'rye', 'granola', 'oatmeal', 'bun', 'roll', 'pita',
+                      'croissant', 'biscuit', 'grits', 'cornmeal', 'pizza', 'pasta salad', 'macaroni salad'],
+         'suffixes': ['bread', 'meal']},
+        {'name': 'proteins',
+         'keywords': ['chicken', 'beef', 'fish', 'egg', 'meat', 'pork', 'turkey', 'salmon', 'tuna', 'lamb',
+                      'veal', 'ham', 'bacon', 'sausage', 'steak', 'shrimp', 'crab', 'lobster', 'cod', 'tilapia',
+                      'sardine', 'trout', 'duck', 'tofu', 'tempeh', 'lentil', 'bean', 'chickpea', 'hummus',
+                      'jerky', 'hot dog', 'frankfurter', 'hamburger', 'burger', 'meatball', 'venison', 'seafood',
+                      'chicken salad', 'tuna salad', 'egg salad'],
+         'suffixes': ['burger', 'fish']},
+        {'name': 'dairy',
+         'keywords': ['milk', 'cheese', 'yogurt', 'cream', 'butter', 'cottage cheese', 'ice cream', 'kefir',
+                      'whey', 'cheddar', 'mozzarella', 'parmesan', 'ricotta', 'feta', 'brie', 'custard',
+                      'sour cream', 'cream cheese', 'buttermilk', 'ghee', 'dairy'],
+         'suffixes': ['milk']},
+        {'name': 'snacks',
+         'keywords': ['chips', 'crackers', 'nuts', 'seeds', 'popcorn', 'chocolate', 'candy', 'peanut',
+                      'peanut butter', 'almond', 'cashew', 'walnut', 'pecan', 'pistachio', 'pretzel', 'cookie',
+                      'cake', 'brownie', 'donut', 'doughnut', 'pie', 'pastry', 'snack', 'bar', 'trail mix',
+                      'potato chips', 'tortilla chips', 'gummy', 'licorice', 'marshmallow', 'fudge'],
+         'suffixes': ['nut', 'seed', 'cake']},
+        {'name': 'beverages',
+         'keywords': ['juice', 'soda', 'cola', 'coffee', 'tea', 'water', 'beverage', 'drink', 'lemonade',
+                      'smoothie', 'beer', 'wine', 'energy drink', 'sports drink', 'soft drink'],
+         'suffixes': []},
+    ]
+}
+FOOD_TAXONOMY_FILE = os.getenv('FOOD_TAXONOMY_FILE')
+
+# Nutrient scales used to normalize foods for the alternatives index (per 100g)
+NUTRIENT_SCALES = {
+    'calories_per_100g': 900.0, # pure fat upper bound
+    'sugar_g': RISK_THRESHOLDS['sugar_high'],
+    'saturated_fat_g': RISK_THRESHOLDS['sat_fat_high'],
+    'sodium_mg': RISK_THRESHOLDS['sodium_high'],
+}
+
+# Healthier alternatives lookup
+ALTERNATIVES_CONFIG = {
+    'max_alternatives': 5, # k nearest healthier foods returned
 }
 
 # Disease risk thresholds and weights
@@ -53,6 +123,200 @@ DISEASE_THRESHOLDS = {
     }
 }
 
+# Cohort (bulk) lifestyle risk scoring
+COHORT_CONFIG = {
+    'max_profiles': 10000, # largest cohort accepted in one request
+}
+
+# Monte Carlo uncertainty for lifestyle assessments
+UNCERTAINTY_CONFIG = {
+    'default_draws': 10000,
+    'max_draws': 50000,
+    'interval': 0.90, # central interval reported for each risk
+    'portion_cv': 0.25, # spread of entered portion sizes (coefficient of variation)
+    'nutrient_cv': { # spread of per-100g nutrient values by data source
+        'api': 0.05,
+        'db': 0.05,
+        'user': 0.20,
+        'wikipedia': 0.35,
+        'default': 0.15
+    },
+    'seed': None # set for reproducible draws
+}
+
+# Diet substitution optimizer
+OPTIMIZER_CONFIG = {
+    'default_target_level': 'moderate', # every disease should end at or below this level
+    'max_changes': 5, # most swaps/portion changes suggested
+    'portion_factors': [0.5, 0.0], # portion changes considered: halve, remove
+    'portion_change_penalty': 0.01, # tie-break in favour of swaps over cutting portions
+    'excess_weight': 0.1, # weight of nutrient excess over daily limits, guides search past capped scores
+}
+
+# Per-day intake aggregation for lifestyle assessments
+INTAKE_CONFIG = {
+    'rolling_window_days': 3, # window for the worst rolling daily average
+}
+
+# Incremental assessment sessions
+SESSION_CONFIG = {
+    'ttl_seconds': 1800, # idle sessions expire after this long
+    'max_sessions': 1000, # least recently used sessions are evicted beyond this
+    'max_entries': 500, # intake entries kept per session
+}
+
+# Async (ASGI) serving mode, see asgi.py
+ASYNC_CONFIG = {
+    'db_pool_min': 1,
+    'db_pool_max': 20, # MySQL connections shared by all in-flight requests
+    'http_connections': 100, # concurrent outbound USDA connections
+    'http_timeout_s': 10,
+    'wikipedia_concurrency': 8, # the wikipedia client blocks, so it runs on this many threads at most
+}
+
+# Streaming /api/analyze-foods responses
+STREAM_CONFIG = {
+    'lookup_workers': 4, # foods looked up concurrently by the Flask server while streaming
+}
+
+# In-process cache of resolved foods (refreshed when this process saves a food)
+NUTRITION_CACHE_CONFIG = {
+    'max_entries': 5000,
+    'ttl_seconds': 300, # bounds staleness for foods changed by other processes
+}
+
+# Cache-Control policies of cacheable GET endpoints (responses also carry strong ETags)
+HTTP_CACHE_CONFIG = {
+    'food_info': 'public, max-age=300, stale-while-revalidate=60',
+    'demo': 'public, max-age=3600',
+}
+
+# API response encoding (JSON or MessagePack by Accept, compressed by Accept-Encoding)
+SERIALIZATION_CONFIG = {
+    'compress_min_bytes': 1024, # smaller bodies are sent uncompressed
+    'gzip_level': 6,
+    'brotli_quality': 4, # fast setting; 11 compresses ~10% smaller at many times the CPU
+}
+
+# Batch analysis jobs queued in the database (/api/jobs)
+JOB_CONFIG = {
+    'job_types': ('foods', 'lifestyle'),
+    'workers': 4, # worker threads per process; each looks up one food at a time
+    'batch_size': 20, # foods claimed from the queue per round trip
+    'poll_interval_s': 1.0, # idle workers check the queue this often
+    'lease_seconds': 600, # foods claimed longer ago than this are requeued (worker crashed)
+    'max_items': 10000, # foods per job
+    'max_days': 366, # days tracked per lifestyle job
+}
+
+# Offline batch processing of diary and food files (main.py batch)
+BATCH_CONFIG = {
+    'chunk_size': 16, # records sent to a worker process at a time
+    'chunks_in_flight': 4, # per worker; bounds memory however large the input
+    'checkpoint_every': 500, # records written between checkpoints
+    'progress_interval_s': 5.0,
+}
+
+# Micro-benchmarks of the scoring, aggregation and lookup hot paths (python -m benchmarks)
+BENCHMARK_CONFIG = {
+    'catalog_size': 5000, # synthetic foods in the SQLite stand-in catalog
+    'diaries': 200, # synthetic profile + diary pairs cycled through
+    'diary_entries': 60, # entries per diary
+    'days_tracked': 7,
+    'seed': 42,
+    'warmup_s': 0.2,
+    'min_time_s': 1.0, # timed per round
+    'rounds': 3, # the fastest round is reported
+    'max_iterations': 200000, # bounds the recorded latencies of very fast benchmarks
+    'regression_threshold': 0.10, # ops/s drop against the baseline that counts as a regression
+    'baseline_path': os.getenv('BENCHMARK_BASELINE', 'benchmarks/baseline.json'),
+}
+
+# Runtime metrics (/metrics, /api/nutrition-stats)
+METRICS_CONFIG = {
+    'latency_buckets_s': (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+}
+
+# Request tracing: Server-Timing headers, debug breakdowns and OTLP/JSON span export
+TRACING_CONFIG = {
+    'sample_rate': float(os.getenv('TRACE_SAMPLE_RATE', '0.0')), # share of requests traced and exported
+    'export_path': os.getenv('TRACE_EXPORT_PATH'), # append sampled traces here, one OTLP/JSON request per line
+    'export_url': os.getenv('TRACE_EXPORT_URL'), # and/or POST them to an OTLP/HTTP collector (.../v1/traces)
+    'export_timeout_s': 2.0,
+    'export_queue': 1000, # finished traces waiting for export; more are dropped
+    'debug_payload': True, # requests with ?debug=trace or X-Debug-Trace: 1 are traced and get the breakdown
+    'max_spans': 2000, # spans kept per request
+    'service_name': 'food-health-api',
+}
+
+# Admin endpoints (/api/admin/...) require this value in the X-Admin-Token header; unset disables them
+ADMIN_CONFIG = {
+    'token': os.getenv('ADMIN_TOKEN'),
+}
+
+# On-demand sampling profiler (POST /api/admin/profile, main.py --profile)
+PROFILER_CONFIG = {
+    'default_seconds': 30,
+    'max_seconds': 300,
+    'interval_ms': 10, # time between stack samples
+    'min_interval_ms': 1,
+    'top_n': 25, # functions and allocation sites listed in summaries
+    'tracemalloc_frames': 1, # frames kept per allocation; more is slower
+    'output_dir': os.getenv('PROFILE_DIR', 'profiles'),
+}
+
+# Frontend page and static files, loaded into memory and precompressed when the app is created
+STATIC_CONFIG = {
+    'url_prefix': '/static',
+    'hash_length': 12, # hex digits of the content hash in asset URLs
+    'brotli_quality': 11, # compressed once per file, so the slowest and smallest settings
+    'gzip_level': 9,
+    'watch': os.getenv('STATIC_WATCH', '0') == '1', # reload changed files (development)
+    'watch_interval_s': 1.0,
+    'hashed_cache_control': 'public, max-age=31536000, immutable',
+    'plain_cache_control': 'public, max-age=300', # unhashed static URLs
+    'index_cache_control': 'no-cache', # revalidated with its ETag so new asset hashes are picked up
+}
+
+# Whole-response cache for repeated /api/analyze-foods and /api/lifestyle-assessment bodies
+RESULT_CACHE_CONFIG = {
+    'enabled': os.getenv('RESULT_CACHE_ENABLED', '1') != '0',
+    'max_entries': 2000,
+    'max_bytes': 64 * 1024 * 1024, # payloads plus their encoded bodies
+    'max_representations': 4, # encoded bodies kept per entry (JSON/MessagePack x compression)
+    'ttl_seconds': 300, # bounds staleness for foods changed by other processes
+    # Repeat the database writes of a computed response (risk assessments; profile, diary and disease risks) on hits
+    'persist_on_hit': os.getenv('RESULT_CACHE_PERSIST_ON_HIT', '0') == '1',
+}
+
+# Per-client token buckets (API key or IP) checked before a request does any work
+RATE_LIMIT_CONFIG = {
+    'enabled': os.getenv('RATE_LIMIT_ENABLED', '1') != '0',
+    'refill_per_s': 5.0, # tokens a client earns per second
+    'burst': 150.0, # bucket size; a request costing more waits for a full bucket and empties it
+    'costs': {
+        'request': 1.0, # every admitted request
+        'cached_lookup': 0.2, # per unique food already in this worker's nutrition cache
+        'uncached_lookup': 5.0, # per other food (database, USDA quota, Wikipedia)
+    },
+    # Known API keys (X-API-Key); other keys are ignored so clients cannot mint fresh buckets
+    'api_keys': frozenset(key.strip() for key in os.getenv('RATE_LIMIT_API_KEYS', '').split(',') if key.strip()),
+    'trust_forwarded_for': os.getenv('RATE_LIMIT_TRUST_FORWARDED_FOR', '0') == '1', # behind a reverse proxy
+    # SQLite file shared by every worker on the host; 'memory' keeps buckets per process
+    'store': os.getenv('RATE_LIMIT_STORE', os.path.join(tempfile.gettempdir(), 'foodhealth-ratelimit.sqlite3')),
+    'store_timeout_s': 0.05, # a busier store is skipped (the local bucket decides)
+    'idle_seconds': 3600, # buckets unused this long are dropped
+    'exempt_paths': ('/api/health', '/metrics', '/api/admin/', '/static/'), # prefixes never limited or shed
+}
+
+# Global per-process concurrency limit; requests queued past the target latency are shed
+ADMISSION_CONFIG = {
+    'max_concurrent': int(os.getenv('MAX_CONCURRENT_REQUESTS', '32')),
+    'max_queue': 64, # requests waiting for a slot; more are rejected at once
+    'queue_target_ms': 250, # longest wait for a slot before the request is shed with 503
+    'retry_after_s': 1, # Retry-After sent with 503
+}
+
 # Activity level multipliers for calorie calculation
 ACTIVITY_MULTIPLIERS = {
     'sedentary': 1.2,
@@ -60,4 +324,119 @@ ACTIVITY_MULTIPLIERS = {
     'moderate': 1.55,
     'active': 1.725,
     'very_active': 1.9
-}
\ No newline at end of file
+}
+
+# Declarative lifestyle disease rules, compiled by utils.disease_rules.
+# Steps run in order on a score starting at 0: 'add' steps add points, 'multiply' steps scale
+# the running score. Within a step the first branch whose condition holds applies.
+# Conditions compare a metric (bmi, age, calories, sugar_g, saturated_fat_g, sodium_mg,
+# calorie_surplus, family_history, family_history_text, and the peak-day intake
+# peak_calories, peak_sugar_g, peak_saturated_fat_g, peak_sodium_mg) using gte/gt/lte/lt/contains_any;
+# a threshold given per gender may carry a 'default'. Points are a number or an 'excess'
+# spec: min(max, (metric - over) * rate). Factor labels are formatted with the metrics
+# and the matched {threshold}. Levels are the exclusive upper bounds of low/moderate/high.
+# Set DISEASE_RULES_FILE to a JSON file with the same structure to override these rules.
+DISEASE_RULES_FILE = os.getenv('DISEASE_RULES_FILE')
+
+DISEASE_RULES = [
+    {
+        'disease_name': 'Type 2 Diabetes',
+        'weight': 0.3,
+        'steps': [
+            {'op': 'add', 'branches': [
+                {'when': {'metric': 'bmi', 'gte': 30}, 'points': 30, 'factor': 'Obesity (BMI ≥ 30)'},
+                {'when': {'metric': 'bmi', 'gte': DISEASE_THRESHOLDS['diabetes']['bmi_threshold']},
+                 'points': 15, 'factor': 'Overweight (BMI 25-29.9)'}
+            ]},
+            {'op': 'add', 'when': {'metric': 'age', 'gte': 45}, 'points': 10, 'factor': 'Age ≥ {threshold} years'},
+            {'op': 'add', 'when': {'metric': 'sugar_g', 'gt': DISEASE_THRESHOLDS['diabetes']['daily_sugar_g']},
+             'points': {'excess': 'sugar_g', 'over': DISEASE_THRESHOLDS['diabetes']['daily_sugar_g'], 'rate': 0.5, 'max': 25},
+             'factor': 'High sugar intake ({sugar_g:.1f}g/day)'},
+            {'op': 'multiply', 'when': {'metric': 'family_history', 'contains_any': ['diabetes']},
+             'by': DISEASE_THRESHOLDS['diabetes']['family_history_multiplier'], 'factor': 'Family history of diabetes'}
+        ],
+        'cap': 100,
+        'levels': [20, 40, 70],
+        'recommendations': [
+            "Reduce daily sugar intake to <50g",
+            "Maintain healthy weight (BMI 18.5-24.9)",
+            "Exercise regularly (150+ minutes/week)",
+            "Monitor blood glucose levels"
+        ]
+    },
+    {
+        'disease_name': 'Hypertension',
+        'weight': 0.35,
+        'steps': [
+            {'op': 'add', 'when': {'metric': 'age', 'gte': {'male': DISEASE_THRESHOLDS['hypertension']['age_threshold'], 'default': 55}},
+             'points': 15, 'factor': 'Age ≥ {threshold} years'},
+            {'op': 'add', 'when': {'metric': 'bmi', 'gte': DISEASE_THRESHOLDS['hypertension']['bmi_threshold']},
+             'points': 20, 'factor': 'Overweight/Obese'},
+            {'op': 'add', 'when': {'metric': 'sodium_mg', 'gt': DISEASE_THRESHOLDS['hypertension']['daily_sodium_mg']},
+             'points': {'excess': 'sodium_mg', 'over': DISEASE_THRESHOLDS['hypertension']['daily_sodium_mg'], 'rate': 0.01, 'max': 30},
+             'factor': 'High sodium intake ({sodium_mg:.0f}mg/day)'},
+            {'op': 'add', 'when': {'metric': 'family_history', 'contains_any': ['hypertension', 'high blood pressure']},
+             'points': 15, 'factor': 'Family history of hypertension'}
+        ],
+        'cap': 100,
+        'levels': [25, 50, 75],
+        'recommendations': [
+            "Reduce sodium intake to <2,300mg/day",
+            "Maintain healthy weight",
+            "Regular aerobic exercise",
+            "Limit alcohol consumption",
+            "Manage stress levels"
+        ]
+    },
+    {
+        'disease_name': 'Heart Disease',
+        'weight': 0.35,
+        'steps': [
+            {'op': 'add', 'when': {'metric': 'age', 'gte': {'male': 45, 'female': 55}}, 'points': 10, 'factor': 'Advanced age'},
+            {'op': 'add', 'when': {'metric': 'bmi', 'gte': DISEASE_THRESHOLDS['heart_disease']['bmi_threshold']},
+             'points': 15, 'factor': 'Overweight/Obese'},
+            {'op': 'add', 'when': {'metric': 'saturated_fat_g', 'gt': DISEASE_THRESHOLDS['heart_disease']['daily_sat_fat_g']},
+             'points': {'excess': 'saturated_fat_g', 'over': DISEASE_THRESHOLDS['heart_disease']['daily_sat_fat_g'], 'rate': 2, 'max': 25},
+             'factor': 'High saturated fat intake ({saturated_fat_g:.1f}g/day)'},
+            {'op': 'add', 'when': {'metric': 'sodium_mg', 'gt': DISEASE_THRESHOLDS['heart_disease']['daily_sodium_mg']},
+             'points': 10, 'factor': 'High sodium intake'},
+            {'op': 'multiply', 'when': {'metric': 'family_history_text', 'contains_any': ['heart disease', 'cardiac', 'heart attack', 'coronary']},
+             'by': DISEASE_THRESHOLDS['heart_disease']['family_history_multiplier'], 'factor': 'Family history of heart disease'}
+        ],
+        'cap': 100,
+        'levels': [20, 40, 70],
+        'recommendations': [
+            "Reduce saturated fat to <13g/day",
+            "Increase omega-3 fatty acids",
+            "Regular cardiovascular exercise",
+            "Don't smoke",
+            "Control cholesterol levels"
+        ]
+    },
+    {
+        'disease_name': 'Obesity',
+        'weight': 0.0,  # reported alongside, not part of the overall score
+        'steps': [
+            {'op': 'add', 'branches': [
+                {'when': {'metric': 'bmi', 'gte': DISEASE_THRESHOLDS['obesity']['bmi_threshold']},
+                 'points': 40, 'factor': 'Obesity (BMI ≥ {threshold})'},
+                {'when': {'metric': 'bmi', 'gte': 25}, 'points': 20, 'factor': 'Overweight (BMI 25-29.9)'}
+            ]},
+            {'op': 'add', 'when': {'metric': 'calorie_surplus', 'gt': DISEASE_THRESHOLDS['obesity']['daily_calories_excess']},
+             'points': {'excess': 'calorie_surplus', 'over': 0, 'rate': 0.03, 'max': 30},
+             'factor': 'Calorie surplus ({calorie_surplus:.0f} cal/day above maintenance)'},
+            {'op': 'add', 'when': {'metric': 'sugar_g', 'gt': DISEASE_THRESHOLDS['diabetes']['daily_sugar_g']},
+             'points': 10, 'factor': 'High sugar intake ({sugar_g:.1f}g/day)'},
+            {'op': 'multiply', 'when': {'metric': 'family_history', 'contains_any': ['obesity']},
+             'by': 1.5, 'factor': 'Family history of obesity'}
+        ],
+        'cap': 100,
+        'levels': [20, 40, 70],
+        'recommendations': [
+            "Aim for a daily calorie intake at or below maintenance",
+            "Maintain healthy weight (BMI 18.5-24.9)",
+            "Exercise regularly (150+ minutes/week)",
+            "Limit sugary drinks and energy-dense snacks"
+        ]
+    }
+]
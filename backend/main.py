@@ -1,19 +1,39 @@
 # main.py
 """Main CLI interface for Food Health App using modular components"""
 
-from services.nutrition_service import NutritionService
-from services.risk_assessment_service import RiskAssessmentService
-from services.disease_prediction_service import DiseasePredictionService
+import argparse
+import json
+import sys
+
+from services.container import ServiceContainer
+from services.batch_service import BATCH_KINDS, BatchInputError, BatchRunner
 from models.user import UserProfile
 from models.nutrition import DietaryPattern
+from utils.validators import InputValidator
+from utils.profiler import SamplingProfiler
+from config.settings import PROFILER_CONFIG
 
 class FoodHealthCLI:
     """Command Line Interface for Food Health App"""
     
     def __init__(self):
-        self.nutrition_service = NutritionService()
-        self.risk_service = RiskAssessmentService()
-        self.disease_service = DiseasePredictionService(self.nutrition_service)
+        # One database service (and schema check) shared by every service, as in the API
+        self.services = ServiceContainer()
+    
+    @property
+    def nutrition_service(self):
+        """Nutrition lookups, built on first use"""
+        return self.services.nutrition_service
+    
+    @property
+    def risk_service(self):
+        """Food risk scoring, built on first use"""
+        return self.services.risk_service
+    
+    @property
+    def disease_service(self):
+        """Lifestyle disease assessment, built on first use"""
+        return self.services.disease_service
     
     def collect_user_profile(self) -> UserProfile:
         """Collect user profile information"""
@@ -63,19 +83,20 @@ class FoodHealthCLI:
         days_tracked = int(input("How many days of food data do you want to provide? (recommended: 3-7): "))
         all_daily_foods = []
         all_portion_sizes = []
+        all_day_indices = []
+        all_meal_indices = []
         
         for day in range(days_tracked):
             print(f"\n--- Day {day + 1} ---")
-            daily_foods_input = input(f"Foods consumed on day {day + 1} (comma-separated): ")
-            daily_foods = [food.strip() for food in daily_foods_input.split(',')]
-            
-            portion_sizes = []
-            for food in daily_foods:
-                portion = float(input(f"Portion size of {food} (grams): ") or "100")
-                portion_sizes.append(portion)
+            daily_foods_input = input(f"Foods consumed on day {day + 1} (comma-separated, ';' between meals): ")
             
-            all_daily_foods.extend(daily_foods)
-            all_portion_sizes.extend(portion_sizes)
+            for meal, meal_input in enumerate(daily_foods_input.split(';')):
+                for food in [food.strip() for food in meal_input.split(',')]:
+                    portion = float(input(f"Portion size of {food} (grams): ") or "100")
+                    all_daily_foods.append(food)
+                    all_portion_sizes.append(portion)
+                    all_day_indices.append(day)
+                    all_meal_indices.append(meal)
         
         meal_frequency = int(input("Average number of meals per day: ") or "3")
         
@@ -83,7 +104,10 @@ class FoodHealthCLI:
             daily_foods=all_daily_foods,
             portion_sizes_g=all_portion_sizes,
             meal_frequency=meal_frequency,
-            days_tracked=days_tracked
+            days_tracked=days_tracked,
+            day_indices=all_day_indices,
+            # Meals are only known when the user separated them
+            meal_indices=all_meal_indices if max(all_meal_indices, default=0) > 0 else None
         )
     
     def run_lifestyle_assessment(self):
@@ -132,8 +156,94 @@ def demo_preview():
     results = cli.risk_service.analyze_foods(unhealthy_foods, cli.nutrition_service)
     cli.risk_service.print_summary_report(results)
 
+def run_cohort_assessment(input_path: str, output_path: str = None) -> bool:
+    """Score a columnar cohort JSON file and write the results as JSON"""
+    with open(input_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    is_valid, error_msg, profiles, intake = InputValidator.validate_cohort_data(data)
+    if not is_valid:
+        print(f"Cohort validation error: {error_msg}", file=sys.stderr)
+        return False
+    
+    cli = FoodHealthCLI()
+    results = cli.disease_service.assess_cohort(profiles, intake)
+    
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f)
+        print(f"✓ Scored {len(profiles['age'])} profiles -> {output_path}")
+    else:
+        json.dump(results, sys.stdout)
+        print()
+    return True
+
+def run_batch(args) -> bool:
+    """Run a batch subcommand; never prompts, so it can run unattended"""
+    runner = BatchRunner(args.kind, args.input, args.output, input_format=args.input_format,
+                         output_format=args.output_format, profiles_path=args.profiles, workers=args.workers,
+                         persist=not args.no_save, resume=args.resume)
+    try:
+        runner.run()
+    except BatchInputError as e:
+        print(f"Batch input error: {e}", file=sys.stderr)
+        return False
+    return True
+
+def parse_args(argv=None):
+    """Parse command line arguments; no subcommand starts the interactive menu"""
+    parser = argparse.ArgumentParser(description="Food Health Risk Assessment CLI")
+    parser.add_argument('--profile', type=float, metavar='SECONDS',
+                        help="Sample stacks for up to SECONDS (or until exit); "
+                             f"writes collapsed stacks to {PROFILER_CONFIG['output_dir']}/")
+    parser.add_argument('--profile-allocations', action='store_true',
+                        help="With --profile, also record the top allocation sites (slower)")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    cohort_parser = subparsers.add_parser('cohort', help="Bulk lifestyle risk scoring from a columnar JSON file")
+    cohort_parser.add_argument('input', help="JSON file with profile and daily intake columns")
+    cohort_parser.add_argument('-o', '--output', help="Write results to this file instead of stdout")
+    
+    batch_parser = subparsers.add_parser('batch', help="Process a food list or diary file without prompts")
+    batch_parser.add_argument('kind', choices=BATCH_KINDS,
+                              help="'foods': one food per record; 'lifestyle': one profile and diary per record")
+    batch_parser.add_argument('input', help="JSONL file, or CSV (a food column, or diary rows id,food,portion_g[,day,meal])")
+    batch_parser.add_argument('-o', '--output', required=True, help="Results file, JSONL or CSV by extension")
+    batch_parser.add_argument('--profiles', help="Profiles CSV (id,age,gender,weight,height,activity_level,...) for a diary CSV")
+    batch_parser.add_argument('--input-format', choices=('jsonl', 'csv'), help="Override the input file extension")
+    batch_parser.add_argument('--output-format', choices=('jsonl', 'csv'), help="Override the output file extension")
+    batch_parser.add_argument('-j', '--workers', type=int, default=0, help="Worker processes (default: one per CPU)")
+    batch_parser.add_argument('--resume', action='store_true', help="Continue an interrupted run from its checkpoint")
+    batch_parser.add_argument('--no-save', action='store_true', help="Do not store assessments in the database")
+    
+    return parser.parse_args(argv)
+
 def main():
     """Main function to run the food health app"""
+    args = parse_args()
+    if not args.profile:
+        run(args)
+        return
+    
+    profile = SamplingProfiler(args.profile, allocations=args.profile_allocations)
+    profile.start()
+    try:
+        run(args)
+    finally:
+        profile.stop()
+        if profile.status == 'completed':
+            for function in profile.top_functions()[:10]:
+                print(f"  {function['total_pct']:6.2f}% total {function['self_pct']:6.2f}% self  {function['function']}")
+            if profile.allocations:
+                print(f"  allocations -> {profile.allocations_path}")
+
+def run(args):
+    """Run the subcommand, or the interactive menu without one"""
+    if args.command == 'cohort':
+        sys.exit(0 if run_cohort_assessment(args.input, args.output) else 1)
+    if args.command == 'batch':
+        sys.exit(0 if run_batch(args) else 1)
+    
     cli = FoodHealthCLI()
     
     print("🍎 Food Health Risk Assessment App")
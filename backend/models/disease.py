@@ -1,7 +1,7 @@
 """ Disease-related data models """
 
-from dataclasses import dataclass
-from typing import List, Dict
+from dataclasses import dataclass, field
+from typing import Any, List, Dict, Optional
 from .user import UserProfile
 from .nutrition import DietaryPattern
 
@@ -23,3 +23,9 @@ class LifestyleDiseaseAssessment:
     overall_risk_score: float
     key_dietary_factors: Dict[str, float]
     intervention_priority: List[str]
+    maintenance_calories: float = 0.0
+    daily_intake: Dict[str, float] = field(default_factory=dict)
+    food_contributions: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    uncertainty: Optional[Dict[str, Any]] = None
+    intake_summary: Dict[str, Any] = field(default_factory=dict)
+    food_attribution: List[Dict[str, Any]] = field(default_factory=list)
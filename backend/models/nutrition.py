@@ -1,7 +1,7 @@
 """ Nutrition-related data models """
 
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 @dataclass
 class NutritionInfo:
@@ -29,4 +29,7 @@ class DietaryPattern:
     daily_foods: List[str]
     portion_sizes_g: List[float]
     meal_frequency: int
-    days_tracked: int
\ No newline at end of file
+    days_tracked: int
+    # Optional zero-based day and meal of each entry in daily_foods
+    day_indices: Optional[List[int]] = None
+    meal_indices: Optional[List[int]] = None
\ No newline at end of file
@@ -1,8 +1,23 @@
-""" Services package for Food Health App """
+""" Services package for Food Health App
 
-from .nutrition_service import NutritionService
-from .risk_assessment_service import RiskAssessmentService
-from .disease_prediction_service import DiseasePredictionService
-# from .database_service import DatabaseService
+Service classes are imported on first attribute access, so importing one service module
+does not pull in the others (and their HTTP, scraping and numeric dependencies).
+"""
 
-__all__ = ['NutritionService', 'RiskAssessmentService', 'DiseasePredictionService', 'DatabaseService']
\ No newline at end of file
+import importlib
+
+_EXPORTS = {
+    'NutritionService': 'nutrition_service',
+    'RiskAssessmentService': 'risk_assessment_service',
+    'DiseasePredictionService': 'disease_prediction_service',
+    'DatabaseService': 'database_service',
+    'ServiceContainer': 'container',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
@@ -0,0 +1,179 @@
+""" Stateful lifestyle assessment sessions updated one intake entry at a time """
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config.settings import SESSION_CONFIG
+from models.user import UserProfile
+from services.disease_prediction_service import INTAKE_FIELDS
+from services.errors import SessionNotFoundError
+
+
+class AssessmentSession:
+    """ Running state for one user's diary: profile-derived values plus nutrient totals over all entries """
+
+    def __init__(self, session_id: str, profile: UserProfile, bmi: float, maintenance_calories: float,
+                 days_tracked: int, meal_frequency: int):
+        self.session_id = session_id
+        self.profile = profile
+        self.bmi = bmi
+        self.maintenance_calories = maintenance_calories
+        self.days_tracked = days_tracked
+        self.meal_frequency = meal_frequency
+        # entry_id -> (food, grams, nutrients contributed over the whole diary, resolved)
+        self.entries: Dict[str, tuple] = {}
+        self.totals = [0.0] * len(INTAKE_FIELDS)
+        self.last_access = time.monotonic()
+        self._next_entry = 1
+        # Held across every read or change of the entries and totals; requests run on threads
+        self.lock = threading.Lock()
+
+    def add(self, food: str, grams: float, per_100g: Optional[List[float]]) -> str:
+        """ Add an entry's nutrients to the running totals; unknown foods (None) contribute nothing (lock held) """
+        entry_id = str(self._next_entry)
+        self._next_entry += 1
+        nutrients = [value * grams / 100 for value in per_100g or [0.0] * len(INTAKE_FIELDS)]
+        self.entries[entry_id] = (food, grams, nutrients, per_100g is not None)
+        self.totals = [total + value for total, value in zip(self.totals, nutrients)]
+        return entry_id
+
+    def remove(self, entry_id: str) -> bool:
+        """ Subtract an entry's nutrients from the running totals (lock held) """
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return False
+        if self.entries:
+            self.totals = [total - value for total, value in zip(self.totals, entry[2])]
+        else:
+            # Reset exactly rather than carry floating point residue into an empty diary
+            self.totals = [0.0] * len(INTAKE_FIELDS)
+        return True
+
+    def daily_intake(self) -> Dict[str, float]:
+        """ Average daily intake from the running totals (lock held) """
+        return {key: max(0.0, total / self.days_tracked) for key, total in zip(INTAKE_FIELDS, self.totals)}
+
+
+class AssessmentSessionService:
+    """ Keeps assessment sessions in memory so each diary edit re-scores in constant time.
+
+    Profile-derived values (BMI, maintenance calories) are computed once per session and
+    nutrient totals are updated per entry, so re-scoring only evaluates the disease rules
+    on the current daily intake regardless of diary length. Idle sessions expire after
+    ttl_seconds and the least recently used are evicted beyond max_sessions. Sessions are
+    not persisted; a final assessment can still be saved through /api/lifestyle-assessment.
+    """
+
+    def __init__(self, disease_service, config: Optional[Dict[str, Any]] = None):
+        self.disease_service = disease_service
+        self.config = config or SESSION_CONFIG
+        self._sessions: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create_session(self, profile: UserProfile, days_tracked: int = 1, meal_frequency: int = 3) -> AssessmentSession:
+        """ Start a session for a profile with an empty diary """
+        calculator = self.disease_service.health_calculator
+        session = AssessmentSession(
+            session_id=uuid.uuid4().hex,
+            profile=profile,
+            bmi=calculator.calculate_bmi(profile.weight_kg, profile.height_cm),
+            maintenance_calories=calculator.calculate_daily_maintenance_calories(profile),
+            days_tracked=days_tracked,
+            meal_frequency=meal_frequency
+        )
+        with self._lock:
+            self._expire()
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.config['max_sessions']:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get_session(self, session_id: str) -> AssessmentSession:
+        """ Return a live session and mark it as recently used """
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise SessionNotFoundError(session_id)
+            session.last_access = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete_session(self, session_id: str) -> bool:
+        """ Drop a session """
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def add_intake(self, session_id: str, food: str, grams: float) -> Optional[str]:
+        """ Add a food entry; returns its entry id, or None when the session is full """
+        session = self.get_session(session_id)
+        if len(session.entries) >= self.config['max_entries']:
+            return None
+        # A food no source knows is recorded as unresolved rather than prompting on the server's stdin
+        nutrition_info = self.disease_service.nutrition_service.get_food_nutrition(food, interactive=False)
+        per_100g = self.disease_service.nutrient_vector(nutrition_info) if nutrition_info else None
+        # The lookup runs unlocked; the limit is checked again with the entry added atomically
+        with session.lock:
+            if len(session.entries) >= self.config['max_entries']:
+                return None
+            return session.add(food, grams, per_100g)
+
+    def remove_intake(self, session_id: str, entry_id: str) -> bool:
+        """ Remove a food entry; returns False if it does not exist """
+        session = self.get_session(session_id)
+        with session.lock:
+            return session.remove(entry_id)
+
+    def get_result(self, session_id: str, include_entries: bool = False) -> Dict[str, Any]:
+        """ Current risk assessment for a session; the entry list is only included on request """
+        session = self.get_session(session_id)
+        disease_service = self.disease_service
+        # Snapshot the entries and totals together so a concurrent add or remove cannot tear them
+        with session.lock:
+            daily_intake = session.daily_intake()
+            entries = list(session.entries.items())
+        disease_risks = disease_service.predict_disease_risks(
+            session.profile, daily_intake, session.bmi, session.maintenance_calories)
+        key_dietary_factors, intervention_priority = disease_service.dietary_factors(
+            daily_intake, session.maintenance_calories)
+
+        result = {
+            'session_id': session.session_id,
+            'entry_count': len(entries),
+            'days_tracked': session.days_tracked,
+            'bmi': session.bmi,
+            'maintenance_calories': session.maintenance_calories,
+            'dietary_analysis': daily_intake,
+            'disease_risks': [
+                {
+                    'disease_name': risk.disease_name,
+                    'risk_percentage': risk.risk_percentage,
+                    'risk_level': risk.risk_level,
+                    'contributing_factors': risk.contributing_factors,
+                    'recommendations': risk.recommendations
+                }
+                for risk in disease_risks
+            ],
+            'overall_risk_score': disease_service.overall_risk_score(disease_risks),
+            'key_dietary_factors': key_dietary_factors,
+            'intervention_priority': intervention_priority
+        }
+        if include_entries:
+            result['entries'] = [
+                {'entry_id': entry_id, 'food': food, 'portion_g': grams, 'resolved': resolved}
+                for entry_id, (food, grams, _, resolved) in entries
+            ]
+        return result
+
+    def _expire(self):
+        """ Drop sessions idle longer than the TTL; callers hold the lock """
+        cutoff = time.monotonic() - self.config['ttl_seconds']
+        # Sessions are kept in access order, so expired ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_access >= cutoff:
+                break
+            self._sessions.popitem(last=False)
@@ -0,0 +1,136 @@
+""" Non-blocking database operations for the async serving mode """
+
+from typing import Dict, Optional
+
+import aiomysql
+
+from config.database import DB_CONFIG
+from config.settings import ASYNC_CONFIG
+from utils.tracing import traced
+from models.nutrition import NutritionInfo, RiskAssessment, DietaryPattern
+from models.disease import DiseaseRisk
+from models.user import UserProfile
+from services.database_service import (
+    DatabaseService, SELECT_FOOD_SQL, UPSERT_FOOD_SQL, INSERT_RISK_ASSESSMENT_SQL, INSERT_USER_PROFILE_SQL,
+    INSERT_DIETARY_PATTERN_SQL, INSERT_DISEASE_ASSESSMENT_SQL, INSERT_USER_QUERY_SQL, food_params,
+    risk_assessment_params, user_profile_params, dietary_pattern_params, disease_assessment_params
+)
+
+
+class AsyncDatabaseService:
+    """ aiomysql connection pool running the same statements as DatabaseService.
+
+    Schema creation stays with the blocking DatabaseService; saved foods are reported to its
+    listeners so in-memory indexes stay in sync whichever mode wrote them.
+    """
+
+    def __init__(self, db_service: DatabaseService):
+        self.db_service = db_service
+        self.pool = None
+
+    async def start(self):
+        """ Open the connection pool """
+        try:
+            self.pool = await aiomysql.create_pool(
+                host=DB_CONFIG['host'],
+                port=int(DB_CONFIG['port']),
+                user=DB_CONFIG['user'],
+                password=DB_CONFIG['password'] or '',
+                db=DB_CONFIG['database'],
+                minsize=ASYNC_CONFIG['db_pool_min'],
+                maxsize=ASYNC_CONFIG['db_pool_max'],
+                autocommit=True
+            )
+        except Exception as e:
+            print(f"Error connecting to MySQL: {e}")
+            self.pool = None
+
+    async def close(self):
+        """ Close the connection pool """
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    def pool_stats(self) -> Optional[Dict[str, int]]:
+        """ Connections open, idle and allowed in the pool; None before start() or if MySQL was unreachable """
+        if self.pool is None:
+            return None
+        return {'size': self.pool.size, 'free': self.pool.freesize, 'max': self.pool.maxsize}
+
+    async def _execute(self, query: str, params: tuple, fetch: bool = False):
+        """ Run one statement; returns the first row when fetching, else the last row id """
+        if self.pool is None:
+            return None
+        async with self.pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.execute(query, params)
+                if fetch:
+                    return await cursor.fetchone()
+                return cursor.lastrowid
+
+    @traced('db.get_food_from_db')
+    async def get_food_from_db(self, food_name: str) -> Optional[NutritionInfo]:
+        """Get food from database"""
+        try:
+            result = await self._execute(SELECT_FOOD_SQL, (food_name,), fetch=True)
+            return NutritionInfo(*result) if result else None
+        except Exception as e:
+            print(f"Error querying database: {e}")
+            return None
+
+    @traced('db.save_food_to_db')
+    async def save_food_to_db(self, nutrition_info: NutritionInfo):
+        """Save nutrition information to database"""
+        try:
+            await self._execute(UPSERT_FOOD_SQL, food_params(nutrition_info))
+        except Exception as e:
+            print(f"Error saving to database: {e}")
+        self.db_service.notify_food_saved(nutrition_info)
+
+    @traced('db.save_risk_assessment')
+    async def save_risk_assessment(self, assessment: RiskAssessment):
+        """Save risk assessment to database"""
+        try:
+            await self._execute(INSERT_RISK_ASSESSMENT_SQL, risk_assessment_params(assessment))
+        except Exception as e:
+            print(f"Error saving risk assessment: {e}")
+
+    @traced('db.save_user_profile')
+    async def save_user_profile(self, profile: UserProfile) -> int:
+        """Save user profile to database and return user ID"""
+        try:
+            return await self._execute(INSERT_USER_PROFILE_SQL, user_profile_params(profile)) or 0
+        except Exception as e:
+            print(f"Error saving user profile: {e}")
+            return 0
+
+    @traced('db.save_dietary_pattern')
+    async def save_dietary_pattern(self, pattern: DietaryPattern, user_id: int) -> bool:
+        """Save dietary pattern for a specific user"""
+        try:
+            await self._execute(INSERT_DIETARY_PATTERN_SQL, dietary_pattern_params(pattern, user_id))
+            return self.pool is not None
+        except Exception as e:
+            print(f"Error saving dietary pattern: {e}")
+            return False
+
+    @traced('db.save_disease_assessment')
+    async def save_disease_assessment(self, user_id: int, risk: DiseaseRisk) -> bool:
+        """Save disease assessment for a specific user"""
+        try:
+            await self._execute(INSERT_DISEASE_ASSESSMENT_SQL, disease_assessment_params(user_id, risk))
+            return self.pool is not None
+        except Exception as e:
+            print(f"Error saving disease assessment: {e}")
+            return False
+
+    @traced('db.log_user_query')
+    async def log_user_query(self, query: str, found_in_db: bool, found_in_api: bool,
+                             found_in_wikipedia: bool, user_provided_info: bool):
+        """Log user query for learning purposes"""
+        try:
+            await self._execute(INSERT_USER_QUERY_SQL,
+                                (query, found_in_db, found_in_api, found_in_wikipedia, user_provided_info))
+        except Exception as e:
+            print(f"Error logging query: {e}")
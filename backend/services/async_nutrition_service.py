@@ -0,0 +1,133 @@
+""" Non-blocking nutrition lookups for the async serving mode """
+
+import asyncio
+import time
+from typing import Dict, Iterable, Optional
+
+import aiohttp
+
+from config.settings import ASYNC_CONFIG
+from models.nutrition import NutritionInfo
+from services.async_database_service import AsyncDatabaseService
+from services.nutrition_service import NutritionService
+from utils.metrics import LOOKUP_SECONDS, record_usda_rate_limit
+from utils.tracing import span, traced
+
+
+class AsyncNutritionService:
+    """ Same lookup order as NutritionService (database, USDA API, Wikipedia) without blocking the event loop.
+
+    Request building and parsing are reused from the blocking service. Concurrent lookups of
+    the same food share one in-flight task, so a burst of cache misses costs one fetch per food.
+    There is no interactive fallback: a food no source knows resolves to None.
+    """
+
+    def __init__(self, nutrition_service: NutritionService, db_service: AsyncDatabaseService):
+        self.nutrition_service = nutrition_service
+        self.db_service = db_service
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._wikipedia_slots = asyncio.Semaphore(ASYNC_CONFIG['wikipedia_concurrency'])
+
+    async def start(self):
+        """ Open the shared HTTP session """
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=ASYNC_CONFIG['http_connections']),
+            timeout=aiohttp.ClientTimeout(total=ASYNC_CONFIG['http_timeout_s'])
+        )
+
+    async def close(self):
+        """ Close the HTTP session """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def get_food_nutrition(self, food_name: str) -> Optional[NutritionInfo]:
+        """ Fetch nutritional information, joining any lookup of the same food already in flight """
+        key = food_name.strip().lower()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._lookup(food_name))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled request does not cancel the lookup other requests are waiting on
+        return await asyncio.shield(task)
+
+    async def resolve_foods(self, foods: Iterable[str]) -> Dict[str, Optional[NutritionInfo]]:
+        """ Look up every unique food concurrently """
+        unique = list(dict.fromkeys(foods))
+        results = await asyncio.gather(*(self.get_food_nutrition(food) for food in unique))
+        return dict(zip(unique, results))
+
+    async def _lookup(self, food_name: str) -> Optional[NutritionInfo]:
+        """ One lookup of a food, timed by the source that answered """
+        started = time.perf_counter()
+        with span('nutrition.lookup', food=food_name) as lookup_span:
+            nutrition_info, source = await self._resolve(food_name)
+            lookup_span.set_attribute('source', source)
+        LOOKUP_SECONDS.observe(time.perf_counter() - started, source)
+        return nutrition_info
+
+    async def _resolve(self, food_name: str):
+        """ Nutrition cache, then the database, the USDA API and Wikipedia; new foods are saved """
+        cache = self.nutrition_service.cache
+        with span('cache.get'):
+            nutrition_info = cache.get(food_name)
+        if nutrition_info:
+            return nutrition_info, 'cache'
+
+        nutrition_info = await self.db_service.get_food_from_db(food_name)
+        if nutrition_info:
+            cache.put(nutrition_info, food_name)
+            await self.db_service.log_user_query(food_name, True, False, False, False)
+            return nutrition_info, 'db'
+
+        nutrition_info = await self._search_usda_api(food_name)
+        found_in_api = nutrition_info is not None
+        if nutrition_info is None:
+            async with self._wikipedia_slots:
+                nutrition_info = await asyncio.to_thread(
+                    self.nutrition_service._search_wikipedia_fallback, food_name)
+
+        if nutrition_info:
+            await self.db_service.save_food_to_db(nutrition_info)
+            # Saved under the source's name; also cache it under the name asked for
+            cache.put(nutrition_info, food_name)
+        await self.db_service.log_user_query(food_name, False, found_in_api,
+                                             nutrition_info is not None and not found_in_api, False)
+        if nutrition_info is None:
+            return None, 'miss'
+        return nutrition_info, 'usda' if found_in_api else 'wikipedia'
+
+    @traced('usda.search')
+    async def _search_usda_api(self, food_name: str) -> Optional[NutritionInfo]:
+        """ Search USDA FoodData Central API for food information """
+        service = self.nutrition_service
+        try:
+            if self.session is None or not service._reserve_usda_request(food_name):
+                return None
+
+            search_url, params = service._usda_search_request(food_name)
+            # aiohttp wants repeated keys as pairs rather than list values
+            query = [(name, item) for name, value in params.items()
+                     for item in (value if isinstance(value, list) else [value])]
+            async with self.session.get(search_url, params=query) as response:
+                record_usda_rate_limit(response.headers)
+                response.raise_for_status()
+                data = await response.json()
+
+            if not data.get('foods'):
+                print(f"❌ No results found for '{food_name}' in API")
+                return None
+
+            food_item = data['foods'][0]
+            detail_url, detail_params = service._usda_detail_request(food_item)
+            async with self.session.get(detail_url, params=detail_params) as response:
+                record_usda_rate_limit(response.headers)
+                response.raise_for_status()
+                detail_data = await response.json()
+
+            return service._parse_usda_food(food_name, food_item, detail_data)
+        except Exception as e:
+            print(f"❌ Error calling USDA API for '{food_name}': {e}")
+            return None
@@ -0,0 +1,386 @@
+""" Offline batch processing of food lists and diary exports through a pool of worker processes """
+
+import csv
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from config.settings import BATCH_CONFIG, JOB_CONFIG
+from utils.api_payloads import parse_lifestyle_request, food_result_payload, lifestyle_payload
+from utils.serialization import dumps_json
+from utils.validators import InputValidator
+
+BATCH_KINDS = ('foods', 'lifestyle')
+
+# Profile columns of a profiles CSV; conditions are separated by ';'
+PROFILE_COLUMNS = ('age', 'gender', 'weight', 'height', 'activity_level', 'family_history', 'current_conditions',
+                   'meal_frequency', 'days_tracked')
+INTAKE_COLUMNS = ('calories', 'sugar_g', 'saturated_fat_g', 'sodium_mg')
+
+
+class BatchInputError(ValueError):
+    """ Raised when an input file cannot be read as the requested batch """
+
+
+def _file_format(path: str, fmt: Optional[str]) -> str:
+    """ 'csv' or 'jsonl', given explicitly or by file extension """
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def _read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """ One object per non-empty line; a bare string is taken as a food name """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise BatchInputError(f"{path}:{line_number}: invalid JSON ({e})")
+            yield {'food': record} if isinstance(record, str) else record
+
+
+def _read_food_csv(path: str) -> Iterator[Dict[str, Any]]:
+    """ Rows with a 'food' (or 'name') column, or a single column of food names """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        fields = reader.fieldnames or []
+        column = next((name for name in ('food', 'name') if name in fields), fields[0] if len(fields) == 1 else None)
+        if column is None:
+            raise BatchInputError(f"{path}: needs a 'food' column")
+        for row in reader:
+            yield {'id': row.get('id'), 'food': row[column]}
+
+
+def _read_profiles_csv(path: str) -> Dict[str, Dict[str, Any]]:
+    """ Profile fields by id; one row per person, so the table is small next to the diaries """
+    profiles = {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            if not row.get('id'):
+                raise BatchInputError(f"{path}: every profile needs an 'id'")
+            profile = {column: row[column] for column in PROFILE_COLUMNS if row.get(column) not in (None, '')}
+            for column in ('family_history', 'current_conditions'):
+                profile[column] = [item.strip() for item in profile.get(column, '').split(';') if item.strip()]
+            profiles[row['id']] = profile
+    return profiles
+
+
+def _read_diary_csv(path: str, profiles: Dict[str, Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """ One lifestyle request per person from diary rows (id, food, portion_g, optional zero-based day and meal).
+
+    A person's rows must be consecutive (exports sorted by person), so only one diary is held at a time.
+    """
+    finished = set()
+
+    def request(person: str, rows: List[Dict[str, str]]) -> Dict[str, Any]:
+        if person in finished:
+            raise BatchInputError(f"{path}: rows of '{person}' are not consecutive")
+        finished.add(person)
+        record = {'id': person, **profiles.get(person, {})}
+        record['daily_foods'] = [row.get('food') for row in rows]
+        record['portion_sizes'] = [row.get('portion_g') for row in rows]
+        for column, field in (('day', 'day_indices'), ('meal', 'meal_indices')):
+            values = [row.get(column) for row in rows]
+            if all(values):
+                record[field] = values
+        if 'days_tracked' not in record and 'day_indices' in record:
+            try:
+                record['days_tracked'] = max(int(day) for day in record['day_indices']) + 1
+            except ValueError:
+                pass # reported by validation
+        return record
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        if not {'id', 'food', 'portion_g'} <= set(reader.fieldnames or []):
+            raise BatchInputError(f"{path}: diary needs 'id', 'food' and 'portion_g' columns")
+        person, rows = None, []
+        for row in reader:
+            if row['id'] != person and rows:
+                yield request(person, rows)
+                rows = []
+            person = row['id']
+            rows.append(row)
+        if rows:
+            yield request(person, rows)
+
+
+def read_records(kind: str, path: str, fmt: Optional[str] = None,
+                 profiles_path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """ Stream the records of an input file; lifestyle CSVs are diaries joined with a profiles CSV """
+    if _file_format(path, fmt) == 'jsonl':
+        return _read_jsonl(path)
+    if kind == 'foods':
+        return _read_food_csv(path)
+    if not profiles_path:
+        raise BatchInputError("A lifestyle diary CSV needs --profiles with the profile of each id")
+    return _read_diary_csv(path, _read_profiles_csv(profiles_path))
+
+
+def disease_names() -> List[str]:
+    """ Diseases scored by the configured rules, for the CSV header """
+    from utils.disease_rules import DiseaseRuleEngine
+    return [rule.disease_name for rule in DiseaseRuleEngine().rules]
+
+
+def csv_columns(kind: str) -> List[str]:
+    """ Flat output columns of a batch kind """
+    if kind == 'foods':
+        return ['id', 'food', 'found', 'category', 'calories_per_100g', 'sugar_g', 'saturated_fat_g', 'sodium_mg',
+                'source', 'risk_score', 'is_risky', 'alternatives', 'error']
+    columns = ['id', 'overall_risk_score', 'maintenance_calories', 'foods_analyzed', *INTAKE_COLUMNS]
+    for name in disease_names():
+        columns += [f'{name} risk %', f'{name} level']
+    return columns + ['key_dietary_factors', 'error']
+
+
+def csv_row(kind: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """ Flatten a result record into the output columns """
+    row = {'id': result.get('id'), 'error': result.get('error')}
+    if kind == 'foods':
+        nutrition, risk = result.get('nutrition') or {}, result.get('risk_assessment') or {}
+        row.update({key: nutrition.get(key) for key in ('category', 'calories_per_100g', 'sugar_g',
+                                                         'saturated_fat_g', 'sodium_mg', 'source')})
+        row.update(food=result.get('food_name'), found=bool(nutrition), risk_score=risk.get('risk_score'),
+                   is_risky=risk.get('is_risky'), alternatives=';'.join(risk.get('alternatives') or []))
+        return row
+    if 'overall_risk_score' not in result:
+        return row
+    analysis = result['dietary_analysis']
+    row.update(overall_risk_score=result['overall_risk_score'],
+               maintenance_calories=result['user_profile']['maintenance_calories'],
+               foods_analyzed=result['dietary_pattern']['total_foods_analyzed'],
+               key_dietary_factors=';'.join(result['key_dietary_factors']))
+    row.update({key: analysis[key] for key in INTAKE_COLUMNS})
+    for risk in result['disease_risks']:
+        row[f"{risk['disease_name']} risk %"] = risk['risk_percentage']
+        row[f"{risk['disease_name']} level"] = risk['risk_level']
+    return row
+
+
+# Services of a worker process, built by the pool initializer (or on first use when run inline)
+_services = None
+
+
+def _worker_services():
+    """ This process's service container """
+    global _services
+    if _services is None:
+        from services.container import ServiceContainer
+        _services = ServiceContainer()
+    return _services
+
+
+def process_record(kind: str, record: Dict[str, Any], persist: bool) -> Dict[str, Any]:
+    """ Run one record through the pipeline; lookups never prompt and failures become error records """
+    services = _worker_services()
+    record_id = record.get('id')
+    try:
+        if kind == 'foods':
+            food = record.get('food')
+            if not isinstance(food, str) or not food.strip():
+                return {'id': record_id, 'error': "Missing food name"}
+            # Same check as the API, so arbitrary text never reaches USDA, Wikipedia or the database
+            is_valid, error_msg = InputValidator.validate_food_name(food)
+            if not is_valid:
+                return {'id': record_id, 'error': f'Invalid food name: {error_msg}'}
+            food = food.strip().lower()
+            nutrition_info = services.nutrition_service.get_food_nutrition(food, interactive=False)
+            risk_assessment = (services.risk_service.calculate_risk_score(nutrition_info, persist=persist)
+                               if nutrition_info else None)
+            return {'id': record_id, **food_result_payload(food, nutrition_info, risk_assessment)}
+
+        user_profile, dietary_pattern, error = parse_lifestyle_request(
+            record, JOB_CONFIG['max_items'], JOB_CONFIG['max_days'])
+        if error:
+            return {'id': record_id, 'error': error}
+        disease_service = services.disease_service
+        resolved = disease_service.resolve_foods(dietary_pattern.daily_foods, interactive=False)
+        assessment = disease_service.assess_lifestyle_disease_risk(
+            user_profile, dietary_pattern, resolved=resolved, persist=persist)
+        return {'id': record_id, **lifestyle_payload(assessment)}
+    except Exception as e:
+        traceback.print_exc()
+        return {'id': record_id, 'error': str(e)}
+
+
+def process_chunk(kind: str, records: List[Dict[str, Any]], persist: bool) -> List[Dict[str, Any]]:
+    """ Worker task: a chunk of records, results in input order """
+    return [process_record(kind, record, persist) for record in records]
+
+
+def _init_worker():
+    """ Pool initializer: build the services once per worker process """
+    # Workers never read from the terminal, whatever a service might try
+    sys.stdin = open(os.devnull, 'r')
+    _worker_services()
+
+
+class BatchRunner:
+    """ Streams records through worker processes and writes results in input order.
+
+    At most chunks_in_flight chunks per worker are submitted ahead of the writer, so memory
+    stays flat however long the input is. Results are written as JSONL or CSV as soon as
+    their turn comes; every checkpoint_every records the output is flushed to disk and a
+    checkpoint next to it records how many input records and output bytes are done. A run
+    started with resume=True skips the checkpointed records and truncates the output to the
+    checkpointed size, so an interrupted run continues without repeating or duplicating work.
+    """
+
+    def __init__(self, kind: str, input_path: str, output_path: str, input_format: Optional[str] = None,
+                 output_format: Optional[str] = None, profiles_path: Optional[str] = None, workers: int = 0,
+                 persist: bool = True, resume: bool = False, config: Optional[Dict[str, Any]] = None):
+        if kind not in BATCH_KINDS:
+            raise ValueError(f"Batch kind must be one of: {', '.join(BATCH_KINDS)}")
+        self.kind = kind
+        self.input_path = input_path
+        self.output_path = output_path
+        self.input_format = input_format
+        self.output_format = _file_format(output_path, output_format)
+        self.profiles_path = profiles_path
+        self.workers = workers or os.cpu_count() or 1
+        self.persist = persist
+        self.resume = resume
+        self.config = config or BATCH_CONFIG
+        self.checkpoint_path = output_path + '.checkpoint'
+        self.done = 0
+        self.failed = 0
+        self._columns = csv_columns(kind) if self.output_format == 'csv' else None
+
+    def run(self) -> Dict[str, Any]:
+        """ Process the whole input; returns the final counts """
+        checkpoint = self._load_checkpoint() if self.resume else None
+        records = read_records(self.kind, self.input_path, self.input_format, self.profiles_path)
+        if checkpoint:
+            self.done, self.failed = checkpoint['records'], checkpoint['failed']
+            records = islice(records, self.done, None)
+            output = open(self.output_path, 'r+b')
+            output.truncate(checkpoint['output_bytes'])
+            output.seek(0, os.SEEK_END)
+            print(f"↩️ Resuming after {self.done} records", file=sys.stderr)
+        else:
+            if os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+            output = open(self.output_path, 'wb')
+            if self._columns:
+                output.write(self._encode_csv([dict(zip(self._columns, self._columns))]))
+
+        started = time.perf_counter()
+        resumed_from = self.done
+        self._last_report = started
+        try:
+            with output:
+                for results in self._results(records):
+                    output.write(self._encode(results))
+                    self.done += len(results)
+                    self.failed += sum(1 for result in results if result.get('error'))
+                    if self.done // self.config['checkpoint_every'] > (self.done - len(results)) // self.config['checkpoint_every']:
+                        self._checkpoint(output)
+                    self._report(started, resumed_from)
+                self._checkpoint(output)
+        except BaseException:
+            print(f"⚠️ Stopped after {self.done} records; rerun with --resume to continue", file=sys.stderr)
+            raise
+        elapsed = time.perf_counter() - started
+        rate = (self.done - resumed_from) / elapsed if elapsed > 0 else 0.0
+        os.remove(self.checkpoint_path)
+        print(f"✓ Processed {self.done} records ({self.failed} with errors) in {elapsed:.1f}s, "
+              f"{rate:.1f} records/s -> {self.output_path}", file=sys.stderr)
+        return {'records': self.done, 'failed': self.failed, 'seconds': elapsed, 'records_per_s': rate}
+
+    def _results(self, records: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """ Result chunks in input order """
+        chunks = self._chunks(records)
+        if self.workers == 1:
+            _worker_services()
+            for chunk in chunks:
+                yield process_chunk(self.kind, chunk, self.persist)
+            return
+
+        window = self.workers * self.config['chunks_in_flight']
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(process_chunk, self.kind, chunk, self.persist))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _chunks(self, records: Iterable[Any]) -> Iterator[List[Dict[str, Any]]]:
+        """ Records in chunks of chunk_size, numbered by input position when they carry no id """
+        records = iter(records)
+        position = self.done
+        while True:
+            chunk = [record if isinstance(record, dict) else {} for record in islice(records, self.config['chunk_size'])]
+            if not chunk:
+                return
+            for record in chunk:
+                if record.get('id') in (None, ''):
+                    record['id'] = position
+                position += 1
+            yield chunk
+
+    def _encode(self, results: List[Dict[str, Any]]) -> bytes:
+        """ Output bytes of a chunk of results """
+        if self._columns:
+            return self._encode_csv([csv_row(self.kind, result) for result in results])
+        return b''.join(dumps_json(result) + b'\n' for result in results)
+
+    def _encode_csv(self, rows: List[Dict[str, Any]]) -> bytes:
+        """ CSV lines of rows in the output columns """
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, self._columns, extrasaction='ignore')
+        writer.writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+
+    def _checkpoint(self, output):
+        """ Flush the output to disk, then record how far it got """
+        output.flush()
+        os.fsync(output.fileno())
+        state = {
+            'kind': self.kind,
+            'input': os.path.abspath(self.input_path),
+            'output_format': self.output_format,
+            'records': self.done,
+            'failed': self.failed,
+            'output_bytes': output.tell(),
+        }
+        temporary = self.checkpoint_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temporary, self.checkpoint_path)
+
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """ The checkpoint of an earlier run over the same input, or None to start over """
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        expected = (self.kind, os.path.abspath(self.input_path), self.output_format)
+        if (checkpoint['kind'], checkpoint['input'], checkpoint['output_format']) != expected:
+            raise BatchInputError(f"{self.checkpoint_path} belongs to another batch; remove it to start over")
+        if not os.path.exists(self.output_path) or os.path.getsize(self.output_path) < checkpoint['output_bytes']:
+            raise BatchInputError(f"{self.output_path} is shorter than its checkpoint; remove the checkpoint to start over")
+        return checkpoint
+
+    def _report(self, started: float, resumed_from: int):
+        """ Progress and throughput on stderr every progress_interval_s """
+        now = time.perf_counter()
+        if now - self._last_report < self.config['progress_interval_s']:
+            return
+        self._last_report = now
+        rate = (self.done - resumed_from) / (now - started)
+        print(f"⏳ {self.done} records ({self.failed} with errors), {rate:.1f} records/s", file=sys.stderr)
@@ -0,0 +1,161 @@
+""" Lazily built, per-process service graph shared by the Flask app, the ASGI app and the CLI """
+
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict
+
+# Every container, so forked children can drop the services they inherited
+_containers = weakref.WeakSet()
+
+
+class ServiceContainer:
+    """ Builds each service on first use and hands out the same instance afterwards.
+
+    Nothing is constructed (and no database connection or DDL happens) until a service is
+    first asked for, so importing the app or creating it with create_app() does no I/O.
+    Services hold connection pools, worker threads and in-process caches that belong to the
+    process that built them: a container is reset in every child forked from its process
+    (gunicorn --preload, multiprocessing), so each worker builds its own on first use.
+
+    Services passed as keyword arguments (e.g. ``nutrition_service=...``) are used instead of
+    building them, which also makes the container easy to fill with fakes.
+    """
+
+    SERVICES = (
+        'db_service', 'nutrition_service', 'risk_service', 'disease_service', 'diet_optimizer_service',
+        'session_service', 'job_service', 'async_db_service', 'async_nutrition_service', 'result_cache'
+    )
+
+    def __init__(self, **services):
+        unknown = set(services) - set(self.SERVICES)
+        if unknown:
+            raise ValueError(f"Unknown services: {', '.join(sorted(unknown))}")
+        self._overrides: Dict[str, Any] = services
+        self._reset_state()
+        _containers.add(self)
+
+    def _reset_state(self):
+        """ Forget built services and take ownership for the current process """
+        self._services: Dict[str, Any] = dict(self._overrides)
+        # Re-entrant: building a service builds the services it depends on
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        """ The named service, built by factory the first time it is needed in this process """
+        if self._pid != os.getpid():
+            self._reset_state()
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory()
+                    self._services[name] = service
+        return service
+
+    def is_built(self, name: str) -> bool:
+        """ Whether a service already exists in this process """
+        return self._pid == os.getpid() and name in self._services
+
+    def reset(self):
+        """ Drop every built service so the next access builds fresh ones.
+
+        Used after a fork: the inherited instances are abandoned rather than closed, since
+        their sockets and threads still belong to the parent process.
+        """
+        self._reset_state()
+
+    def shutdown(self):
+        """ Stop the job workers of this process, if they were started """
+        if self.is_built('job_service'):
+            self._services['job_service'].stop()
+
+    @property
+    def db_service(self):
+        def build():
+            from services.database_service import DatabaseService
+            return DatabaseService()
+        return self._get('db_service', build)
+
+    @property
+    def nutrition_service(self):
+        def build():
+            from services.nutrition_service import NutritionService
+            return NutritionService(self.db_service)
+        return self._get('nutrition_service', build)
+
+    @property
+    def risk_service(self):
+        def build():
+            from services.risk_assessment_service import RiskAssessmentService
+            return RiskAssessmentService(self.db_service)
+        return self._get('risk_service', build)
+
+    @property
+    def disease_service(self):
+        def build():
+            from services.disease_prediction_service import DiseasePredictionService
+            return DiseasePredictionService(self.nutrition_service, self.db_service)
+        return self._get('disease_service', build)
+
+    @property
+    def diet_optimizer_service(self):
+        def build():
+            from services.diet_optimizer_service import DietOptimizerService
+            return DietOptimizerService(self.disease_service, self.db_service)
+        return self._get('diet_optimizer_service', build)
+
+    @property
+    def session_service(self):
+        def build():
+            from services.assessment_session_service import AssessmentSessionService
+            return AssessmentSessionService(self.disease_service)
+        return self._get('session_service', build)
+
+    @property
+    def job_service(self):
+        def build():
+            from services.job_service import JobService
+            return JobService(self.db_service, self.nutrition_service, self.risk_service, self.disease_service)
+        return self._get('job_service', build)
+
+    @property
+    def async_db_service(self):
+        def build():
+            from services.async_database_service import AsyncDatabaseService
+            return AsyncDatabaseService(self.db_service)
+        return self._get('async_db_service', build)
+
+    @property
+    def async_nutrition_service(self):
+        def build():
+            from services.async_nutrition_service import AsyncNutritionService
+            return AsyncNutritionService(self.nutrition_service, self.async_db_service)
+        return self._get('async_nutrition_service', build)
+
+    @property
+    def result_cache(self):
+        def build():
+            from config.settings import (RESULT_CACHE_CONFIG, FOOD_CATEGORIES, NUTRIENT_SCALES, ALTERNATIVES_CONFIG,
+                                         INTAKE_CONFIG, UNCERTAINTY_CONFIG, ACTIVITY_MULTIPLIERS)
+            from utils.result_cache import ResultCache
+            risk_service, disease_service = self.risk_service, self.disease_service
+            # Everything a cached response was scored with; read live so a changed threshold changes the key
+            cache = ResultCache(RESULT_CACHE_CONFIG, lambda: [
+                risk_service.thresholds, disease_service.rule_engine.version, FOOD_CATEGORIES, NUTRIENT_SCALES,
+                ALTERNATIVES_CONFIG, INTAKE_CONFIG, UNCERTAINTY_CONFIG, ACTIVITY_MULTIPLIERS])
+            self.db_service.add_food_listener(cache.invalidate_food)
+            return cache
+        return self._get('result_cache', build)
+
+
+def _reset_after_fork():
+    """ Post-fork hook: children start with empty containers """
+    for container in list(_containers):
+        container.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
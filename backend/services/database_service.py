@@ -1,17 +1,122 @@
 """ Database operations """
 import json
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
 from mysql.connector import Error
 
 from config.database import get_db_connection, DB_CONFIG
 from models.nutrition import NutritionInfo, RiskAssessment, DietaryPattern
 from models.disease import DiseaseRisk
 from models.user import UserProfile
+from utils.serialization import dumps_json
+from utils.tracing import traced
+
+# SQL shared by the blocking and asyncio database services (both drivers use %s placeholders)
+SELECT_FOOD_SQL = '''
+    SELECT name, calories_per_100g, sugar_g, saturated_fat_g, 
+           sodium_mg, category, source
+    FROM foods 
+    WHERE LOWER(name) = LOWER(%s)
+'''
+
+UPSERT_FOOD_SQL = '''
+    INSERT INTO foods 
+    (name, calories_per_100g, sugar_g, saturated_fat_g, sodium_mg, category, source)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    AS new
+    ON DUPLICATE KEY UPDATE
+    calories_per_100g = new.calories_per_100g,
+    sugar_g = new.sugar_g,
+    saturated_fat_g = new.saturated_fat_g,
+    sodium_mg = new.sodium_mg,
+    category = new.category,
+    source = new.source;
+'''
+
+INSERT_RISK_ASSESSMENT_SQL = '''
+    INSERT INTO risk_assessments 
+    (food_name, risk_score, is_risky, risk_factors, alternatives)
+    VALUES (%s, %s, %s, %s, %s)
+'''
+
+INSERT_USER_PROFILE_SQL = '''
+    INSERT INTO user_profiles 
+    (age, gender, weight_kg, height_cm, activity_level, family_history, current_conditions)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+'''
+
+INSERT_DIETARY_PATTERN_SQL = '''
+    INSERT INTO dietary_patterns 
+    (user_id, daily_foods, portion_sizes, meal_frequency, days_tracked)
+    VALUES (%s, %s, %s, %s, %s)
+'''
+
+INSERT_DISEASE_ASSESSMENT_SQL = '''
+    INSERT INTO disease_assessments 
+    (user_id, disease_name, risk_percentage, risk_level, contributing_factors, recommendations)
+    VALUES (%s, %s, %s, %s, %s, %s)
+'''
+
+INSERT_USER_QUERY_SQL = '''
+    INSERT INTO user_queries 
+    (query, found_in_db, found_in_api, found_in_wikipedia, user_provided_info)
+    VALUES (%s, %s, %s, %s, %s)
+'''
+
+
+def food_params(nutrition_info: NutritionInfo) -> tuple:
+    """ Parameters for UPSERT_FOOD_SQL """
+    return (
+        nutrition_info.food_name,
+        nutrition_info.calories_per_100g,
+        nutrition_info.sugar_g,
+        nutrition_info.saturated_fat_g,
+        nutrition_info.sodium_mg,
+        nutrition_info.category,
+        nutrition_info.source
+    )
+
+
+def risk_assessment_params(assessment: RiskAssessment) -> tuple:
+    """ Parameters for INSERT_RISK_ASSESSMENT_SQL """
+    return (
+        assessment.food_name,
+        assessment.risk_score,
+        assessment.is_risky,
+        json.dumps(assessment.risk_factors),
+        json.dumps(assessment.alternatives)
+    )
+
+
+def user_profile_params(profile: UserProfile) -> tuple:
+    """ Parameters for INSERT_USER_PROFILE_SQL """
+    return (
+        profile.age, profile.gender, profile.weight_kg, profile.height_cm,
+        profile.activity_level, json.dumps(profile.family_history), 
+        json.dumps(profile.current_conditions)
+    )
+
+
+def dietary_pattern_params(pattern: DietaryPattern, user_id: int) -> tuple:
+    """ Parameters for INSERT_DIETARY_PATTERN_SQL """
+    return (
+        user_id, json.dumps(pattern.daily_foods), 
+        json.dumps(pattern.portion_sizes_g), 
+        pattern.meal_frequency, pattern.days_tracked
+    )
+
+
+def disease_assessment_params(user_id: int, risk: DiseaseRisk) -> tuple:
+    """ Parameters for INSERT_DISEASE_ASSESSMENT_SQL """
+    return (
+        user_id, risk.disease_name, risk.risk_percentage, risk.risk_level,
+        json.dumps(risk.contributing_factors), json.dumps(risk.recommendations)
+    )
 
 
 class DatabaseService:
     """ Handles database operations for the Food Health App """
     def __init__(self):
+        self._food_listeners = []
         self.init_database() 
 
     def _safe_execute(self, cursor, query):
@@ -24,6 +129,7 @@ class DatabaseService:
             if e.errno != 1050 or e.errno != 1007:
                 raise
 
+    @traced('db.init_database')
     def init_database(self):
         """ Initializes the database connection """
         connection = get_db_connection(use_database=False)
@@ -46,6 +152,8 @@ class DatabaseService:
             self._create_user_profiles_table(cursor)
             self._create_dietary_patterns_table(cursor)
             self._create_disease_assessments_table(cursor)
+            self._create_analysis_jobs_table(cursor)
+            self._create_analysis_job_items_table(cursor)
             connection.commit()
             print("Database initialized successfully!")
 
@@ -147,6 +255,42 @@ class DatabaseService:
             )
         ''')
     
+    def _create_analysis_jobs_table(self, cursor):
+        """Create batch analysis jobs table"""
+        self._safe_execute(cursor, '''
+            CREATE TABLE IF NOT EXISTS analysis_jobs (
+                id CHAR(32) PRIMARY KEY,
+                job_type VARCHAR(20),
+                status VARCHAR(20),
+                payload LONGTEXT,
+                total_items INT,
+                completed_items INT DEFAULT 0,
+                result LONGTEXT,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_analysis_jobs_status (status)
+            )
+        ''')
+    
+    def _create_analysis_job_items_table(self, cursor):
+        """Create batch analysis job items table (one row per unique food, doubling as the work queue)"""
+        self._safe_execute(cursor, '''
+            CREATE TABLE IF NOT EXISTS analysis_job_items (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                job_id CHAR(32),
+                food_name VARCHAR(255),
+                status VARCHAR(20) DEFAULT 'pending',
+                result TEXT,
+                claimed_by CHAR(32),
+                claimed_at TIMESTAMP NULL,
+                INDEX idx_analysis_job_items_status (status, claimed_at),
+                INDEX idx_analysis_job_items_job (job_id),
+                FOREIGN KEY (job_id) REFERENCES analysis_jobs(id)
+            )
+        ''')
+    
+    @traced('db.get_food_from_db')
     def get_food_from_db(self, food_name: str) -> Optional[NutritionInfo]:
         """Get food from database"""
         connection = get_db_connection()
@@ -156,12 +300,7 @@ class DatabaseService:
         cursor = connection.cursor()
         
         try:
-            cursor.execute('''
-                SELECT name, calories_per_100g, sugar_g, saturated_fat_g, 
-                       sodium_mg, category, source
-                FROM foods 
-                WHERE LOWER(name) = LOWER(%s)
-            ''', (food_name,))
+            cursor.execute(SELECT_FOOD_SQL, (food_name,))
             
             result = cursor.fetchone()
             if result:
@@ -175,6 +314,35 @@ class DatabaseService:
             cursor.close()
             connection.close()
     
+    @traced('db.get_all_foods_from_db')
+    def get_all_foods_from_db(self) -> List[NutritionInfo]:
+        """Get every food in the catalog"""
+        connection = get_db_connection()
+        if not connection:
+            return []
+        
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT name, calories_per_100g, sugar_g, saturated_fat_g, 
+                       sodium_mg, category, source
+                FROM foods
+            ''')
+            return [NutritionInfo(*row) for row in cursor.fetchall()]
+            
+        except Error as e:
+            print(f"Error querying database: {e}")
+            return []
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def add_food_listener(self, listener: Callable[[NutritionInfo], None]):
+        """Register a callback invoked whenever a food is saved to the catalog"""
+        self._food_listeners.append(listener)
+    
+    @traced('db.save_food_to_db')
     def save_food_to_db(self, nutrition_info: NutritionInfo):
         """Save nutrition information to database"""
         connection = get_db_connection()
@@ -184,27 +352,7 @@ class DatabaseService:
         cursor = connection.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO foods 
-                (name, calories_per_100g, sugar_g, saturated_fat_g, sodium_mg, category, source)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                AS new
-                ON DUPLICATE KEY UPDATE
-                calories_per_100g = new.calories_per_100g,
-                sugar_g = new.sugar_g,
-                saturated_fat_g = new.saturated_fat_g,
-                sodium_mg = new.sodium_mg,
-                category = new.category,
-                source = new.source;
-            ''', (
-                nutrition_info.food_name,
-                nutrition_info.calories_per_100g,
-                nutrition_info.sugar_g,
-                nutrition_info.saturated_fat_g,
-                nutrition_info.sodium_mg,
-                nutrition_info.category,
-                nutrition_info.source
-            ))
+            cursor.execute(UPSERT_FOOD_SQL, food_params(nutrition_info))
             
             connection.commit()
             
@@ -213,7 +361,15 @@ class DatabaseService:
         finally:
             cursor.close()
             connection.close()
+        
+        self.notify_food_saved(nutrition_info)
+    
+    def notify_food_saved(self, nutrition_info: NutritionInfo):
+        """Run the food listeners for a food saved through this or another (e.g. async) connection"""
+        for listener in self._food_listeners:
+            listener(nutrition_info)
     
+    @traced('db.save_risk_assessment')
     def save_risk_assessment(self, assessment: RiskAssessment):
         """Save risk assessment to database"""
         connection = get_db_connection()
@@ -223,17 +379,7 @@ class DatabaseService:
         cursor = connection.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO risk_assessments 
-                (food_name, risk_score, is_risky, risk_factors, alternatives)
-                VALUES (%s, %s, %s, %s, %s)
-            ''', (
-                assessment.food_name,
-                assessment.risk_score,
-                assessment.is_risky,
-                json.dumps(assessment.risk_factors),
-                json.dumps(assessment.alternatives)
-            ))
+            cursor.execute(INSERT_RISK_ASSESSMENT_SQL, risk_assessment_params(assessment))
             
             connection.commit()
             
@@ -243,6 +389,7 @@ class DatabaseService:
             cursor.close()
             connection.close()
     
+    @traced('db.save_user_profile')
     def save_user_profile(self, profile: UserProfile) -> int:
         """Save user profile to database and return user ID"""
         connection = get_db_connection()
@@ -252,15 +399,7 @@ class DatabaseService:
         cursor = connection.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO user_profiles 
-                (age, gender, weight_kg, height_cm, activity_level, family_history, current_conditions)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                profile.age, profile.gender, profile.weight_kg, profile.height_cm,
-                profile.activity_level, json.dumps(profile.family_history), 
-                json.dumps(profile.current_conditions)
-            ))
+            cursor.execute(INSERT_USER_PROFILE_SQL, user_profile_params(profile))
             
             connection.commit()
             return cursor.lastrowid
@@ -272,6 +411,7 @@ class DatabaseService:
             cursor.close()
             connection.close()
     
+    @traced('db.save_dietary_pattern')
     def save_dietary_pattern(self, pattern: DietaryPattern, user_id: int) -> bool:
         """Save dietary pattern for a specific user"""
         connection = get_db_connection()
@@ -281,15 +421,7 @@ class DatabaseService:
         cursor = connection.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO dietary_patterns 
-                (user_id, daily_foods, portion_sizes, meal_frequency, days_tracked)
-                VALUES (%s, %s, %s, %s, %s)
-            ''', (
-                user_id, json.dumps(pattern.daily_foods), 
-                json.dumps(pattern.portion_sizes_g), 
-                pattern.meal_frequency, pattern.days_tracked
-            ))
+            cursor.execute(INSERT_DIETARY_PATTERN_SQL, dietary_pattern_params(pattern, user_id))
             
             connection.commit()
             return True
@@ -301,6 +433,7 @@ class DatabaseService:
             cursor.close()
             connection.close()
     
+    @traced('db.save_disease_assessment')
     def save_disease_assessment(self, user_id: int, risk: DiseaseRisk) -> bool:
         """Save disease assessment for a specific user"""
         connection = get_db_connection()
@@ -310,14 +443,7 @@ class DatabaseService:
         cursor = connection.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO disease_assessments 
-                (user_id, disease_name, risk_percentage, risk_level, contributing_factors, recommendations)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (
-                user_id, risk.disease_name, risk.risk_percentage, risk.risk_level,
-                json.dumps(risk.contributing_factors), json.dumps(risk.recommendations)
-            ))
+            cursor.execute(INSERT_DISEASE_ASSESSMENT_SQL, disease_assessment_params(user_id, risk))
             
             connection.commit()
             return True
@@ -329,6 +455,7 @@ class DatabaseService:
             cursor.close()
             connection.close()
     
+    @traced('db.log_user_query')
     def log_user_query(self, query: str, found_in_db: bool, found_in_api: bool, 
                       found_in_wikipedia: bool, user_provided_info: bool):
         """Log user query for learning purposes"""
@@ -339,11 +466,7 @@ class DatabaseService:
         cursor = connection.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO user_queries 
-                (query, found_in_db, found_in_api, found_in_wikipedia, user_provided_info)
-                VALUES (%s, %s, %s, %s, %s)
-            ''', (query, found_in_db, found_in_api, found_in_wikipedia, user_provided_info))
+            cursor.execute(INSERT_USER_QUERY_SQL, (query, found_in_db, found_in_api, found_in_wikipedia, user_provided_info))
             
             connection.commit()
             
@@ -351,4 +474,258 @@ class DatabaseService:
             print(f"Error logging query: {e}")
         finally:
             cursor.close()
-            connection.close()
\ No newline at end of file
+            connection.close()
+    
+    @traced('db.create_job')
+    def create_job(self, job_id: str, job_type: str, payload: Dict[str, Any], foods: List[str]) -> bool:
+        """Queue a batch analysis job with one work item per unique food"""
+        connection = get_db_connection()
+        if not connection:
+            return False
+        
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT INTO analysis_jobs (id, job_type, status, payload, total_items)
+                VALUES (%s, %s, 'queued', %s, %s)
+            ''', (job_id, job_type, dumps_json(payload).decode(), len(foods)))
+            cursor.executemany('''
+                INSERT INTO analysis_job_items (job_id, food_name) VALUES (%s, %s)
+            ''', [(job_id, food) for food in foods])
+            
+            connection.commit()
+            return True
+            
+        except Error as e:
+            connection.rollback()
+            print(f"Error creating job: {e}")
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @traced('db.get_job')
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job row as a dict, or None if it does not exist"""
+        connection = get_db_connection()
+        if not connection:
+            return None
+        
+        cursor = connection.cursor(dictionary=True)
+        
+        try:
+            cursor.execute('''
+                SELECT id, job_type, status, payload, total_items, completed_items,
+                       result, error, created_at, updated_at
+                FROM analysis_jobs WHERE id = %s
+            ''', (job_id,))
+            return cursor.fetchone()
+            
+        except Error as e:
+            print(f"Error querying job: {e}")
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @traced('db.claim_job_items')
+    def claim_job_items(self, worker_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Lease up to limit pending items, oldest job first; rows other workers hold are skipped"""
+        connection = get_db_connection()
+        if not connection:
+            return []
+        
+        cursor = connection.cursor(dictionary=True)
+        
+        try:
+            cursor.execute('''
+                SELECT id, job_id, food_name FROM analysis_job_items
+                WHERE status = 'pending'
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ''', (limit,))
+            items = cursor.fetchall()
+            if items:
+                item_ids = [item['id'] for item in items]
+                job_ids = list({item['job_id'] for item in items})
+                cursor.execute(f'''
+                    UPDATE analysis_job_items SET status = 'running', claimed_by = %s, claimed_at = NOW()
+                    WHERE id IN ({', '.join(['%s'] * len(item_ids))})
+                ''', (worker_id, *item_ids))
+                cursor.execute(f'''
+                    UPDATE analysis_jobs SET status = 'running'
+                    WHERE status = 'queued' AND id IN ({', '.join(['%s'] * len(job_ids))})
+                ''', tuple(job_ids))
+            
+            connection.commit()
+            return items
+            
+        except Error as e:
+            connection.rollback()
+            print(f"Error claiming job items: {e}")
+            return []
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @traced('db.complete_job_item')
+    def complete_job_item(self, item_id: int, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        """Store an item's result and advance its job's progress, unless the lease was lost meanwhile"""
+        connection = get_db_connection()
+        if not connection:
+            return False
+        
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE analysis_job_items SET status = 'done', result = %s
+                WHERE id = %s AND claimed_by = %s AND status = 'running'
+            ''', (dumps_json(result).decode(), item_id, worker_id))
+            completed = cursor.rowcount == 1
+            if completed:
+                cursor.execute('''
+                    UPDATE analysis_jobs SET completed_items = completed_items + 1 WHERE id = %s
+                ''', (job_id,))
+            
+            connection.commit()
+            return completed
+            
+        except Error as e:
+            connection.rollback()
+            print(f"Error completing job item: {e}")
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @traced('db.claim_finished_job')
+    def claim_finished_job(self) -> Optional[Dict[str, Any]]:
+        """Take one job whose items are all done for finalizing"""
+        connection = get_db_connection()
+        if not connection:
+            return None
+        
+        cursor = connection.cursor(dictionary=True)
+        
+        try:
+            cursor.execute('''
+                SELECT id, job_type, payload FROM analysis_jobs
+                WHERE status IN ('queued', 'running') AND completed_items >= total_items
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ''')
+            job = cursor.fetchone()
+            if job:
+                cursor.execute("UPDATE analysis_jobs SET status = 'finalizing' WHERE id = %s", (job['id'],))
+            
+            connection.commit()
+            return job
+            
+        except Error as e:
+            connection.rollback()
+            print(f"Error claiming finished job: {e}")
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @traced('db.get_job_item_results')
+    def get_job_item_results(self, job_id: str) -> Dict[str, Any]:
+        """Stored result of each food in a job"""
+        connection = get_db_connection()
+        if not connection:
+            return {}
+        
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT food_name, result FROM analysis_job_items WHERE job_id = %s AND status = 'done'
+            ''', (job_id,))
+            return {food_name: json.loads(result) for food_name, result in cursor.fetchall()}
+            
+        except Error as e:
+            print(f"Error querying job items: {e}")
+            return {}
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @traced('db.finish_job')
+    def finish_job(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                   error: Optional[str] = None) -> bool:
+        """Record a job's final status and result or error"""
+        connection = get_db_connection()
+        if not connection:
+            return False
+        
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE analysis_jobs SET status = %s, result = %s, error = %s WHERE id = %s
+            ''', (status, dumps_json(result).decode() if result is not None else None, error, job_id))
+            
+            connection.commit()
+            return True
+            
+        except Error as e:
+            print(f"Error finishing job: {e}")
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @traced('db.count_job_items')
+    def count_job_items(self) -> Optional[Dict[str, int]]:
+        """Number of pending and running batch job foods (the depth of the job queue); None if unavailable"""
+        connection = get_db_connection()
+        if not connection:
+            return None
+        
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute("SELECT status, COUNT(*) FROM analysis_job_items WHERE status IN ('pending', 'running') GROUP BY status")
+            return {status: count for status, count in cursor.fetchall()}
+            
+        except Error as e:
+            print(f"Error counting job items: {e}")
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @traced('db.requeue_stale_jobs')
+    def requeue_stale_jobs(self, lease_seconds: int) -> int:
+        """Return items and finalizations held longer than the lease (crashed workers) to the queue"""
+        connection = get_db_connection()
+        if not connection:
+            return 0
+        
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE analysis_job_items SET status = 'pending', claimed_by = NULL, claimed_at = NULL
+                WHERE status = 'running' AND claimed_at < NOW() - INTERVAL %s SECOND
+            ''', (lease_seconds,))
+            requeued = cursor.rowcount
+            cursor.execute('''
+                UPDATE analysis_jobs SET status = 'running'
+                WHERE status = 'finalizing' AND updated_at < NOW() - INTERVAL %s SECOND
+            ''', (lease_seconds,))
+            requeued += cursor.rowcount
+            
+            connection.commit()
+            return requeued
+            
+        except Error as e:
+            print(f"Error requeuing stale jobs: {e}")
+            return 0
+        finally:
+            cursor.close()
+            connection.close()
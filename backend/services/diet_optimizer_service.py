@@ -0,0 +1,180 @@
+""" Diet substitution optimizer: smallest set of swaps or portion changes that lowers risk levels """
+
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from config.settings import OPTIMIZER_CONFIG, NUTRIENT_SCALES
+from models.user import UserProfile
+from models.nutrition import DietaryPattern, NutritionInfo
+from services.disease_prediction_service import INTAKE_FIELDS
+from utils.food_catalog import FoodCatalogMatrix
+from utils.nutrient_index import NUTRIENT_FIELDS
+
+
+class DietOptimizerService:
+    """ Greedy search over food swaps and portion changes using precomputed catalog nutrient matrices """
+
+    def __init__(self, disease_service, db_service=None):
+        self.disease_service = disease_service
+        self.db_service = db_service if db_service is not None else disease_service.db_service
+        self.config = OPTIMIZER_CONFIG
+        self.catalog = FoodCatalogMatrix()
+        self._catalog_loaded = False
+        self._catalog_lock = threading.Lock()
+        self.db_service.add_food_listener(self.catalog.add_food)
+        self._scales = np.array([NUTRIENT_SCALES[field] for field in NUTRIENT_FIELDS])
+
+    def optimize_diet(self, profile: UserProfile, dietary_pattern: DietaryPattern,
+                      target_level: Optional[str] = None, max_changes: Optional[int] = None,
+                      resolved: Optional[Dict[str, Optional[NutritionInfo]]] = None) -> Dict[str, Any]:
+        """ Suggest up to max_changes swaps/portion changes that bring every disease to target_level or below """
+        target_level = target_level or self.config['default_target_level']
+        max_changes = self.config['max_changes'] if max_changes is None else max_changes
+        self._load_catalog()
+
+        disease_service = self.disease_service
+        if resolved is None:
+            resolved = disease_service.resolve_foods(dietary_pattern.daily_foods, interactive=False)
+        grams_per_food = disease_service.grams_per_food(dietary_pattern)
+        foods = [food for food in grams_per_food if resolved.get(food)]
+
+        bmi = disease_service.health_calculator.calculate_bmi(profile.weight_kg, profile.height_cm)
+        maintenance_calories = disease_service.health_calculator.calculate_daily_maintenance_calories(profile)
+        rules = disease_service.rule_engine.rules
+        bounds = np.array([rule.level_bound(target_level) for rule in rules])
+        metrics = disease_service.rule_engine.build_metrics(
+            profile.age, profile.gender, bmi, maintenance_calories,
+            {key: 0.0 for key in INTAKE_FIELDS}, profile.family_history)
+
+        # Per-food daily weight (100g units per day) and per-100g nutrient rows
+        weights = np.array([grams_per_food[food] / 100 / dietary_pattern.days_tracked for food in foods])
+        per_100g = np.array([disease_service.nutrient_vector(resolved[food]) for food in foods]).reshape(len(foods), len(INTAKE_FIELDS))
+        contributions = weights[:, None] * per_100g
+        intake_before = self._intake_dict(per_100g, weights)
+        current_names = list(foods)
+        categories = [resolved[food].category for food in foods]
+        changed = np.zeros(len(foods), dtype=bool)
+
+        # Daily limits used to shape the search through plateaus where capped risk points do not move
+        thresholds = disease_service.disease_thresholds
+        limits = np.array([maintenance_calories, thresholds['diabetes']['daily_sugar_g'],
+                           thresholds['heart_disease']['daily_sat_fat_g'], thresholds['hypertension']['daily_sodium_mg']])
+
+        def objective(intakes: np.ndarray):
+            """ Risk percentage above the target bound summed over diseases, plus the shaped search score """
+            candidate_metrics = dict(metrics)
+            disease_service.rule_engine.set_intake(
+                candidate_metrics, {key: intakes[:, j] for j, key in enumerate(INTAKE_FIELDS)}, maintenance_calories)
+            gap = np.zeros(len(intakes))
+            for rule, bound in zip(rules, bounds):
+                if np.isfinite(bound):
+                    gap += np.maximum(0.0, rule.evaluate_arrays(candidate_metrics, len(intakes)) - bound + 1e-9)
+            excess = np.maximum(0.0, intakes / limits - 1).sum(axis=1)
+            return gap, gap + self.config['excess_weight'] * excess
+
+        changes = []
+        gaps, shaped = objective(contributions.sum(axis=0)[None, :])
+        current_gap, current_score = gaps[0], shaped[0]
+        while current_gap > 0 and len(changes) < max_changes:
+            move = self._best_move(contributions, weights, per_100g, current_names, categories, changed, objective)
+            if move is None or move['score'] >= current_score - 1e-9:
+                break
+            i = move['index']
+            if move['type'] == 'swap':
+                changes.append({
+                    'type': 'swap',
+                    'food': current_names[i],
+                    'replacement': move['replacement'],
+                    'grams_per_day': float(weights[i] * 100)
+                })
+                per_100g[i] = move['row']
+                current_names[i] = move['replacement']
+            else:
+                changes.append({
+                    'type': 'remove' if move['factor'] == 0 else 'reduce_portion',
+                    'food': current_names[i],
+                    'from_grams_per_day': float(weights[i] * 100),
+                    'to_grams_per_day': float(weights[i] * 100 * move['factor'])
+                })
+                weights[i] *= move['factor']
+            contributions[i] = weights[i] * per_100g[i]
+            changed[i] = True
+            current_gap, current_score = move['gap'], move['score']
+
+        intake_after = self._intake_dict(per_100g, weights)
+        return {
+            'target_level': target_level,
+            'achieved': bool(current_gap <= 0),
+            'changes': changes,
+            'daily_intake_before': intake_before,
+            'daily_intake_after': intake_after,
+            'risks_before': self._risk_summary(profile, intake_before, bmi, maintenance_calories),
+            'risks_after': self._risk_summary(profile, intake_after, bmi, maintenance_calories)
+        }
+
+    def _best_move(self, contributions, weights, per_100g, names, categories, changed, objective) -> Optional[Dict[str, Any]]:
+        """ Evaluate every portion change and same-category swap for unchanged foods in one vectorized pass """
+        total = contributions.sum(axis=0)
+        blocks, tie_breaks, moves = [], [], []
+
+        for i in np.flatnonzero(~changed):
+            for factor in self.config['portion_factors']:
+                blocks.append((total - contributions[i] * (1 - factor))[None, :])
+                tie_breaks.append(np.array([self.config['portion_change_penalty'] * (1 + (factor == 0))]))
+                moves.append(('portion', i, factor, None, None))
+
+            # The objective never decreases as any nutrient grows, so only the category's
+            # Pareto-minimal foods can be the best replacement
+            candidate_names, matrix = self.catalog.pareto_frontier(categories[i])
+            if not len(candidate_names):
+                continue
+            blocks.append(total - contributions[i] + weights[i] * matrix)
+            # Prefer the most similar replacement among equally good ones; never the food itself
+            tie_break = 1e-6 * np.abs((matrix - per_100g[i]) / self._scales).sum(axis=1)
+            tie_break[[j for j, name in enumerate(candidate_names) if name.lower() == names[i].lower()]] = np.inf
+            tie_breaks.append(tie_break)
+            moves.append(('swap', i, None, candidate_names, matrix))
+
+        if not blocks:
+            return None
+
+        gaps, shaped = objective(np.vstack(blocks))
+        scores = shaped + np.concatenate(tie_breaks)
+        offsets = np.cumsum([0] + [len(block) for block in blocks])
+
+        best = int(np.argmin(scores))
+        block = int(np.searchsorted(offsets, best, side='right') - 1)
+        kind, i, factor, candidate_names, matrix = moves[block]
+        move = {'index': i, 'gap': float(gaps[best]), 'score': float(shaped[best])}
+        if kind == 'swap':
+            j = best - offsets[block]
+            move.update({'type': 'swap', 'replacement': candidate_names[j], 'row': matrix[j]})
+        else:
+            move.update({'type': 'portion', 'factor': factor})
+        return move
+
+    def _risk_summary(self, profile: UserProfile, daily_intake: Dict[str, float],
+                      bmi: float, maintenance_calories: float) -> Dict[str, Dict[str, Any]]:
+        """ Exact per-disease risks for a daily intake """
+        risks = self.disease_service.predict_disease_risks(profile, daily_intake, bmi, maintenance_calories)
+        return {risk.disease_name: {'risk_percentage': risk.risk_percentage, 'risk_level': risk.risk_level}
+                for risk in risks}
+
+    @staticmethod
+    def _intake_dict(per_100g: np.ndarray, weights: np.ndarray) -> Dict[str, float]:
+        """ Daily intake totals from per-100g rows and daily weights """
+        totals = (weights[:, None] * per_100g).sum(axis=0) if len(weights) else np.zeros(len(INTAKE_FIELDS))
+        return {key: float(totals[j]) for j, key in enumerate(INTAKE_FIELDS)}
+
+    def _load_catalog(self):
+        """ Load the food catalog into nutrient matrices and frontiers on first use """
+        if self._catalog_loaded:
+            return
+        # Concurrent first calls wait for the load instead of searching an empty catalog
+        with self._catalog_lock:
+            if not self._catalog_loaded:
+                self.catalog.add_foods(self.db_service.get_all_foods_from_db())
+                self.catalog.build_frontiers()
+                self._catalog_loaded = True
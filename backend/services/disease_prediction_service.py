@@ -1,13 +1,27 @@
 """ Disease prediction and lifestyle assessment service """
 
-from typing import Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from config.settings import DISEASE_THRESHOLDS
+import numpy as np
+
+from config.settings import DISEASE_THRESHOLDS, INTAKE_CONFIG
 from models.user import UserProfile
-from models.nutrition import DietaryPattern
+from models.nutrition import DietaryPattern, NutritionInfo
 from models.disease import DiseaseRisk, LifestyleDiseaseAssessment
 from services.database_service import DatabaseService
 from utils.calculations import HealthCalculator
+from utils.disease_rules import DiseaseRuleEngine
+from utils.intake_table import IntakeTable, IntakeAggregator
+from services.uncertainty_service import UncertaintyService
+from utils.tracing import traced
+
+# Daily intake keys and the per-100g NutritionInfo fields they are computed from
+INTAKE_FIELDS = {
+    'calories': 'calories_per_100g',
+    'sugar_g': 'sugar_g',
+    'saturated_fat_g': 'saturated_fat_g',
+    'sodium_mg': 'sodium_mg'
+}
 
 class DiseasePredictionService:
     """ Handles lifestyle disease predicirton and assessment """
@@ -19,35 +33,208 @@ class DiseasePredictionService:
             self.db_service = db_service
         self.disease_thresholds = DISEASE_THRESHOLDS
         self.health_calculator = HealthCalculator()
+        self.rule_engine = DiseaseRuleEngine()
+        self.uncertainty_service = UncertaintyService(self.rule_engine)
+
+    @traced('disease.assess')
+    def assess_lifestyle_disease_risk(self, profile: UserProfile, dietary_pattern: DietaryPattern,
+                                      uncertainty_draws: int = 0,
+                                      resolved: Optional[Dict[str, Optional[NutritionInfo]]] = None,
+                                      persist: bool = True) -> LifestyleDiseaseAssessment:
+        """ Assess the risk of lifestyle diseases based on user profile and dietary pattern.
 
-    def assess_lifestyle_disease_risk(self, profile: UserProfile, dietary_pattern: DietaryPattern) -> LifestyleDiseaseAssessment:
-        """ Assess the risk of lifestyle diseases based on user profile and dietary pattern """
-        #save user profile and dietary pattern
-        user_id = self.db_service.save_user_profile(profile)
+        With uncertainty_draws > 0, portion and nutrient noise is sampled that many times
+        and confidence intervals are attached to the assessment. Callers that looked the foods
+        up already (e.g. the async server) pass them as resolved, and persist=False leaves
+        saving the profile, pattern and risks to them.
+        """
+        #Analyze dietary intake in one pass over the diary, resolving each unique food once
+        if resolved is None:
+            resolved = self.resolve_foods(dietary_pattern.daily_foods)
+        table, aggregator = self.aggregate_intake_table(dietary_pattern, resolved, track_foods=True)
+        intake_summary = aggregator.summary(INTAKE_CONFIG['rolling_window_days'])
+        daily_intake = dict(intake_summary['mean'])
+        food_means = aggregator.food_totals_by_day().mean(axis=1)
+        food_contributions = {
+            food: {key: float(food_means[i, j]) for j, key in enumerate(INTAKE_FIELDS)}
+            for i, food in enumerate(table.foods) if resolved.get(food)
+        }
+        #Predict individual disease risks from the compiled rules, using mean and peak-day intake
+        bmi = self.health_calculator.calculate_bmi(profile.weight_kg, profile.height_cm)
+        maintenance_calories = self.health_calculator.calculate_daily_maintenance_calories(profile)
+        disease_risks = self.predict_disease_risks(profile, daily_intake, bmi, maintenance_calories,
+                                                   intake_summary['peak'])
+        #calculate overall risk score (weighted average)
+        overall_risk_score = self.overall_risk_score(disease_risks)
+        #rank foods by how much of each nutrient and disease score they account for
+        food_attribution = self.attribute_risks(profile, bmi, maintenance_calories, table, aggregator, resolved)
+
+        #indentify key dietary factors and intervention priorities
+        key_dietary_factors, intervention_priority = self.dietary_factors(daily_intake, maintenance_calories)
+
+        uncertainty = None
+        if uncertainty_draws > 0:
+            food_sources = {food: resolved[food].source for food in food_contributions}
+            peak_ratio = {key: intake_summary['peak'][key] / daily_intake[key] if daily_intake[key] else 1.0
+                          for key in INTAKE_FIELDS}
+            uncertainty = self.uncertainty_service.estimate(
+                profile, bmi, maintenance_calories, food_contributions, food_sources, uncertainty_draws, peak_ratio)
+
+        assessment = LifestyleDiseaseAssessment(
+            user_profile=profile,
+            dietary_pattern=dietary_pattern,
+            disease_risks=disease_risks,
+            overall_risk_score=overall_risk_score,
+            key_dietary_factors=key_dietary_factors,
+            intervention_priority=intervention_priority,
+            maintenance_calories=maintenance_calories,
+            daily_intake=daily_intake,
+            food_contributions=food_contributions,
+            uncertainty=uncertainty,
+            intake_summary=intake_summary,
+            food_attribution=food_attribution
+        )
+        if persist:
+            self.save_assessment(assessment)
+        return assessment
 
+    def save_assessment(self, assessment: LifestyleDiseaseAssessment):
+        """ Save the profile, dietary pattern and disease risks of an assessment """
+        user_id = self.db_service.save_user_profile(assessment.user_profile)
         if user_id > 0:
-            self.db_service.save_dietary_pattern(dietary_pattern, user_id)
-        #Analyze dietary intake
-        daily_intake = self.analyze_dietary_intake(dietary_pattern)
-        #Predict individual disease risks
-        disease_risks = [
-            self._predict_diabetes_risk(profile, daily_intake),
-            self._predict_hypertension_risk(profile, daily_intake),
-            self._predict_heart_disease_risk(profile, daily_intake)
+            self.db_service.save_dietary_pattern(assessment.dietary_pattern, user_id)
+            for risk in assessment.disease_risks:
+                self.db_service.save_disease_assessment(user_id, risk)
+    
+    def analyze_dietary_intake(self, dietary_pattern: DietaryPattern,
+                               resolved: Optional[Dict[str, Optional[NutritionInfo]]] = None) -> Dict[str, float]:
+        """Analyze total daily nutritional intake (the mean day of the diary)"""
+        _, aggregator = self.aggregate_intake_table(dietary_pattern, resolved)
+        return dict(aggregator.summary(INTAKE_CONFIG['rolling_window_days'])['mean'])
+    
+    @traced('disease.resolve_foods')
+    def resolve_foods(self, foods: Iterable[str], interactive: bool = True) -> Dict[str, Optional[NutritionInfo]]:
+        """Look up nutrition information once per unique food; interactive=False never prompts"""
+        resolved = {}
+        for food in foods:
+            if food not in resolved:
+                resolved[food] = self.nutrition_service.get_food_nutrition(food, interactive=interactive)
+        return resolved
+    
+    @traced('disease.aggregate_intake')
+    def aggregate_intake_table(self, dietary_pattern: DietaryPattern,
+                               resolved: Optional[Dict[str, Optional[NutritionInfo]]] = None,
+                               track_foods: bool = False) -> Tuple[IntakeTable, IntakeAggregator]:
+        """Columnar diary and its aggregator after one pass; track_foods also keeps per-food daily totals"""
+        table = IntakeTable.from_dietary_pattern(dietary_pattern)
+        if resolved is None:
+            resolved = self.resolve_foods(table.foods)
+        zeros = [0.0] * len(INTAKE_FIELDS)
+        per_food_100g = np.array([self.nutrient_vector(resolved[food]) if resolved.get(food) else zeros
+                                  for food in table.foods]).reshape(len(table.foods), len(INTAKE_FIELDS))
+        aggregator = IntakeAggregator(INTAKE_FIELDS, dietary_pattern.days_tracked, dietary_pattern.meal_frequency,
+                                      len(table.foods) if track_foods else 0)
+        return table, aggregator.consume(table, per_food_100g)
+    
+    @traced('disease.attribute')
+    def attribute_risks(self, profile: UserProfile, bmi: float, maintenance_calories: float,
+                        table: IntakeTable, aggregator: IntakeAggregator,
+                        resolved: Dict[str, Optional[NutritionInfo]]) -> List[Dict[str, Any]]:
+        """Rank foods by their share of each nutrient and the risk points each disease would lose without them.
+
+        Every food's removal is scored at once over arrays of (mean, peak-day) intakes with that
+        food taken out, so the cost is one rule evaluation per disease. Because rules have
+        thresholds and caps, impacts are per-food counterfactuals and need not add up to the total.
+        """
+        food_days = aggregator.food_totals_by_day()
+        foods = [i for i, food in enumerate(table.foods) if resolved.get(food)]
+        if food_days is None or not foods:
+            return []
+        
+        by_day = aggregator.totals_by_day()
+        food_days = food_days[foods]
+        contributions = food_days.mean(axis=1)
+        total = by_day.mean(axis=0)
+        # Last row keeps every food so the baseline goes through the same arithmetic
+        mean_without = np.vstack([total - contributions, total])
+        peak_without = np.vstack([(by_day[None, :, :] - food_days).max(axis=1), by_day.max(axis=0)])
+        
+        metrics = self.rule_engine.build_metrics(
+            profile.age, profile.gender, bmi, maintenance_calories,
+            {key: 0.0 for key in INTAKE_FIELDS}, profile.family_history)
+        self.rule_engine.set_intake(
+            metrics, {key: mean_without[:, j] for j, key in enumerate(INTAKE_FIELDS)}, maintenance_calories,
+            {key: peak_without[:, j] for j, key in enumerate(INTAKE_FIELDS)})
+        
+        impacts = {}
+        overall = np.zeros(len(foods))
+        for rule in self.rule_engine.rules:
+            scores = rule.evaluate_arrays(metrics, len(foods) + 1)
+            impacts[rule.disease_name] = scores[-1] - scores[:-1]
+            overall += impacts[rule.disease_name] * rule.weight
+        shares = np.divide(contributions, total, out=np.zeros_like(contributions), where=total > 0)
+        
+        attribution = [
+            {
+                'food': table.foods[food],
+                'nutrients': {key: float(contributions[i, j]) for j, key in enumerate(INTAKE_FIELDS)},
+                'nutrient_share': {key: float(shares[i, j]) for j, key in enumerate(INTAKE_FIELDS)},
+                'disease_impact': {name: float(values[i]) for name, values in impacts.items()},
+                'overall_impact': float(overall[i] * 100)
+            }
+            for i, food in enumerate(foods)
         ]
-        #calculate overall risk score (weighted average)
-        weights = {'Type 2 Diabetes': 0.3, 'Hypertension': 0.35, 'Heart Disease': 0.35}
-        overall_risk_score = sum(risk.risk_percentage * weights.get(risk.disease_name, 0.33) for risk in disease_risks) * 100
+        attribution.sort(key=lambda item: (item['overall_impact'], max(item['nutrient_share'].values())), reverse=True)
+        return attribution
+    
+    @staticmethod
+    def grams_per_food(dietary_pattern: DietaryPattern) -> Dict[str, float]:
+        """Total grams per unique food across all tracked days"""
+        grams_per_food = {}
+        for food, portion in zip(dietary_pattern.daily_foods, dietary_pattern.portion_sizes_g):
+            grams_per_food[food] = grams_per_food.get(food, 0.0) + float(portion)
+        return grams_per_food
+    
+    @staticmethod
+    def nutrient_vector(nutrition_info: NutritionInfo) -> List[float]:
+        """Per-100g nutrient values in INTAKE_FIELDS order, with missing values as zero"""
+        return [float(getattr(nutrition_info, field) or 0.0) for field in INTAKE_FIELDS.values()]
+    
+    @traced('disease.predict')
+    def predict_disease_risks(self, profile: UserProfile, daily_intake: Dict[str, float],
+                              bmi: float, maintenance_calories: float,
+                              peak_intake: Optional[Dict[str, float]] = None) -> List[DiseaseRisk]:
+        """Evaluate every configured disease rule for one profile; peak_intake defaults to daily_intake"""
+        metrics = self.rule_engine.build_metrics(
+            profile.age, profile.gender, bmi, maintenance_calories, daily_intake, profile.family_history,
+            peak_intake)
+        disease_risks = []
+        for rule in self.rule_engine.rules:
+            risk_percentage, contributing_factors = rule.evaluate(metrics)
+            disease_risks.append(DiseaseRisk(
+                disease_name=rule.disease_name,
+                risk_percentage=risk_percentage,
+                risk_level=rule.level(risk_percentage),
+                contributing_factors=contributing_factors,
+                recommendations=list(rule.recommendations)
+            ))
+        return disease_risks
+    
+    def overall_risk_score(self, disease_risks: List[DiseaseRisk]) -> float:
+        """Weighted combination of the individual disease risks"""
+        weights = {rule.disease_name: rule.weight for rule in self.rule_engine.rules}
+        return sum(risk.risk_percentage * weights.get(risk.disease_name, 0.33) for risk in disease_risks) * 100
 
-        #indentify key dietary factors
-        maintenance_calories = self.health_calculator.calculate_daily_maintenance_calories(profile)
+    @staticmethod
+    def dietary_factors(daily_intake: Dict[str, float], maintenance_calories: float) -> Tuple[Dict[str, float], List[str]]:
+        """Daily excess over recommended limits and the resulting intervention priorities"""
         key_dietary_factors = {
             'excess_calories': max(0, daily_intake['calories'] - maintenance_calories),
             'excess_sugar': max(0, daily_intake['sugar_g'] - 50),
             'excess_saturated_fat': max(0, daily_intake['saturated_fat_g'] - 13),
             'excess_sodium': max(0, daily_intake['sodium_mg'] - 2300)
         }
-        
+
         # Determine intervention priorities
         intervention_priority = []
         if key_dietary_factors['excess_sodium'] > 500:
@@ -58,223 +245,41 @@ class DiseasePredictionService:
             intervention_priority.append("Reduce sugar intake")
         if key_dietary_factors['excess_calories'] > 300:
             intervention_priority.append("Reduce caloric intake")
+        return key_dietary_factors, intervention_priority
 
-        # Save disease risk assessments
-        if user_id > 0:
-            for risk in disease_risks:
-                self.db_service.save_disease_assessment(user_id, risk)
+    @traced('disease.cohort')
+    def assess_cohort(self, profiles: Dict[str, List], intake: Dict[str, List[float]]) -> Dict[str, List]:
+        """Score many profiles at once from columnar profile and daily intake arrays.
 
-        return LifestyleDiseaseAssessment(
-            user_profile=profile,
-            dietary_pattern=dietary_pattern,
-            disease_risks=disease_risks,
-            overall_risk_score=overall_risk_score,
-            key_dietary_factors=key_dietary_factors,
-            intervention_priority=intervention_priority
-        )
-    
-    def analyze_dietary_intake(self, dietary_pattern: DietaryPattern) -> Dict[str, float]:
-        """Analyze total daily nutritional intake"""
-        total_nutrition = {
-            'calories': 0.0,
-            'sugar_g': 0.0,
-            'saturated_fat_g': 0.0,
-            'sodium_mg': 0.0
+        Each compiled disease rule is evaluated over the whole cohort one step at a time,
+        with the same arithmetic as the per-profile path, so results match
+        assess_lifestyle_disease_risk. Nothing is persisted to the database.
+        """
+        ages = profiles['age']
+        genders = profiles['gender']
+        
+        bmi = self.health_calculator.calculate_bmi_batch(profiles['weight_kg'], profiles['height_cm'])
+        maintenance_calories = self.health_calculator.calculate_daily_maintenance_calories_batch(
+            ages, genders, profiles['weight_kg'], profiles['height_cm'], profiles['activity_level'])
+        columns = self.rule_engine.build_metric_columns(
+            ages, genders, bmi, maintenance_calories, intake, profiles['family_history'])
+        
+        result = {
+            'bmi': bmi,
+            'maintenance_calories': maintenance_calories,
+            'overall_risk_score': [0] * len(ages),
+            'disease_risks': {}
         }
-        
-        for i, food in enumerate(dietary_pattern.daily_foods):
-            nutrition_info = self.nutrition_service.get_food_nutrition(food)
-            if nutrition_info:
-                portion_factor = dietary_pattern.portion_sizes_g[i] / 100  # Convert to per portion
-                
-                calories = float(nutrition_info.calories_per_100g) if nutrition_info.calories_per_100g else 0.0
-                sugars = float(nutrition_info.sugar_g) if nutrition_info.sugar_g else 0.0
-                sat_fat = float(nutrition_info.saturated_fat_g) if nutrition_info.saturated_fat_g else 0.0
-                sodium = float(nutrition_info.sodium_mg) if nutrition_info.sodium_mg else 0.0
-
-                total_nutrition['calories'] += calories * portion_factor
-                total_nutrition['sugar_g'] += sugars * portion_factor
-                total_nutrition['saturated_fat_g'] += sat_fat * portion_factor
-                total_nutrition['sodium_mg'] += sodium * portion_factor
-        
-        # Average per day
-        days = dietary_pattern.days_tracked
-        daily_intake = {k: v / days for k, v in total_nutrition.items()}
-        
-        return daily_intake
-    
-    def _predict_diabetes_risk(self, profile: UserProfile, daily_intake: Dict[str, float]) -> DiseaseRisk:
-        """Predict Type 2 Diabetes risk"""
-        risk_score = 0
-        contributing_factors = []
-        
-        # BMI factor
-        bmi = self.health_calculator.calculate_bmi(profile.weight_kg, profile.height_cm)
-        if bmi >= 30:
-            risk_score += 30
-            contributing_factors.append("Obesity (BMI ≥ 30)")
-        elif bmi >= 25:
-            risk_score += 15
-            contributing_factors.append("Overweight (BMI 25-29.9)")
-        
-        # Age factor
-        if profile.age >= 45:
-            risk_score += 10
-            contributing_factors.append("Age ≥ 45 years")
-        
-        # Diet factors
-        if daily_intake['sugar_g'] > self.disease_thresholds['diabetes']['daily_sugar_g']:
-            excess_sugar = daily_intake['sugar_g'] - self.disease_thresholds['diabetes']['daily_sugar_g']
-            risk_score += min(25, excess_sugar * 0.5)
-            contributing_factors.append(f"High sugar intake ({daily_intake['sugar_g']:.1f}g/day)")
-        
-        # Family history
-        if 'diabetes' in [fh.lower() for fh in profile.family_history]:
-            risk_score *= self.disease_thresholds['diabetes']['family_history_multiplier']
-            contributing_factors.append("Family history of diabetes")
-        
-        # Cap at 100%
-        risk_percentage = min(100, risk_score)
-        
-        # Determine risk level
-        if risk_percentage < 20:
-            risk_level = 'low'
-        elif risk_percentage < 40:
-            risk_level = 'moderate'
-        elif risk_percentage < 70:
-            risk_level = 'high'
-        else:
-            risk_level = 'very_high'
-        
-        recommendations = [
-            "Reduce daily sugar intake to <50g",
-            "Maintain healthy weight (BMI 18.5-24.9)",
-            "Exercise regularly (150+ minutes/week)",
-            "Monitor blood glucose levels"
-        ]
-        
-        return DiseaseRisk(
-            disease_name='Type 2 Diabetes',
-            risk_percentage=risk_percentage,
-            risk_level=risk_level,
-            contributing_factors=contributing_factors,
-            recommendations=recommendations
-        )
-    
-    def _predict_hypertension_risk(self, profile: UserProfile, daily_intake: Dict[str, float]) -> DiseaseRisk:
-        """Predict Hypertension risk"""
-        risk_score = 0
-        contributing_factors = []
-        
-        # Age factor
-        age_threshold = 45 if profile.gender == 'male' else 55
-        if profile.age >= age_threshold:
-            risk_score += 15
-            contributing_factors.append(f"Age ≥ {age_threshold} years")
-        
-        # BMI factor
-        bmi = self.health_calculator.calculate_bmi(profile.weight_kg, profile.height_cm)
-        if bmi >= 25:
-            risk_score += 20
-            contributing_factors.append("Overweight/Obese")
-        
-        # Sodium intake
-        if daily_intake['sodium_mg'] > self.disease_thresholds['hypertension']['daily_sodium_mg']:
-            excess_sodium = daily_intake['sodium_mg'] - self.disease_thresholds['hypertension']['daily_sodium_mg']
-            risk_score += min(30, excess_sodium * 0.01)
-            contributing_factors.append(f"High sodium intake ({daily_intake['sodium_mg']:.0f}mg/day)")
-        
-        # Family history
-        if 'hypertension' in [fh.lower() for fh in profile.family_history] or 'high blood pressure' in [fh.lower() for fh in profile.family_history]:
-            risk_score += 15
-            contributing_factors.append("Family history of hypertension")
-        
-        risk_percentage = min(100, risk_score)
-        
-        if risk_percentage < 25:
-            risk_level = 'low'
-        elif risk_percentage < 50:
-            risk_level = 'moderate'
-        elif risk_percentage < 75:
-            risk_level = 'high'
-        else:
-            risk_level = 'very_high'
-        
-        recommendations = [
-            "Reduce sodium intake to <2,300mg/day",
-            "Maintain healthy weight",
-            "Regular aerobic exercise",
-            "Limit alcohol consumption",
-            "Manage stress levels"
-        ]
-        
-        return DiseaseRisk(
-            disease_name='Hypertension',
-            risk_percentage=risk_percentage,
-            risk_level=risk_level,
-            contributing_factors=contributing_factors,
-            recommendations=recommendations
-        )
-    
-    def _predict_heart_disease_risk(self, profile: UserProfile, daily_intake: Dict[str, float]) -> DiseaseRisk:
-        """Predict Heart Disease risk"""
-        risk_score = 0
-        contributing_factors = []
-        
-        # Age and gender factors
-        if (profile.gender == 'male' and profile.age >= 45) or (profile.gender == 'female' and profile.age >= 55):
-            risk_score += 10
-            contributing_factors.append("Advanced age")
-        
-        # BMI factor
-        bmi = self.health_calculator.calculate_bmi(profile.weight_kg, profile.height_cm)
-        if bmi >= 25:
-            risk_score += 15
-            contributing_factors.append("Overweight/Obese")
-        
-        # Saturated fat intake
-        if daily_intake['saturated_fat_g'] > self.disease_thresholds['heart_disease']['daily_sat_fat_g']:
-            excess_fat = daily_intake['saturated_fat_g'] - self.disease_thresholds['heart_disease']['daily_sat_fat_g']
-            risk_score += min(25, excess_fat * 2)
-            contributing_factors.append(f"High saturated fat intake ({daily_intake['saturated_fat_g']:.1f}g/day)")
-        
-        # Sodium factor
-        if daily_intake['sodium_mg'] > self.disease_thresholds['heart_disease']['daily_sodium_mg']:
-            risk_score += 10
-            contributing_factors.append("High sodium intake")
-        
-        # Family history
-        heart_conditions = ['heart disease', 'cardiac', 'heart attack', 'coronary']
-        if any(condition in ' '.join(profile.family_history).lower() for condition in heart_conditions):
-            risk_score *= self.disease_thresholds['heart_disease']['family_history_multiplier']
-            contributing_factors.append("Family history of heart disease")
-        
-        risk_percentage = min(100, risk_score)
-        
-        if risk_percentage < 20:
-            risk_level = 'low'
-        elif risk_percentage < 40:
-            risk_level = 'moderate'
-        elif risk_percentage < 70:
-            risk_level = 'high'
-        else:
-            risk_level = 'very_high'
-        
-        recommendations = [
-            "Reduce saturated fat to <13g/day",
-            "Increase omega-3 fatty acids",
-            "Regular cardiovascular exercise",
-            "Don't smoke",
-            "Control cholesterol levels"
-        ]
-        
-        return DiseaseRisk(
-            disease_name='Heart Disease',
-            risk_percentage=risk_percentage,
-            risk_level=risk_level,
-            contributing_factors=contributing_factors,
-            recommendations=recommendations
-        )
+        for rule in self.rule_engine.rules:
+            percentages = rule.evaluate_batch(columns)
+            result['overall_risk_score'] = [total + pct * rule.weight
+                                            for total, pct in zip(result['overall_risk_score'], percentages)]
+            result['disease_risks'][rule.disease_name] = {
+                'risk_percentage': percentages,
+                'risk_level': [rule.level(pct) for pct in percentages]
+            }
+        result['overall_risk_score'] = [total * 100 for total in result['overall_risk_score']]
+        return result
     
     def print_lifestyle_assessment_report(self, assessment: LifestyleDiseaseAssessment):
         """Print comprehensive lifestyle disease assessment report"""
@@ -324,6 +329,23 @@ class DiseasePredictionService:
             print(f"   • Excess saturated fat: +{factors['excess_saturated_fat']:.1f}g/day above recommended")
         if factors['excess_sodium'] > 200:
             print(f"   • Excess sodium: +{factors['excess_sodium']:.0f}mg/day above recommended")
+
+        # Peak-day exposure for multi-day diaries
+        summary = assessment.intake_summary
+        if summary and assessment.dietary_pattern.days_tracked > 1:
+            print(f"\n📅 PEAK DAYS:")
+            for key, label, unit in (('calories', 'Calories', ' cal'), ('sugar_g', 'Sugar', 'g'),
+                                     ('saturated_fat_g', 'Saturated fat', 'g'), ('sodium_mg', 'Sodium', 'mg')):
+                print(f"   • {label}: {summary['peak'][key]:.0f}{unit} on day {summary['peak_day'][key] + 1} "
+                      f"(average {summary['mean'][key]:.0f}{unit})")
+
+        # Foods behind the risk
+        if assessment.food_attribution:
+            print(f"\n🍔 TOP CONTRIBUTING FOODS:")
+            for item in assessment.food_attribution[:3]:
+                shares = item['nutrient_share']
+                print(f"   • {item['food']}: {shares['sugar_g']:.0%} of sugar, {shares['saturated_fat_g']:.0%} of saturated fat, "
+                      f"{shares['sodium_mg']:.0%} of sodium (risk score -{item['overall_impact']:.1f} without it)")
         
         # Intervention priorities
         if assessment.intervention_priority:
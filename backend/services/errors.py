@@ -0,0 +1,5 @@
+""" Exceptions raised by services and caught by the web layers; kept free of heavy imports """
+
+
+class SessionNotFoundError(KeyError):
+    """ Raised when a session id is unknown or the session has expired """
@@ -0,0 +1,169 @@
+""" Batch analysis jobs queued in the database and run by a pool of worker threads """
+
+import json
+import threading
+import traceback
+import uuid
+from typing import Any, Dict, List, Optional
+
+from config.settings import JOB_CONFIG
+from services.database_service import DatabaseService
+from utils.api_payloads import (
+    parse_lifestyle_request, nutrition_payload, nutrition_from_payload, food_result_payload,
+    lifestyle_payload, analysis_summary
+)
+from utils.validators import InputValidator
+
+
+class JobService:
+    """ Runs analyses too large for one request (whole menus, long patient diaries).
+
+    The database is the queue: a job row holds the request and one item row per unique
+    food holds that food's lookup result. Workers lease batches of pending items, store
+    each result as soon as it is looked up, and whichever worker finds a job with every
+    item done builds the final result from the stored items. Leases that outlive
+    lease_seconds go back to the queue, so a job interrupted by a crash or restart
+    resumes where it stopped without repeating finished lookups.
+    """
+
+    def __init__(self, db_service: DatabaseService, nutrition_service, risk_service, disease_service,
+                 config: Optional[Dict[str, Any]] = None):
+        self.db_service = db_service
+        self.nutrition_service = nutrition_service
+        self.risk_service = risk_service
+        self.disease_service = disease_service
+        self.config = config or JOB_CONFIG
+        self.worker_id = uuid.uuid4().hex
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def submit(self, job_type: str, payload: Dict[str, Any], foods: List[str]) -> Optional[str]:
+        """ Queue a job; returns its id, or None if the queue database is unavailable """
+        job_id = uuid.uuid4().hex
+        if not self.db_service.create_job(job_id, job_type, payload, list(dict.fromkeys(foods))):
+            return None
+        return job_id
+
+    def get_status(self, job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        """ Progress of a job, with its result once completed; None if the job does not exist """
+        job = self.db_service.get_job(job_id)
+        if job is None:
+            return None
+        total = job['total_items'] or 0
+        completed = job['completed_items'] or 0
+        status = {
+            'job_id': job['id'],
+            'job_type': job['job_type'],
+            'status': job['status'],
+            'total_items': total,
+            'completed_items': completed,
+            'progress': round(completed / total, 4) if total else 1.0,
+            'created_at': job['created_at'].isoformat() if job['created_at'] else None,
+            'updated_at': job['updated_at'].isoformat() if job['updated_at'] else None,
+            'error': job['error']
+        }
+        if include_result and job['status'] == 'completed' and job['result']:
+            status['result'] = json.loads(job['result'])
+        return status
+
+    def start(self):
+        """ Start the worker threads; calling it again is a no-op """
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for number in range(self.config['workers']):
+                thread = threading.Thread(target=self._worker, name=f'job-worker-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            print(f"🧵 Started {len(self._threads)} job workers")
+
+    def stop(self, timeout: float = 5.0):
+        """ Ask the workers to finish their current item and exit """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_pending(self) -> bool:
+        """ Do one unit of queued work (finalize a finished job or process a batch); False when idle """
+        job = self.db_service.claim_finished_job()
+        if job:
+            self._finalize(job)
+            return True
+
+        items = self.db_service.claim_job_items(self.worker_id, self.config['batch_size'])
+        job_types = {}
+        for item in items:
+            if self._stop.is_set():
+                # Unprocessed items are picked up again once their lease expires
+                break
+            job_id = item['job_id']
+            if job_id not in job_types:
+                job = self.db_service.get_job(job_id)
+                job_types[job_id] = job['job_type'] if job else None
+            result = self._process_item(job_types[job_id], item['food_name'])
+            self.db_service.complete_job_item(item['id'], job_id, self.worker_id, result)
+        return bool(items)
+
+    def _worker(self):
+        """ Worker loop: work while the queue has items, otherwise requeue stale leases and wait """
+        while not self._stop.is_set():
+            try:
+                if self.run_pending():
+                    continue
+                self.db_service.requeue_stale_jobs(self.config['lease_seconds'])
+            except Exception as e:
+                print(f"❌ Job worker error: {e}")
+            self._stop.wait(self.config['poll_interval_s'])
+
+    def _process_item(self, job_type: str, food_name: str) -> Dict[str, Any]:
+        """ Look one food up; food jobs also score its risk """
+        try:
+            nutrition_info = self.nutrition_service.get_food_nutrition(food_name, interactive=False)
+        except Exception as e:
+            print(f"❌ Error looking up '{food_name}' for job: {e}")
+            nutrition_info = None
+        if job_type == 'foods':
+            risk_assessment = self.risk_service.calculate_risk_score(nutrition_info) if nutrition_info else None
+            return food_result_payload(food_name, nutrition_info, risk_assessment)
+        return {'nutrition': nutrition_payload(nutrition_info) if nutrition_info else None}
+
+    def _finalize(self, job: Dict[str, Any]):
+        """ Build a job's result from its stored items and mark it completed (or failed) """
+        job_id = job['id']
+        try:
+            payload = json.loads(job['payload'])
+            items = self.db_service.get_job_item_results(job_id)
+            if job['job_type'] == 'foods':
+                result = self._foods_result(payload, items)
+            else:
+                result = self._lifestyle_result(payload, items)
+            self.db_service.finish_job(job_id, 'completed', result=result)
+        except Exception as e:
+            traceback.print_exc()
+            self.db_service.finish_job(job_id, 'failed', error=str(e))
+
+    @staticmethod
+    def _foods_result(payload: Dict[str, Any], items: Dict[str, Any]) -> Dict[str, Any]:
+        """ Per-food results in request order plus the analysis summary """
+        results = [{'index': index, **items[food]} for index, food in enumerate(payload['foods'])]
+        return {'results': results, **analysis_summary(results)}
+
+    def _lifestyle_result(self, payload: Dict[str, Any], items: Dict[str, Any]) -> Dict[str, Any]:
+        """ Full lifestyle assessment over the stored lookups """
+        user_profile, dietary_pattern, error = parse_lifestyle_request(
+            payload, self.config['max_items'], self.config['max_days'])
+        if error:
+            raise ValueError(error)
+        _, _, uncertainty_draws = InputValidator.validate_uncertainty_option(payload.get('uncertainty'))
+        resolved = {
+            food: nutrition_from_payload(item['nutrition']) if item.get('nutrition') else None
+            for food, item in items.items()
+        }
+        assessment = self.disease_service.assess_lifestyle_disease_risk(
+            user_profile, dietary_pattern, uncertainty_draws, resolved=resolved)
+        return lifestyle_payload(assessment)
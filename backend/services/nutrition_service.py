@@ -3,12 +3,16 @@
 import requests
 import wikipedia
 import re
+import time
 from typing import Optional
 
-from config.settings import API_CONFIG, FOOD_CATEGORIES
+from config.settings import API_CONFIG, NUTRITION_CACHE_CONFIG
 from models.nutrition import NutritionInfo
 from services.database_service import DatabaseService
 from utils.food_categorizer import FoodCategorizer
+from utils.nutrition_cache import NutritionCache
+from utils.metrics import LOOKUP_SECONDS, USDA_REQUESTS, record_usda_rate_limit
+from utils.tracing import span, traced
 
 class NutritionService:
     """ Handles nutrition data fetching from various sources """
@@ -17,71 +21,83 @@ class NutritionService:
             self.db_service = DatabaseService()
         else:
             self.db_service = db_service
-        self.food_categorizer = FoodCategorizer(food_categories=FOOD_CATEGORIES)
+        self.food_categorizer = FoodCategorizer()
         self._request_count = 0
-
-    def get_food_nutrition(self, food_name: str) -> Optional[NutritionInfo]:
-        """ Fetch nutritional information for a given food item """
+        # Foods saved from any source land in the cache through the food listener
+        self.cache = NutritionCache(NUTRITION_CACHE_CONFIG)
+        self.db_service.add_food_listener(self.cache.put)
+
+    def get_food_nutrition(self, food_name: str, interactive: bool = True) -> Optional[NutritionInfo]:
+        """ Fetch nutritional information for a given food item; interactive=False never prompts for input """
+        started = time.perf_counter()
+        with span('nutrition.lookup', food=food_name) as lookup_span:
+            nutrition_info, source = self._lookup(food_name, interactive)
+            lookup_span.set_attribute('source', source)
+        LOOKUP_SECONDS.observe(time.perf_counter() - started, source)
+        return nutrition_info
+
+    def _lookup(self, food_name: str, interactive: bool):
+        """ Nutrition information and the source that answered ('miss' if none did) """
         found_in_db = False
         found_in_api = False
         found_in_wikipedia = False
         user_provided_info = False
 
+        #0. Foods resolved recently by this process skip the database
+        with span('cache.get'):
+            nutrition_info = self.cache.get(food_name)
+        if nutrition_info:
+            return nutrition_info, 'cache'
+
         #1. Check if food is already in the database
         nutrition_info = self.db_service.get_food_from_db(food_name)
         if nutrition_info:
             found_in_db = True
+            self.cache.put(nutrition_info, food_name)
             self.db_service.log_user_query(food_name, found_in_db, found_in_api, found_in_wikipedia, user_provided_info)
-            return nutrition_info
+            return nutrition_info, 'db'
         
         #2.  Fetch from external API
         nutrition_info = self._search_usda_api(food_name)
         if nutrition_info:
             found_in_api = True
             self.db_service.save_food_to_db(nutrition_info)
+            # Saved under the USDA description; also cache it under the name asked for
+            self.cache.put(nutrition_info, food_name)
             self.db_service.log_user_query(food_name, found_in_db, found_in_api, found_in_wikipedia, user_provided_info)
-            return nutrition_info
+            return nutrition_info, 'usda'
         
         #3. Fallback to Wikipedia
         nutrition_info = self._search_wikipedia_fallback(food_name)
         if nutrition_info:
             found_in_wikipedia = True
             self.db_service.save_food_to_db(nutrition_info)
+            self.cache.put(nutrition_info, food_name)
             self.db_service.log_user_query(food_name, found_in_db, found_in_api, found_in_wikipedia, user_provided_info)
-            return nutrition_info
+            return nutrition_info, 'wikipedia'
         #4. Ask user for nutritional information(for command line interface)
+        if not interactive:
+            self.db_service.log_user_query(food_name, found_in_db, found_in_api, found_in_wikipedia, user_provided_info)
+            return None, 'miss'
         nutrition_info = self._get_user_nutrition_input(food_name)
         if nutrition_info:
             user_provided_info = True
             self.db_service.save_food_to_db(nutrition_info)
+            self.cache.put(nutrition_info, food_name)
             self.db_service.log_user_query(food_name, found_in_db, found_in_api, found_in_wikipedia, user_provided_info)
-            return nutrition_info
+            return nutrition_info, 'user'
+        return None, 'miss'
         
+    @traced('usda.search')
     def _search_usda_api(self, food_name: str) -> Optional[NutritionInfo]:
         """ Search USDA FoodData Central API for food information """
         try:
-            # Check if API key is available
-            if not API_CONFIG.get('api_key'):
-                print("⚠️ USDA API key not configured, skipping API call")
-                return None
-        
-            self._request_count += 1
-            print(f"📡 API Request #{self._request_count} for: {food_name}")
-            
-            # Check if we're approaching rate limits
-            if self._request_count > 950:  # Conservative limit
-                print("⚠️ Approaching API rate limit, skipping API call")
+            if not self._reserve_usda_request(food_name):
                 return None
             #Search for food
-            search_url = f"{API_CONFIG['base_url']}/foods/search"
-            params = {
-                'query': food_name,
-                'api_key': API_CONFIG['api_key'],
-                'pageSize': 1,
-                'dataType': ["Survey (FNDDS)"]
-            }
-
+            search_url, params = self._usda_search_request(food_name)
             response = requests.get(search_url, params=params)
+            record_usda_rate_limit(response.headers)
             response.raise_for_status()
             data = response.json()
 
@@ -92,42 +108,80 @@ class NutritionService:
             food_item = data['foods'][0]
 
             #Get detailed nutrition info
-            food_id = food_item['fdcId']
-            detail_url = f"{API_CONFIG['base_url']}/food/{food_id}"
-            detail_params = {'api_key': API_CONFIG['api_key']}
-
+            detail_url, detail_params = self._usda_detail_request(food_item)
             detail_response = requests.get(detail_url, params=detail_params)
+            record_usda_rate_limit(detail_response.headers)
             detail_response.raise_for_status()
-            detail_data = detail_response.json()
 
-            # Extract nutrition data
-            nutrients = {n['nutrient']['name'].lower(): n.get('amount', 0)
-                        for n in detail_data.get('foodNutrients', [])}
-            #Map nutrient names to our standardized format
-            sugar = nutrients.get('sugars, total including nlea', 0) or nutrients.get('total sugars', 0)
-            sat_fat = nutrients.get('fatty acids, total saturated', 0)
-            sodium = nutrients.get('sodium, na', 0)
-            calories = nutrients.get('energy', 0)
-
-            #Determin category based on food description
-            description = food_item.get('description', '').lower()
-            category = self.food_categorizer.categorize(description)
-
-            nutrition_info = NutritionInfo(
-                food_name=food_item.get('description', food_name),
-                calories_per_100g=calories,
-                sugar_g=sugar,
-                saturated_fat_g=sat_fat,
-                sodium_mg=sodium,
-                category=category,
-                source='api'
-            )
-
-            return nutrition_info
+            return self._parse_usda_food(food_name, food_item, detail_response.json())
         except Exception as e:
             print(f"❌ Error calling USDA API for '{food_name}': {e}")
             return None
+    
+    def _reserve_usda_request(self, food_name: str) -> bool:
+        """ Check the API key and rate budget, counting the request if it may go ahead """
+        # Check if API key is available
+        if not API_CONFIG.get('api_key'):
+            print("⚠️ USDA API key not configured, skipping API call")
+            USDA_REQUESTS.inc('no_api_key')
+            return False
+    
+        self._request_count += 1
+        print(f"📡 API Request #{self._request_count} for: {food_name}")
+        
+        # Check if we're approaching rate limits
+        if self._request_count > API_CONFIG['request_budget']:
+            print("⚠️ Approaching API rate limit, skipping API call")
+            USDA_REQUESTS.inc('over_budget')
+            return False
+        USDA_REQUESTS.inc('sent')
+        return True
+    
+    def usda_budget_remaining(self) -> int:
+        """ USDA requests this service may still send """
+        return max(0, API_CONFIG['request_budget'] - self._request_count)
+    
+    @staticmethod
+    def _usda_search_request(food_name: str):
+        """ URL and query parameters of the USDA food search """
+        return f"{API_CONFIG['base_url']}/foods/search", {
+            'query': food_name,
+            'api_key': API_CONFIG['api_key'],
+            'pageSize': 1,
+            'dataType': ["Survey (FNDDS)"]
+        }
+    
+    @staticmethod
+    def _usda_detail_request(food_item: dict):
+        """ URL and query parameters of the USDA food detail lookup """
+        return f"{API_CONFIG['base_url']}/food/{food_item['fdcId']}", {'api_key': API_CONFIG['api_key']}
+    
+    def _parse_usda_food(self, food_name: str, food_item: dict, detail_data: dict) -> NutritionInfo:
+        """ Build nutrition information from a USDA search hit and its detail record """
+        # Extract nutrition data
+        nutrients = {n['nutrient']['name'].lower(): n.get('amount', 0)
+                    for n in detail_data.get('foodNutrients', [])}
+        #Map nutrient names to our standardized format
+        sugar = nutrients.get('sugars, total including nlea', 0) or nutrients.get('total sugars', 0)
+        sat_fat = nutrients.get('fatty acids, total saturated', 0)
+        sodium = nutrients.get('sodium, na', 0)
+        calories = nutrients.get('energy', 0)
+
+        #Determin category based on food description
+        description = food_item.get('description', '').lower()
+        category = self.food_categorizer.categorize(description)
+
+        return NutritionInfo(
+            food_name=food_item.get('description', food_name),
+            calories_per_100g=calories,
+            sugar_g=sugar,
+            saturated_fat_g=sat_fat,
+            sodium_mg=sodium,
+            category=category,
+            source='api'
+        )
         
+    @traced('wikipedia.search')
     def _search_wikipedia_fallback(self, food_name: str) -> Optional[NutritionInfo]:
         """ Fallback to Wikipedia for food nutrition information """
         try:
@@ -181,7 +235,8 @@ class NutritionService:
             sugar = float(input("Sugar (g): ") or "0")
             sat_fat = float(input("Saturated Fat (g): ") or "0")
             sodium = float(input("Sodium (mg): ") or "0")
-            category = input("Food category: (fruits/vegetables/grains/proteins/dairy/snacks):") or "unknown"
+            categories = '/'.join(self.food_categorizer.categories)
+            category = input(f"Food category: ({categories}):") or self.food_categorizer.default
 
             nutrition_info = NutritionInfo(
                 food_name=food_name,
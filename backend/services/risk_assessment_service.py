@@ -1,9 +1,12 @@
 """ Risk Assessment service for food health analysis """
 
-from typing import Dict, List
-from config.settings import RISK_THRESHOLDS, FOOD_CATEGORIES
+import threading
+from typing import Dict, List, Tuple
+from config.settings import RISK_THRESHOLDS, FOOD_CATEGORIES, NUTRIENT_SCALES, ALTERNATIVES_CONFIG
 from models.nutrition import NutritionInfo, RiskAssessment
 from services.database_service import DatabaseService
+from utils.nutrient_index import FoodAlternativesIndex
+from utils.tracing import traced
 
 class RiskAssessmentService:
     """ Handles risk assessment for food items based on nutritional information """
@@ -15,9 +18,39 @@ class RiskAssessmentService:
             self.db_service = db_service
         self.thresholds = RISK_THRESHOLDS
         self.food_categories = FOOD_CATEGORIES
+        self.alternatives_index = FoodAlternativesIndex(NUTRIENT_SCALES)
+        self._alternatives_index_loaded = False
+        self._alternatives_index_lock = threading.Lock()
+        self.db_service.add_food_listener(self._index_food)
 
-    def calculate_risk_score(self, nutrition_info: NutritionInfo) -> RiskAssessment:
-        """ Calculate risk score based on nutrition thresholds """
+    @traced('risk.score')
+    def calculate_risk_score(self, nutrition_info: NutritionInfo, persist: bool = True) -> RiskAssessment:
+        """ Calculate risk score based on nutrition thresholds; persist=False leaves saving it to the caller """
+        risk_score, risk_factors = self._score_nutrition(nutrition_info)
+
+        # Determine if food is risky
+        is_risky = risk_score >= 5
+
+        #Get alternatives if risky
+        self._index_food(nutrition_info, risk_score)
+        alternatives = self._get_healthy_alternatives(nutrition_info, risk_score) if is_risky else []
+
+        assessment = RiskAssessment(
+            food_name=nutrition_info.food_name,
+            risk_score=risk_score,
+            is_risky=is_risky,
+            risk_factors=risk_factors,
+            alternatives=alternatives
+        )
+
+        # Save risk assessment to database
+        if persist:
+            self.db_service.save_risk_assessment(assessment)
+
+        return assessment
+
+    def _score_nutrition(self, nutrition_info: NutritionInfo) -> Tuple[int, Dict[str, str]]:
+        """ Score a food against the nutrition thresholds without side effects """
         risk_score = 0
         risk_factors = {}
 
@@ -45,28 +78,35 @@ class RiskAssessmentService:
             risk_score += 1
             risk_factors['sodium'] = 'medium'
 
-        # Determine if food is risky
-        is_risky = risk_score >= 5
-
-        #Get alternatives if risky
-        alternatives = self._get_healthy_alternatives(nutrition_info.category) if is_risky else []
-
-        assessment = RiskAssessment(
-            food_name=nutrition_info.food_name,
-            risk_score=risk_score,
-            is_risky=is_risky,
-            risk_factors=risk_factors,
-            alternatives=alternatives
-        )
+        return risk_score, risk_factors
+    
+    @traced('risk.alternatives')
+    def _get_healthy_alternatives(self, nutrition_info: NutritionInfo, risk_score: float) -> List[str]:
+        """ Get the most similar lower-risk foods in the same category from the catalog """
+        self._load_alternatives_index()
+        alternatives = self.alternatives_index.nearest_healthier(
+            nutrition_info, risk_score, ALTERNATIVES_CONFIG['max_alternatives'])
+        # Fall back to the static category list while the catalog is sparse
+        return alternatives or self.food_categories.get(nutrition_info.category, [])
 
-        # Save risk assessment to database
-        self.db_service.save_risk_assessment(assessment)
+    def _load_alternatives_index(self):
+        """ Bulk-load the food catalog into the alternatives index on first use """
+        if self._alternatives_index_loaded:
+            return
+        # Concurrent first queries wait for the load instead of searching an empty index
+        with self._alternatives_index_lock:
+            if self._alternatives_index_loaded:
+                return
+            catalog = self.db_service.get_all_foods_from_db()
+            self.alternatives_index.add_foods(
+                [(food, self._score_nutrition(food)[0]) for food in catalog])
+            self._alternatives_index_loaded = True
 
-        return assessment
-    
-    def _get_healthy_alternatives(self, category: str) -> List[str]:
-        """ Get healthy alternatives based on food category """
-        return self.food_categories.get(category, [])
+    def _index_food(self, nutrition_info: NutritionInfo, risk_score: float = None):
+        """ Add a newly seen or saved food to the alternatives index (a no-op when it is indexed unchanged) """
+        if risk_score is None:
+            risk_score = self._score_nutrition(nutrition_info)[0]
+        self.alternatives_index.add_food(nutrition_info, risk_score)
 
     def analyze_foods(self, food_list: List[str], nutrition_service) -> Dict[str, RiskAssessment]:
         """ Analyze food items and return risk assessments """
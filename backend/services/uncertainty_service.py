@@ -0,0 +1,89 @@
+""" Monte Carlo uncertainty estimation for lifestyle disease risk """
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from config.settings import UNCERTAINTY_CONFIG
+from models.user import UserProfile
+from utils.disease_rules import DiseaseRuleEngine
+from utils.tracing import traced
+
+INTAKE_KEYS = ('calories', 'sugar_g', 'saturated_fat_g', 'sodium_mg')
+
+
+class UncertaintyService:
+    """ Samples portion and nutrient perturbations and re-scores the disease rules over all draws """
+
+    def __init__(self, rule_engine: DiseaseRuleEngine, config: Optional[Dict[str, Any]] = None):
+        self.rule_engine = rule_engine
+        self.config = config or UNCERTAINTY_CONFIG
+        self.rng = np.random.default_rng(self.config.get('seed'))
+
+    @traced('disease.uncertainty')
+    def estimate(self, profile: UserProfile, bmi: float, maintenance_calories: float,
+                 food_contributions: Dict[str, Dict[str, float]], food_sources: Dict[str, str],
+                 draws: int, peak_ratio: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """ Return confidence intervals for each disease risk and the overall risk score.
+
+        Peak-day intake is taken as each draw's mean intake scaled by peak_ratio (peak / mean).
+        """
+        intake_draws = self._sample_daily_intake(food_contributions, food_sources, draws)
+        peak_draws = None
+        if peak_ratio is not None:
+            peak_draws = {key: values * peak_ratio[key] for key, values in intake_draws.items()}
+
+        metrics = self.rule_engine.build_metrics(
+            profile.age, profile.gender, bmi, maintenance_calories,
+            {key: 0.0 for key in INTAKE_KEYS}, profile.family_history)
+        self.rule_engine.set_intake(metrics, intake_draws, maintenance_calories, peak_draws)
+
+        overall = np.zeros(draws)
+        disease_risks = {}
+        for rule in self.rule_engine.rules:
+            percentages = rule.evaluate_arrays(metrics, draws)
+            overall += percentages * rule.weight
+            disease_risks[rule.disease_name] = self._summarize(percentages)
+        overall *= 100
+
+        return {
+            'draws': draws,
+            'interval': self.config['interval'],
+            'disease_risks': disease_risks,
+            'overall_risk_score': self._summarize(overall)
+        }
+
+    def _sample_daily_intake(self, food_contributions: Dict[str, Dict[str, float]],
+                             food_sources: Dict[str, str], draws: int) -> Dict[str, np.ndarray]:
+        """ Draw daily intake totals with per-food portion noise and per-nutrient source noise """
+        foods = list(food_contributions)
+        if not foods:
+            return {key: np.zeros(draws) for key in INTAKE_KEYS}
+
+        # foods x nutrients matrix of mean daily contributions
+        base = np.array([[food_contributions[food][key] for key in INTAKE_KEYS] for food in foods])
+        nutrient_cv = self.config['nutrient_cv']
+        source_cv = np.array([nutrient_cv.get(food_sources.get(food), nutrient_cv['default']) for food in foods])
+
+        # Mean-one lognormal multipliers: one per food for portions, one per food and nutrient for values
+        portion = self._lognormal_multipliers(np.full(len(foods), self.config['portion_cv']), (draws, len(foods)))
+        nutrient = self._lognormal_multipliers(source_cv[:, None], (draws, len(foods), len(INTAKE_KEYS)))
+
+        totals = np.einsum('df,dfn,fn->dn', portion, nutrient, base, optimize=True)
+        return {key: totals[:, j] for j, key in enumerate(INTAKE_KEYS)}
+
+    def _lognormal_multipliers(self, cv: np.ndarray, shape) -> np.ndarray:
+        """ Lognormal samples with mean 1 and the given coefficient of variation """
+        sigma = np.sqrt(np.log1p(cv ** 2))
+        return np.exp(self.rng.standard_normal(shape) * sigma - sigma ** 2 / 2)
+
+    def _summarize(self, values: np.ndarray) -> Dict[str, float]:
+        """ Mean, median and central interval of sampled values """
+        tail = (1 - self.config['interval']) / 2 * 100
+        lower, median, upper = np.percentile(values, [tail, 50, 100 - tail])
+        return {
+            'mean': float(values.mean()),
+            'median': float(median),
+            'lower': float(lower),
+            'upper': float(upper)
+        }
@@ -1,7 +1,23 @@
-""" Utility functions for Food Health App """
+""" Utility functions for Food Health App
 
-from .food_categorizer import FoodCategorizer
-from .calculations import HealthCalculator
-from .validators import InputValidator
+Helpers are imported on first attribute access, so importing one utility module does not
+pull in the numeric dependencies of the others.
+"""
 
-__all__ = ['FoodCategorizer', 'HealthCalculator', 'InputValidator']
+import importlib
+
+_EXPORTS = {
+    'FoodCategorizer': 'food_categorizer',
+    'HealthCalculator': 'calculations',
+    'InputValidator': 'validators',
+    'FoodAlternativesIndex': 'nutrient_index',
+    'DiseaseRuleEngine': 'disease_rules',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
@@ -0,0 +1,360 @@
+""" Admission control: per-client token buckets and a per-process concurrency limit with load shedding """
+
+import asyncio
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from config.settings import ADMISSION_CONFIG, RATE_LIMIT_CONFIG
+from utils.metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_REJECTIONS, MetricFamily
+
+
+class Rejection(NamedTuple):
+    """ Why a request was turned away, as sent to the client """
+    status: int
+    error: str
+    retry_after: int
+
+
+class MemoryBucketStore:
+    """ Token buckets of this process only """
+
+    def __init__(self, max_clients: int = 100000):
+        self.max_clients = max_clients
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, client: str, cost: float, rate: float, burst: float, now: float) -> Tuple[bool, float]:
+        """ Refill the client's bucket and take cost from it if it holds enough; returns (allowed, tokens left) """
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (burst, now))
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                # A full bucket is the default state, so dropping full ones loses nothing
+                self._buckets = {key: bucket for key, bucket in self._buckets.items()
+                                 if bucket[0] + (now - bucket[1]) * rate < burst}
+            return allowed, tokens
+
+    def prune(self, idle_seconds: float, now: float):
+        """ Forget clients not seen for idle_seconds """
+        with self._lock:
+            self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < idle_seconds}
+
+
+class SQLiteBucketStore:
+    """ Token buckets in a SQLite file shared by every worker process on the host.
+
+    Each take is one short write transaction (refill, compare, debit), so workers see a
+    single bucket per client. The journal is not synced to disk: buckets are soft state
+    and losing them in a crash only hands clients a full bucket.
+    """
+
+    def __init__(self, path: str, timeout_s: float):
+        self.path = path
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS buckets (client TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+
+    def _connection(self) -> sqlite3.Connection:
+        """ This thread's connection (connections are not shared across threads or forks) """
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout_s, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+        return connection
+
+    def take(self, client: str, cost: float, rate: float, burst: float, now: float) -> Tuple[bool, float]:
+        """ Same as MemoryBucketStore.take, atomically across processes """
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM buckets WHERE client = ?', (client,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            connection.execute('INSERT OR REPLACE INTO buckets (client, tokens, updated) VALUES (?, ?, ?)',
+                               (client, tokens, now))
+            connection.execute('COMMIT')
+            return allowed, tokens
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def prune(self, idle_seconds: float, now: float):
+        """ Delete clients not seen for idle_seconds """
+        self._connection().execute('DELETE FROM buckets WHERE updated < ?', (now - idle_seconds,))
+
+
+class RateLimiter:
+    """ Token bucket per client, charged by what a request will cost before it runs.
+
+    Every request costs a base amount plus one amount per unique food it names: foods already
+    in this worker's nutrition cache are cheap, the rest may reach the database, the USDA API
+    (whose hourly quota every client shares) or Wikipedia and cost much more. Buckets live in
+    a SQLite file shared by the workers on the host; when the store is busy or unavailable
+    the request is decided by a bucket local to this process instead of failing.
+    """
+
+    PRUNE_EVERY = 10000 # takes between idle-bucket sweeps
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or RATE_LIMIT_CONFIG
+        self.local_store = MemoryBucketStore()
+        self._store = None
+        self._store_lock = threading.Lock()
+        self._takes = 0
+
+    @property
+    def store(self):
+        """ The shared store, opened on first use (importing the app touches no files) """
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    store = self.local_store
+                    if self.config['store'] != 'memory':
+                        try:
+                            store = SQLiteBucketStore(self.config['store'], self.config['store_timeout_s'])
+                        except Exception as e:
+                            print(f"⚠️ Rate limit store {self.config['store']} unavailable, limiting per process: {e}")
+                    self._store = store
+        return self._store
+
+    @property
+    def blocking(self) -> bool:
+        """ Whether check may wait on the shared store's file lock (async callers run it on a thread) """
+        return self.config['enabled'] and self.config['store'] != 'memory'
+
+    def client_id(self, api_key: Optional[str], remote_addr: Optional[str], forwarded_for: Optional[str] = None) -> str:
+        """ Bucket key: a known API key (hashed), otherwise the client address """
+        if api_key and api_key in self.config['api_keys']:
+            return 'key:' + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        if forwarded_for and self.config['trust_forwarded_for']:
+            remote_addr = forwarded_for.split(',')[0].strip()
+        return f"ip:{remote_addr or 'unknown'}"
+
+    def request_cost(self, foods: Iterable[str], cache=None) -> float:
+        """ Base cost plus the cost of looking each unique food up; cache is the nutrition cache, if built """
+        costs = self.config['costs']
+        cost = costs['request']
+        for food in {food.strip().lower() for food in foods}:
+            cached = cache is not None and cache.contains(food)
+            cost += costs['cached_lookup'] if cached else costs['uncached_lookup']
+            if cost >= self.config['burst']:
+                break
+        return cost
+
+    def check(self, client: str, cost: float) -> Tuple[Optional[Rejection], float]:
+        """ Take cost from the client's bucket; returns (None or a 429 rejection, tokens left) """
+        if not self.config['enabled']:
+            return None, self.config['burst']
+        rate, burst = self.config['refill_per_s'], self.config['burst']
+        # A request bigger than the bucket is admitted only from a full bucket, which it empties
+        cost = min(cost, burst)
+        now = time.time()
+        try:
+            allowed, tokens = self.store.take(client, cost, rate, burst, now)
+        except sqlite3.Error:
+            allowed, tokens = self.local_store.take(client, cost, rate, burst, now)
+        self._takes += 1
+        if self._takes % self.PRUNE_EVERY == 0:
+            self._prune(now)
+        if allowed:
+            return None, tokens
+        ADMISSION_REJECTIONS.inc('rate_limited')
+        retry_after = max(1, math.ceil((cost - tokens) / rate))
+        return Rejection(429, 'Rate limit exceeded for this client', retry_after), tokens
+
+    def _prune(self, now: float):
+        """ Drop buckets of clients gone idle """
+        try:
+            self.store.prune(self.config['idle_seconds'], now)
+        except sqlite3.Error as e:
+            print(f"⚠️ Rate limit store prune failed: {e}")
+
+    def reset(self):
+        """ New local buckets and store handle in a forked child (the SQLite file itself is shared) """
+        self.local_store = MemoryBucketStore()
+        self._store = None
+        self._store_lock = threading.Lock()
+
+
+class _AsyncWaiter:
+    """ A coroutine queued for a slot; granted is set under the limiter lock when a slot is handed to it """
+    __slots__ = ('loop', 'future', 'granted')
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+def _wake(future: asyncio.Future):
+    """ Resolve a waiter's future on its loop, unless it already gave up """
+    if not future.done():
+        future.set_result(None)
+
+
+class ConcurrencyLimiter:
+    """ At most max_concurrent requests in progress in this process; the rest queue briefly.
+
+    A request that cannot get a slot within the queue target is shed with 503 instead of
+    waiting behind work the process cannot finish in time, and once max_queue requests are
+    already waiting new ones are shed immediately. Wait times feed a histogram, so queueing
+    shows up in /metrics before requests start failing.
+
+    Threads queue on a condition (acquire); coroutines queue on futures (acquire_async), so a
+    full queue parks no executor threads. A released slot goes to a queued coroutine first.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or ADMISSION_CONFIG
+        self.max_concurrent = self.config['max_concurrent']
+        self.in_flight = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+        self._async_waiters = deque()
+
+    def try_acquire(self) -> bool:
+        """ Take a slot without waiting if one is free and nobody is queued ahead """
+        with self._condition:
+            if self.in_flight >= self.max_concurrent or self.waiting:
+                return False
+            self.in_flight += 1
+        ADMISSION_QUEUE_SECONDS.observe(0.0)
+        return True
+
+    def acquire(self) -> Optional[Rejection]:
+        """ Take a slot, waiting up to the queue target; returns a 503 rejection if the request is shed """
+        if self.try_acquire():
+            return None
+        started = time.perf_counter()
+        deadline = started + self.config['queue_target_ms'] / 1000.0
+        with self._condition:
+            if self.waiting >= self.config['max_queue']:
+                return self._shed('queue_full')
+            self.waiting += 1
+            try:
+                while self.in_flight >= self.max_concurrent:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        ADMISSION_QUEUE_SECONDS.observe(time.perf_counter() - started)
+                        return self._shed('overloaded')
+                    self._condition.wait(remaining)
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+        ADMISSION_QUEUE_SECONDS.observe(time.perf_counter() - started)
+        return None
+
+    async def acquire_async(self) -> Optional[Rejection]:
+        """ acquire for the event loop: waits on a future instead of a thread """
+        if self.try_acquire():
+            return None
+        started = time.perf_counter()
+        with self._condition:
+            if self.waiting >= self.config['max_queue']:
+                return self._shed('queue_full')
+            if self.in_flight < self.max_concurrent:
+                # A slot was released since try_acquire
+                self.in_flight += 1
+                ADMISSION_QUEUE_SECONDS.observe(time.perf_counter() - started)
+                return None
+            waiter = _AsyncWaiter(asyncio.get_running_loop())
+            self._async_waiters.append(waiter)
+            self.waiting += 1
+        try:
+            await asyncio.wait_for(waiter.future, self.config['queue_target_ms'] / 1000.0)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            if not self._withdraw(waiter):
+                self.release()
+            raise
+        ADMISSION_QUEUE_SECONDS.observe(time.perf_counter() - started)
+        if self._withdraw(waiter):
+            return self._shed('overloaded')
+        return None
+
+    def _withdraw(self, waiter: _AsyncWaiter) -> bool:
+        """ Take a waiter out of the queue; False if it was already handed a slot """
+        with self._condition:
+            if waiter.granted:
+                return False
+            self._async_waiters.remove(waiter)
+            self.waiting -= 1
+            return True
+
+    def release(self):
+        """ Give a slot back: hand it to the oldest queued coroutine, or wake one queued thread """
+        with self._condition:
+            if self._async_waiters:
+                waiter = self._async_waiters.popleft()
+                waiter.granted = True
+                self.waiting -= 1
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+            else:
+                self.in_flight -= 1
+                self._condition.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """ Slots in use, queued requests and the limit """
+        with self._condition:
+            return {'in_flight': self.in_flight, 'waiting': self.waiting, 'max': self.max_concurrent}
+
+    def _shed(self, reason: str) -> Rejection:
+        """ Count a shed request and build its rejection """
+        ADMISSION_REJECTIONS.inc(reason)
+        return Rejection(503, 'Server is overloaded, retry later', self.config['retry_after_s'])
+
+    def reset(self):
+        """ Forget slots held in the parent (a forked child starts with none in use) """
+        self.in_flight = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+        self._async_waiters = deque()
+
+
+def is_exempt(path: str, method: str) -> bool:
+    """ Health checks, metrics, admin endpoints and CORS preflights bypass admission control """
+    return method == 'OPTIONS' or path.startswith(RATE_LIMIT_CONFIG['exempt_paths'])
+
+
+def admission_metrics() -> List[MetricFamily]:
+    """ Concurrency limiter gauges for /metrics """
+    stats = CONCURRENCY.stats()
+    return [('foodhealth_admission_requests', 'gauge', 'Requests holding or waiting for a concurrency slot',
+             [({'state': 'in_flight'}, stats['in_flight']), ({'state': 'waiting'}, stats['waiting'])]),
+            ('foodhealth_admission_max_concurrent', 'gauge', 'Concurrency slots of this process',
+             [({}, stats['max'])])]
+
+
+RATE_LIMITER = RateLimiter()
+CONCURRENCY = ConcurrencyLimiter()
+
+
+def _reset_after_fork():
+    """ Post-fork hook: children hold no slots and reopen the store """
+    RATE_LIMITER.reset()
+    CONCURRENCY.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
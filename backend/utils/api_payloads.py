@@ -0,0 +1,207 @@
+""" Request parsing and response payloads shared by the Flask (app.py) and ASGI (asgi.py) servers """
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from models.nutrition import NutritionInfo, RiskAssessment
+from models.disease import LifestyleDiseaseAssessment
+from utils.request_schema import DIETARY_PATTERN_SCHEMA, USER_PROFILE_SCHEMA, format_errors
+from utils.serialization import dumps_json
+
+
+def parse_user_profile(data):
+    """Parse the profile fields of a request body into a user profile in one pass.
+
+    Returns (user_profile, None) or (None, error_message) listing every invalid field.
+    """
+    user_profile, errors = USER_PROFILE_SCHEMA.parse(data)
+    if errors:
+        return None, format_errors(USER_PROFILE_SCHEMA.title, errors)
+    return user_profile, None
+
+def requested_foods(data, food_name: Optional[str] = None) -> List[str]:
+    """Food names a request asks to look up (body fields or the path), unvalidated, for admission costs"""
+    foods = [food_name] if food_name else []
+    if not isinstance(data, dict):
+        return foods
+    for field in ('foods', 'daily_foods'):
+        value = data.get(field)
+        if isinstance(value, str):
+            value = value.split(',')
+        if isinstance(value, list):
+            foods.extend(food for food in value if isinstance(food, str) and food.strip())
+    entries = data.get('entries')
+    if isinstance(entries, list):
+        foods.extend(entry['food'] for entry in entries
+                     if isinstance(entry, dict) and isinstance(entry.get('food'), str) and entry['food'].strip())
+    if isinstance(data.get('food'), str) and data['food'].strip():
+        foods.append(data['food'])
+    return foods
+
+def parse_lifestyle_request(data, max_foods: int = 20, max_days: int = 30):
+    """Parse a lifestyle request body into the user profile and dietary pattern in one pass.
+
+    max_foods and max_days raise the interactive limits for batch jobs.
+    Returns (user_profile, dietary_pattern, None) or (None, None, error_message) listing every
+    invalid field of both parts.
+    """
+    user_profile, profile_errors = USER_PROFILE_SCHEMA.parse(data)
+    dietary_pattern, dietary_errors = DIETARY_PATTERN_SCHEMA.parse(
+        data, {'max_foods': max_foods, 'max_days': max_days})
+    errors = [format_errors(schema.title, schema_errors)
+              for schema, schema_errors in ((USER_PROFILE_SCHEMA, profile_errors), (DIETARY_PATTERN_SCHEMA, dietary_errors))
+              if schema_errors]
+    if errors:
+        return None, None, '. '.join(errors)
+    return user_profile, dietary_pattern, None
+
+
+def nutrition_payload(nutrition_info: NutritionInfo) -> Dict[str, Any]:
+    """Nutrition information as returned by the API (DB decimals are converted by the serializer)"""
+    return {
+        'name': nutrition_info.food_name,
+        'calories_per_100g': nutrition_info.calories_per_100g,
+        'sugar_g': nutrition_info.sugar_g,
+        'saturated_fat_g': nutrition_info.saturated_fat_g,
+        'sodium_mg': nutrition_info.sodium_mg,
+        'category': nutrition_info.category,
+        'source': nutrition_info.source
+    }
+
+
+def nutrition_from_payload(payload: Dict[str, Any]) -> NutritionInfo:
+    """Rebuild nutrition information from its API payload (e.g. a stored job result)"""
+    return NutritionInfo(
+        food_name=payload['name'],
+        calories_per_100g=payload['calories_per_100g'],
+        sugar_g=payload['sugar_g'],
+        saturated_fat_g=payload['saturated_fat_g'],
+        sodium_mg=payload['sodium_mg'],
+        category=payload['category'],
+        source=payload['source']
+    )
+
+
+def risk_payload(risk_assessment: RiskAssessment) -> Dict[str, Any]:
+    """Food risk assessment as returned by the API"""
+    return {
+        'risk_score': risk_assessment.risk_score,
+        'is_risky': risk_assessment.is_risky,
+        'risk_factors': risk_assessment.risk_factors,
+        'alternatives': risk_assessment.alternatives
+    }
+
+
+def food_result_payload(food_name: str, nutrition_info: NutritionInfo, risk_assessment: RiskAssessment) -> Dict[str, Any]:
+    """One analyzed food: nutrition plus risk, or a not-found marker"""
+    if not nutrition_info:
+        return {
+            'food_name': food_name,
+            'nutrition': None,
+            'risk_assessment': None,
+            'error': 'Nutrition info not found'}
+    return {
+        'food_name': food_name,
+        'nutrition': nutrition_payload(nutrition_info),
+        'risk_assessment': risk_payload(risk_assessment)
+    }
+
+
+# Streaming response formats for /api/analyze-foods and their content types
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+
+def stream_format(accept: Optional[str], stream_param: Optional[str]) -> Optional[str]:
+    """Streaming format requested by the ?stream= flag or the Accept header, or None for plain JSON.
+
+    ?stream=ndjson and ?stream=sse pick a format, and any other true value means NDJSON.
+    The flag takes precedence over the header.
+    """
+    if stream_param:
+        value = stream_param.strip().lower()
+        if value in STREAM_FORMATS:
+            return value
+        return 'ndjson' if value in ('1', 'true', 'yes') else None
+    accept = (accept or '').lower()
+    for fmt, content_type in STREAM_FORMATS.items():
+        if content_type in accept:
+            return fmt
+    return None
+
+
+def stream_event(fmt: str, event: str, payload: Dict[str, Any]) -> bytes:
+    """One streamed event: an NDJSON line with an 'event' key, or an SSE event block"""
+    if fmt == 'sse':
+        return b'event: ' + event.encode() + b'\ndata: ' + dumps_json(payload) + b'\n\n'
+    return dumps_json({'event': event, **payload}) + b'\n'
+
+
+def food_result_event(index: int, food_name: str, nutrition_info: NutritionInfo,
+                      risk_assessment: RiskAssessment) -> Dict[str, Any]:
+    """A food result tagged with its position in the request, since results stream in completion order"""
+    return {'index': index, **food_result_payload(food_name, nutrition_info, risk_assessment)}
+
+
+def analysis_summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Closing event of a streamed analysis: counts over all food results"""
+    found = [result for result in results if result['nutrition']]
+    risky = sum(1 for result in found if result['risk_assessment']['is_risky'])
+    return {
+        'success': True,
+        'total': len(results),
+        'found': len(found),
+        'risky': risky,
+        'safe': len(found) - risky,
+        'analyzed_at': datetime.now().isoformat()
+    }
+
+
+def lifestyle_payload(assessment: LifestyleDiseaseAssessment) -> Dict[str, Any]:
+    """Lifestyle assessment as returned by the API"""
+    return {
+        'success': True,
+        'user_profile': {
+            'age': assessment.user_profile.age,
+            'gender': assessment.user_profile.gender,
+            'weight_kg': assessment.user_profile.weight_kg,
+            'height_cm': assessment.user_profile.height_cm,
+            'activity_level': assessment.user_profile.activity_level,
+            'family_history': assessment.user_profile.family_history,
+            'current_conditions': assessment.user_profile.current_conditions,
+            'maintenance_calories': assessment.maintenance_calories
+        },
+        'dietary_pattern': {
+            'daily_foods': assessment.dietary_pattern.daily_foods,
+            'portion_sizes_g': assessment.dietary_pattern.portion_sizes_g,
+            'meal_frequency': assessment.dietary_pattern.meal_frequency,
+            'days_tracked': assessment.dietary_pattern.days_tracked,
+            'total_foods_analyzed': len(assessment.dietary_pattern.daily_foods)
+        },
+        'dietary_analysis': {
+            'calories': assessment.daily_intake.get('calories', 0),
+            'sugar_g': assessment.daily_intake.get('sugar_g', 0),
+            'saturated_fat_g': assessment.daily_intake.get('saturated_fat_g', 0),
+            'sodium_mg': assessment.daily_intake.get('sodium_mg', 0),
+            'food_contributions': assessment.food_contributions,
+            'intake_summary': assessment.intake_summary
+        },
+        'disease_risks': [
+            {
+                'disease_name': risk.disease_name,
+                'risk_percentage': risk.risk_percentage,
+                'risk_level': risk.risk_level,
+                'contributing_factors': risk.contributing_factors,
+                'recommendations': risk.recommendations
+            }
+            for risk in assessment.disease_risks
+        ],
+        'overall_risk_score': assessment.overall_risk_score,
+        'key_dietary_factors': assessment.key_dietary_factors,
+        'food_attribution': assessment.food_attribution,
+        'intervention_priority': assessment.intervention_priority,
+        'uncertainty': assessment.uncertainty,
+        'assessed_at': datetime.now().isoformat()
+    }
@@ -1,5 +1,6 @@
 """ Health calculation utilities """
 
+from typing import List, Sequence
 from config.settings import ACTIVITY_MULTIPLIERS
 from models.user import UserProfile
 
@@ -20,6 +21,20 @@ class HealthCalculator:
 
         return bmr * ACTIVITY_MULTIPLIERS.get(profile.activity_level, 1.55)
 
+    def calculate_bmi_batch(self, weights_kg: Sequence[float], heights_cm: Sequence[float]) -> List[float]:
+        """ Calculate BMI for columns of weights and heights """
+        return [weight_kg / ((height_cm / 100) ** 2) for weight_kg, height_cm in zip(weights_kg, heights_cm)]
+
+    def calculate_daily_maintenance_calories_batch(self, ages: Sequence[int], genders: Sequence[str],
+                                                   weights_kg: Sequence[float], heights_cm: Sequence[float],
+                                                   activity_levels: Sequence[str]) -> List[float]:
+        """ Calculate maintenance calories for columns of profile values (same formula as the scalar version) """
+        offsets = [5 if gender == 'male' else -161 for gender in genders]
+        multipliers = [ACTIVITY_MULTIPLIERS.get(level, 1.55) for level in activity_levels]
+        return [(10 * weight_kg + 6.25 * height_cm - 5 * age + offset) * multiplier
+                for weight_kg, height_cm, age, offset, multiplier
+                in zip(weights_kg, heights_cm, ages, offsets, multipliers)]
+
     def get_bmi_category(self, bmi: float) -> str:
         """ Determine BMI category """
         if bmi < 18.5:
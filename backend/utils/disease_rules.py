@@ -0,0 +1,216 @@
+""" Declarative lifestyle disease rules compiled into flat evaluation plans """
+
+import hashlib
+import json
+import operator
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config.settings import DISEASE_RULES, DISEASE_RULES_FILE
+
+COMPARATORS = {
+    'gte': operator.ge,
+    'gt': operator.gt,
+    'lte': operator.le,
+    'lt': operator.lt,
+    'contains_any': lambda value, terms: any(term in value for term in terms),
+}
+
+
+def load_disease_rules() -> List[Dict[str, Any]]:
+    """ Load disease rules from DISEASE_RULES_FILE if configured, else the built-in rules """
+    if DISEASE_RULES_FILE:
+        with open(DISEASE_RULES_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return DISEASE_RULES
+
+
+class CompiledDiseaseRule:
+    """ One disease rule flattened into tuples for fast evaluation.
+
+    Each step is (is_multiply, branches) and each branch is
+    (metric, compare, threshold, by_gender, default, amount, factor) where amount is
+    either a constant or an (excess_metric, over, rate, max) tuple.
+    """
+
+    def __init__(self, rule: Dict[str, Any]):
+        self.disease_name = rule['disease_name']
+        self.weight = rule.get('weight', 0.33)
+        self.cap = rule.get('cap', 100)
+        self.levels = tuple(rule['levels'])
+        self.recommendations = list(rule.get('recommendations', []))
+        self.steps = tuple(self._compile_step(step) for step in rule['steps'])
+
+    def _compile_step(self, step: Dict[str, Any]) -> Tuple[bool, tuple]:
+        """ Compile a step and its branches """
+        if step['op'] not in ('add', 'multiply'):
+            raise ValueError(f"Unknown rule step op '{step['op']}' in {self.disease_name}")
+        branches = step.get('branches', [step])
+        return step['op'] == 'multiply', tuple(self._compile_branch(branch, step['op']) for branch in branches)
+
+    def _compile_branch(self, branch: Dict[str, Any], op: str) -> tuple:
+        """ Compile a single condition/amount/factor branch """
+        when = branch['when']
+        names = [name for name in COMPARATORS if name in when]
+        if len(names) != 1:
+            raise ValueError(f"Rule condition in {self.disease_name} needs exactly one comparator: {when}")
+        threshold = when[names[0]]
+        by_gender = isinstance(threshold, dict)
+        default = threshold.get('default') if by_gender else None
+
+        amount = branch['by'] if op == 'multiply' else branch['points']
+        if isinstance(amount, dict):
+            amount = (amount['excess'], amount['over'], amount['rate'], amount['max'])
+
+        return (when['metric'], COMPARATORS[names[0]], threshold, by_gender, default, amount, branch.get('factor'))
+
+    def level(self, risk_percentage: float) -> str:
+        """ Map a risk percentage to a risk level """
+        low, moderate, high = self.levels
+        if risk_percentage < low:
+            return 'low'
+        elif risk_percentage < moderate:
+            return 'moderate'
+        elif risk_percentage < high:
+            return 'high'
+        return 'very_high'
+
+    def evaluate(self, metrics: Dict[str, Any]) -> Tuple[float, List[str]]:
+        """ Score one profile; returns the capped risk percentage and contributing factors """
+        risk_score = 0
+        contributing_factors = []
+        gender = metrics['gender']
+        for is_multiply, branches in self.steps:
+            for metric, compare, threshold, by_gender, default, amount, factor in branches:
+                if by_gender:
+                    threshold = threshold.get(gender, default)
+                    if threshold is None:
+                        continue
+                if not compare(metrics[metric], threshold):
+                    continue
+                if type(amount) is tuple:
+                    excess_metric, over, rate, maximum = amount
+                    amount = min(maximum, (metrics[excess_metric] - over) * rate)
+                if is_multiply:
+                    risk_score *= amount
+                else:
+                    risk_score += amount
+                if factor:
+                    contributing_factors.append(factor.format(threshold=threshold, **metrics))
+                break
+        return min(self.cap, risk_score), contributing_factors
+
+    def evaluate_batch(self, columns: Dict[str, Sequence]) -> List[float]:
+        """ Score a cohort given metric columns, one pass per step """
+        genders = columns['gender']
+        scores = [0] * len(genders)
+        for is_multiply, branches in self.steps:
+            pending = range(len(scores))
+            for metric, compare, threshold, by_gender, default, amount, _ in branches:
+                values = columns[metric]
+                if by_gender:
+                    thresholds = [threshold.get(gender, default) for gender in genders]
+                    matched = [i for i in pending
+                               if thresholds[i] is not None and compare(values[i], thresholds[i])]
+                else:
+                    matched = [i for i in pending if compare(values[i], threshold)]
+
+                if type(amount) is tuple:
+                    excess_metric, over, rate, maximum = amount
+                    excess_values = columns[excess_metric]
+                    amounts = [min(maximum, (excess_values[i] - over) * rate) for i in matched]
+                else:
+                    amounts = [amount] * len(matched)
+                if is_multiply:
+                    for i, value in zip(matched, amounts):
+                        scores[i] *= value
+                else:
+                    for i, value in zip(matched, amounts):
+                        scores[i] += value
+
+                if len(branches) > 1:
+                    matched_set = set(matched)
+                    pending = [i for i in pending if i not in matched_set]
+        return [min(self.cap, score) for score in scores]
+
+
+    def evaluate_arrays(self, metrics: Dict[str, Any], size: int) -> np.ndarray:
+        """ Score one profile over arrays of alternative intakes (e.g. sampled draws or candidate diets).
+
+        Profile metrics are scalars; intake metrics may be arrays of length size.
+        """
+        gender = metrics['gender']
+        scores = np.zeros(size)
+        for is_multiply, branches in self.steps:
+            pending = np.ones(size, dtype=bool)
+            for metric, compare, threshold, by_gender, default, amount, _ in branches:
+                if by_gender:
+                    threshold = threshold.get(gender, default)
+                    if threshold is None:
+                        continue
+                matched = pending & compare(metrics[metric], threshold)
+                if type(amount) is tuple:
+                    excess_metric, over, rate, maximum = amount
+                    amount = np.minimum(maximum, (metrics[excess_metric] - over) * rate)
+                scores = np.where(matched, scores * amount if is_multiply else scores + amount, scores)
+                pending &= ~matched
+        return np.minimum(self.cap, scores)
+
+    def level_bound(self, level: str) -> float:
+        """ Exclusive upper bound of the risk percentage for a level (inf for very_high) """
+        bounds = dict(zip(('low', 'moderate', 'high'), self.levels))
+        return bounds.get(level, np.inf)
+
+
+class DiseaseRuleEngine:
+    """ Evaluates a set of compiled disease rules """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None):
+        rules = rules if rules is not None else load_disease_rules()
+        self.rules = [CompiledDiseaseRule(rule) for rule in rules]
+        # Fingerprint of the rule set, part of the key of cached assessments
+        self.version = hashlib.sha256(json.dumps(rules, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+    @staticmethod
+    def build_metrics(age: int, gender: str, bmi: float, maintenance_calories: float,
+                      daily_intake: Dict[str, float], family_history: List[str],
+                      peak_intake: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """ Collect the metrics rule conditions can refer to for one profile """
+        metrics = {
+            'age': age,
+            'gender': gender,
+            'bmi': bmi,
+            'family_history': [fh.lower() for fh in family_history],
+            'family_history_text': ' '.join(family_history).lower()
+        }
+        DiseaseRuleEngine.set_intake(metrics, daily_intake, maintenance_calories, peak_intake)
+        return metrics
+
+    @staticmethod
+    def set_intake(metrics: Dict[str, Any], daily_intake: Dict[str, Any], maintenance_calories: float,
+                   peak_intake: Optional[Dict[str, Any]] = None):
+        """ Set the intake metrics (scalars or arrays); peak-day metrics default to the mean intake """
+        metrics.update(daily_intake)
+        metrics['calorie_surplus'] = daily_intake['calories'] - maintenance_calories
+        for key, value in daily_intake.items():
+            metrics['peak_' + key] = value if peak_intake is None else peak_intake[key]
+
+    @staticmethod
+    def build_metric_columns(ages: Sequence[int], genders: Sequence[str], bmi: Sequence[float],
+                             maintenance_calories: Sequence[float], intake: Dict[str, Sequence[float]],
+                             family_history: Sequence[List[str]]) -> Dict[str, Sequence]:
+        """ Collect metric columns for a cohort """
+        columns = dict(intake)
+        columns.update({
+            'age': ages,
+            'gender': genders,
+            'bmi': bmi,
+            # Cohort rows carry daily averages only, so peak-day metrics equal them
+            **{'peak_' + key: values for key, values in intake.items()},
+            'calorie_surplus': [calories - maintenance
+                                for calories, maintenance in zip(intake['calories'], maintenance_calories)],
+            'family_history': [[fh.lower() for fh in history] for history in family_history],
+            'family_history_text': [' '.join(history).lower() for history in family_history]
+        })
+        return columns
@@ -0,0 +1,116 @@
+""" Columnar nutrient matrices over the food catalog """
+
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from models.nutrition import NutritionInfo
+from utils.nutrient_index import NUTRIENT_FIELDS
+
+
+class FoodCatalogMatrix:
+    """ Per-category (names, foods x nutrients per 100g) arrays and Pareto frontiers.
+
+    Matrices are rebuilt lazily after changes. A built frontier is updated in place as foods
+    arrive and only recomputed when a food on it is replaced. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self._foods: Dict[str, NutritionInfo] = {}
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._frontiers: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._dirty = set()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._foods)
+
+    def add_food(self, nutrition_info: NutritionInfo):
+        """ Add or replace a single food """
+        self.add_foods([nutrition_info])
+
+    def add_foods(self, foods: Iterable[NutritionInfo]):
+        """ Add or replace foods; affected matrices are rebuilt on next access """
+        with self._lock:
+            for food in foods:
+                key = food.food_name.lower()
+                previous = self._foods.get(key)
+                if previous is not None:
+                    previous_category = previous.category or 'unknown'
+                    self._dirty.add(previous_category)
+                    frontier = self._frontiers.get(previous_category)
+                    # Dropping a frontier food can expose foods it dominated
+                    if frontier and any(name.lower() == key for name in frontier[0]):
+                        del self._frontiers[previous_category]
+                self._foods[key] = food
+                category = food.category or 'unknown'
+                self._dirty.add(category)
+                if category in self._frontiers:
+                    self._add_to_frontier(category, food)
+
+    def category_matrix(self, category: str) -> Tuple[List[str], np.ndarray]:
+        """ Names and nutrient matrix of all foods in a category """
+        category = category or 'unknown'
+        with self._lock:
+            if category in self._dirty or category not in self._matrices:
+                self._rebuild(self._dirty | {category})
+            return self._matrices[category]
+
+    def pareto_frontier(self, category: str) -> Tuple[List[str], np.ndarray]:
+        """ Foods in a category not dominated on every nutrient by another food in it.
+
+        For any score that never decreases as a nutrient grows, the best replacement
+        within a category is always one of these, so searches only need to scan them.
+        """
+        category = category or 'unknown'
+        with self._lock:
+            if category not in self._frontiers:
+                self._frontiers[category] = _frontier(*self.category_matrix(category))
+            return self._frontiers[category]
+
+    def build_frontiers(self):
+        """ Compute the frontier of every category now, so no request pays for it """
+        with self._lock:
+            categories = {food.category or 'unknown' for food in self._foods.values()}
+            for category in categories:
+                self.pareto_frontier(category)
+
+    def _add_to_frontier(self, category: str, food: NutritionInfo):
+        """ Update a built frontier with one food, in O(frontier size); the caller holds the lock """
+        names, frontier = self._frontiers[category]
+        row = np.array([float(getattr(food, field) or 0.0) for field in NUTRIENT_FIELDS])
+        if len(frontier) and np.any(np.all(frontier <= row, axis=1)):
+            return
+        # New arrays, so callers holding the previous frontier are unaffected
+        keep = ~np.all(row <= frontier, axis=1)
+        self._frontiers[category] = ([name for name, kept in zip(names, keep) if kept] + [food.food_name],
+                                     np.vstack([frontier[keep], row]))
+
+    def _rebuild(self, categories: set):
+        """ Materialize the arrays for the given categories in one pass over the catalog """
+        grouped: Dict[str, List[NutritionInfo]] = {category: [] for category in categories}
+        for food in self._foods.values():
+            members = grouped.get(food.category or 'unknown')
+            if members is not None:
+                members.append(food)
+
+        for category, foods in grouped.items():
+            matrix = np.array([[float(getattr(food, field) or 0.0) for field in NUTRIENT_FIELDS] for food in foods],
+                              dtype=float).reshape(len(foods), len(NUTRIENT_FIELDS))
+            self._matrices[category] = ([food.food_name for food in foods], matrix)
+        self._dirty -= categories
+
+
+def _frontier(names: List[str], matrix: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """ Pareto frontier of a category matrix in O(frontier size x foods) vectorized steps """
+    # Visit foods by total: the first remaining food is never dominated by a later one,
+    # so it is kept and everything it dominates is dropped in one comparison
+    order = np.argsort(matrix.sum(axis=1), kind='stable')
+    keep = []
+    while len(order):
+        first = matrix[order[0]]
+        keep.append(order[0])
+        order = order[1:][~np.all(matrix[order[1:]] >= first, axis=1)]
+    return [names[row] for row in keep], matrix[keep].reshape(len(keep), matrix.shape[1])
@@ -1,24 +1,135 @@
 """ Food categorization utility """
 
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config.settings import FOOD_TAXONOMY, FOOD_TAXONOMY_FILE
+
+WORD = re.compile(r'[a-z0-9]+')
+
+
+def load_food_taxonomy() -> Dict[str, Any]:
+    """ Load the taxonomy from FOOD_TAXONOMY_FILE if configured, else the built-in one """
+    if FOOD_TAXONOMY_FILE:
+        with open(FOOD_TAXONOMY_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return FOOD_TAXONOMY
+
+
+def singular(word: str) -> str:
+    """ Crude singular form, applied alike to keywords and descriptions so plurals match """
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('ches', 'shes', 'sses', 'xes', 'oes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+class _Vocabulary(dict):
+    """ Word -> (singular form, phrases starting with it, suffix match), or None for words no keyword uses.
+
+    Filled on first sight of each word, so the per-word work of a description is a dictionary lookup.
+    """
+
+    def __init__(self, categorizer: 'FoodCategorizer'):
+        super().__init__()
+        self.categorizer = categorizer
+
+    def __missing__(self, word: str):
+        if len(self) >= FoodCategorizer.VOCABULARY_SIZE:
+            self.clear()
+        info = self.categorizer._describe(word)
+        self[word] = info
+        return info
+
+
 class FoodCategorizer:
-    """ Utility class for categorizing food items based on predefined categories """
-
-    def __init__(self, food_categories):
-        self.category_keywords = {
-            'fruits': ['apple', 'banana', 'orange', 'berry', 'grape', 'fruit', 'citrus', 'mango', 'pineapple'],
-            'vegetables': ['broccoli', 'spinach', 'carrot', 'lettuce', 'tomato', 'pepper', 'onion'],
-            'grains': ['bread', 'rice', 'pasta', 'cereal', 'wheat', 'oat', 'quinoa', 'barley'],
-            'proteins': ['chicken', 'beef', 'fish', 'egg', 'meat', 'pork', 'turkey', 'salmon', 'tuna'],
-            'dairy': ['milk', 'cheese', 'yogurt', 'cream', 'butter', 'cottage cheese'],
-            'snacks': ['chips', 'crackers', 'nuts', 'seeds', 'popcorn', 'chocolate', 'candy']
-        }
+    """ Categorizes food descriptions through a token index compiled from the taxonomy.
+
+    Keywords are indexed by their first word, and every word seen is resolved once to the
+    phrases it can start and the compound suffix it ends with, so categorizing costs one
+    dictionary lookup per word however many keywords the taxonomy holds. The head noun decides:
+    the first comma-separated part with a match is used (USDA writes 'Milk, chocolate'), and
+    within it matches are ranked by phrase length, then exact words over compound suffixes,
+    then the last match ('green tea' is a tea). A keyword or suffix listed under several
+    categories belongs to the first; descriptions matching nothing get the default category.
+    """
+
+    VOCABULARY_SIZE = 200000 # distinct words remembered before the vocabulary is rebuilt
+
+    def __init__(self, taxonomy: Optional[Dict[str, Any]] = None):
+        taxonomy = taxonomy if taxonomy is not None else load_food_taxonomy()
+        self.default = taxonomy.get('default', 'unknown')
+        self.categories = [category['name'] for category in taxonomy['categories']]
+        # first word -> [(remaining words, rank, category)], longest phrases first
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], tuple, str]]] = {}
+        self._suffixes: Dict[str, Tuple[tuple, str]] = {}
+        keyword_words = set()
+        for category in taxonomy['categories']:
+            name = category['name']
+            for keyword in category.get('keywords', []):
+                words = tuple(singular(word) for word in WORD.findall(keyword.lower()))
+                if not words:
+                    continue
+                keyword_words.update(words)
+                rank = (len(words), 1)
+                entries = self._phrases.setdefault(words[0], [])
+                # A keyword listed under several categories stays with the first
+                if not any(rest == words[1:] for rest, _, _ in entries):
+                    entries.append((words[1:], rank, name))
+            for suffix in category.get('suffixes', []):
+                self._suffixes.setdefault(singular(suffix.lower()), ((1, 0), name))
+        for entries in self._phrases.values():
+            entries.sort(key=lambda entry: entry[1], reverse=True)
+        self._keyword_words = frozenset(keyword_words)
+        self._suffix_lengths = sorted({len(suffix) for suffix in self._suffixes}, reverse=True)
+        self._vocabulary = _Vocabulary(self)
 
     def categorize(self, food_description: str) -> str:
-        """ Categorize a food item based on its description """
-        description = food_description.lower()
-        for category, keywords in self.category_keywords.items():
-            if any(keyword in description for keyword in keywords):
-                return category
-        # If no category matches, return 'unknown'
-        if 'unknown' in self.category_keywords:
-            return 'unknown'
\ No newline at end of file
+        """ Categorize a food item based on its description; never None """
+        for part in (food_description or '').lower().split(','):
+            infos = list(map(self._vocabulary.__getitem__, WORD.findall(part)))
+            if any(infos):
+                return self._match(infos)
+        return self.default
+
+    def categorize_many(self, food_descriptions: Iterable[str]) -> List[str]:
+        """ Categories of a batch of descriptions (e.g. a bulk import), in order """
+        return list(map(self.categorize, food_descriptions))
+
+    def _describe(self, word: str):
+        """ Vocabulary entry of a word """
+        word = singular(word)
+        suffix_match = None
+        for length in self._suffix_lengths:
+            if len(word) > length:
+                suffix_match = self._suffixes.get(word[-length:])
+                if suffix_match is not None:
+                    break
+        if word not in self._keyword_words and suffix_match is None:
+            return None
+        return word, self._phrases.get(word), suffix_match
+
+    def _match(self, infos: List[Optional[tuple]]) -> str:
+        """ Category of the best-ranked keyword or suffix among the words of a description part """
+        # Words are scanned left to right, so an equally ranked later match replaces the best one
+        best_rank, best = None, self.default
+        for i, info in enumerate(infos):
+            if info is None:
+                continue
+            _, entries, suffix_match = info
+            if entries:
+                for rest, rank, category in entries:
+                    if not rest or tuple(following[0] if following else None
+                                         for following in infos[i + 1:i + 1 + len(rest)]) == rest:
+                        if best_rank is None or rank >= best_rank:
+                            best_rank, best = rank, category
+                        break
+            if suffix_match is not None:
+                rank = suffix_match[0]
+                if best_rank is None or rank >= best_rank:
+                    best_rank, best = rank, suffix_match[1]
+        return best
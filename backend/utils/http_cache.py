@@ -0,0 +1,68 @@
+""" Entity tags and conditional GET helpers shared by the Flask and ASGI servers """
+
+import hashlib
+from decimal import Decimal
+from typing import Optional
+
+import orjson
+
+from models.nutrition import NutritionInfo
+
+# Bump when the get-food-info payload format changes so clients drop old entity tags
+FOOD_INFO_ETAG_VERSION = 'food-info-1'
+
+
+def nutrition_etag(nutrition_info: NutritionInfo) -> str:
+    """ Strong ETag of a food's get-food-info response, hashed from its normalized payload.
+
+    Numbers are hashed as floats, so a food gets the same tag whether it was read from MySQL
+    (Decimal) or came from USDA or a food listener (float).
+    """
+    # api_payloads imports this module through serialization
+    from utils.api_payloads import nutrition_payload
+    payload = {key: float(value) if isinstance(value, (int, float, Decimal)) else value
+               for key, value in nutrition_payload(nutrition_info).items()}
+    content = FOOD_INFO_ETAG_VERSION.encode() + b':' + orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def body_etag(body: bytes) -> str:
+    """ Strong ETag hashed from a serialized response body """
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+# Suffixes of compressed variants, ignored when revalidating so any coding of a resource matches
+CODING_SUFFIXES = ('-gzip', '-br')
+
+
+def representation_etag(etag: str, media_type: str = 'application/json', encoding: Optional[str] = None) -> str:
+    """ Entity tag of one representation: the resource tag plus media type and content coding suffixes """
+    opaque = etag.strip('"')
+    if media_type != 'application/json':
+        opaque += '-' + media_type.rsplit('/', 1)[-1].replace('x-', '')
+    if encoding:
+        opaque += '-' + encoding
+    return f'"{opaque}"'
+
+
+def _comparable(tag: str) -> str:
+    """ Entity tag without weak prefix or content coding suffix """
+    tag = tag.strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    opaque = tag.strip('"')
+    for suffix in CODING_SUFFIXES:
+        if opaque.endswith(suffix):
+            opaque = opaque[:-len(suffix)]
+            break
+    return opaque
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """ Whether an If-None-Match header matches etag (weak comparison, as RFC 9110 requires for it) """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    target = _comparable(etag)
+    return any(_comparable(tag) == target for tag in if_none_match.split(','))
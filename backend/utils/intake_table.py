@@ -0,0 +1,154 @@
+""" Columnar intake records (day, meal, food, grams) and one-pass streaming aggregation """
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from models.nutrition import DietaryPattern
+
+
+class IntakeTable:
+    """ Intake rows stored as typed column arrays with food names interned to integer ids.
+
+    day and meal are zero-based; -1 means the diary did not record them.
+    """
+
+    def __init__(self, days: np.ndarray, meals: np.ndarray, food_ids: np.ndarray, grams: np.ndarray,
+                 foods: List[str], days_tracked: int, meal_frequency: int):
+        self.days = days
+        self.meals = meals
+        self.food_ids = food_ids
+        self.grams = grams
+        self.foods = foods
+        self.days_tracked = days_tracked
+        self.meal_frequency = meal_frequency
+
+    def __len__(self) -> int:
+        return len(self.grams)
+
+    @classmethod
+    def from_dietary_pattern(cls, dietary_pattern: DietaryPattern) -> 'IntakeTable':
+        """ Build the columns from a dietary pattern, interning each food name once """
+        food_index: Dict[str, int] = {}
+        food_ids = np.fromiter((food_index.setdefault(food, len(food_index)) for food in dietary_pattern.daily_foods),
+                               dtype=np.int32, count=len(dietary_pattern.daily_foods))
+        size = len(food_ids)
+        days = cls._column(dietary_pattern.day_indices, size, np.int16)
+        meals = cls._column(dietary_pattern.meal_indices, size, np.int8)
+        grams = np.asarray(dietary_pattern.portion_sizes_g[:size], dtype=np.float64)
+        return cls(days, meals, food_ids, grams, list(food_index),
+                   dietary_pattern.days_tracked, dietary_pattern.meal_frequency)
+
+    @staticmethod
+    def _column(values: Optional[Sequence[int]], size: int, dtype) -> np.ndarray:
+        """ Typed column for optional per-row indices; missing values become -1 """
+        if values is None or len(values) != size:
+            return np.full(size, -1, dtype=dtype)
+        try:
+            return np.asarray(values, dtype=dtype)
+        except TypeError:
+            return np.asarray([-1 if value is None else value for value in values], dtype=dtype)
+
+
+class IntakeAggregator:
+    """ Running per-day and per-meal nutrient totals fed with chunks of intake rows.
+
+    One update pass accumulates both groupings; summaries (mean, rolling averages,
+    peak day, per-meal distribution) are derived from the small per-day and per-meal
+    totals without revisiting the rows.
+    """
+
+    def __init__(self, fields: Sequence[str], days_tracked: int, meal_frequency: int, food_count: int = 0):
+        self.fields = tuple(fields)
+        self.days_tracked = days_tracked
+        self.daily_totals = np.zeros((days_tracked, len(self.fields)))
+        self.meal_totals = np.zeros((max(1, meal_frequency), len(self.fields)))
+        # Rows without a recorded day are spread evenly across all tracked days
+        self.undated_total = np.zeros(len(self.fields))
+        self.has_meals = False
+        # Optional foods x days x nutrients totals, kept when food_count is given
+        self.food_daily_totals = np.zeros((food_count, days_tracked, len(self.fields))) if food_count else None
+        self.food_undated_totals = np.zeros((food_count, len(self.fields))) if food_count else None
+
+    def update(self, days: np.ndarray, meals: np.ndarray, grams: np.ndarray, per_100g: np.ndarray,
+               food_ids: Optional[np.ndarray] = None):
+        """ Accumulate a chunk of rows; per_100g holds each row's nutrient values per 100g """
+        nutrients = per_100g * (grams / 100)[:, None]
+        track_foods = self.food_daily_totals is not None and food_ids is not None
+
+        dated = days >= 0
+        if dated.any():
+            day_rows = np.minimum(days[dated], self.days_tracked - 1)
+            self.daily_totals += self._group_sum(day_rows, nutrients[dated], self.days_tracked)
+            if track_foods:
+                cells = food_ids[dated].astype(np.int64) * self.days_tracked + day_rows
+                self.food_daily_totals += self._group_sum(
+                    cells, nutrients[dated], self.food_daily_totals.shape[0] * self.days_tracked
+                ).reshape(self.food_daily_totals.shape)
+        if not dated.all():
+            self.undated_total += nutrients[~dated].sum(axis=0)
+            if track_foods:
+                self.food_undated_totals += self._group_sum(
+                    food_ids[~dated], nutrients[~dated], self.food_undated_totals.shape[0])
+
+        with_meal = meals >= 0
+        if with_meal.any():
+            self.has_meals = True
+            meal_rows = meals[with_meal]
+            size = max(len(self.meal_totals), int(meal_rows.max()) + 1)
+            if size > len(self.meal_totals):
+                grown = np.zeros((size, len(self.fields)))
+                grown[:len(self.meal_totals)] = self.meal_totals
+                self.meal_totals = grown
+            self.meal_totals += self._group_sum(meal_rows, nutrients[with_meal], size)
+
+    @staticmethod
+    def _group_sum(groups: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+        """ size x nutrients sums of value rows by group index """
+        return np.column_stack([np.bincount(groups, weights=values[:, j], minlength=size)
+                                for j in range(values.shape[1])])
+
+    def consume(self, table: IntakeTable, per_food_100g: np.ndarray, chunk_size: int = 65536) -> 'IntakeAggregator':
+        """ Stream a whole table through update in chunks; per_food_100g is indexed by food id """
+        for start in range(0, len(table), chunk_size):
+            stop = start + chunk_size
+            food_ids = table.food_ids[start:stop]
+            self.update(table.days[start:stop], table.meals[start:stop], table.grams[start:stop],
+                        per_food_100g[food_ids], food_ids)
+        return self
+
+    def totals_by_day(self) -> np.ndarray:
+        """ days x nutrients totals with undated intake spread evenly """
+        return self.daily_totals + self.undated_total / self.days_tracked
+
+    def food_totals_by_day(self) -> Optional[np.ndarray]:
+        """ foods x days x nutrients totals with undated intake spread evenly, if tracked """
+        if self.food_daily_totals is None:
+            return None
+        return self.food_daily_totals + self.food_undated_totals[:, None, :] / self.days_tracked
+
+    def summary(self, rolling_window: int) -> Dict[str, Any]:
+        """ Mean, peak day, worst rolling average and per-meal share for each nutrient """
+        by_day = self.totals_by_day()
+        mean = by_day.mean(axis=0)
+        peak_days = by_day.argmax(axis=0)
+
+        window = max(1, min(rolling_window, self.days_tracked))
+        cumulative = np.vstack([np.zeros(len(self.fields)), np.cumsum(by_day, axis=0)])
+        rolling = (cumulative[window:] - cumulative[:-window]) / window
+
+        meal_distribution = None
+        if self.has_meals:
+            totals = self.meal_totals.sum(axis=0)
+            shares = np.divide(self.meal_totals, totals, out=np.zeros_like(self.meal_totals), where=totals > 0)
+            meal_distribution = {field: shares[:, j].tolist() for j, field in enumerate(self.fields)}
+
+        return {
+            'mean': {field: float(mean[j]) for j, field in enumerate(self.fields)},
+            'peak': {field: float(by_day[peak_days[j], j]) for j, field in enumerate(self.fields)},
+            'peak_day': {field: int(peak_days[j]) for j, field in enumerate(self.fields)},
+            'rolling_window_days': window,
+            'rolling_average_max': {field: float(rolling[:, j].max()) for j, field in enumerate(self.fields)},
+            'daily_totals': {field: by_day[:, j].tolist() for j, field in enumerate(self.fields)},
+            'meal_distribution': meal_distribution
+        }
@@ -0,0 +1,300 @@
+""" In-process runtime metrics, exposed in the Prometheus text format by /metrics """
+
+import os
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config.settings import METRICS_CONFIG
+
+# (name, type, help, [(labels, value), ...]) as rendered by MetricsRegistry.render
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class Counter:
+    """ Monotonic count per label values """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        """ Add amount to the series of the given label values """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def values(self) -> Dict[tuple, float]:
+        """ Label values -> count """
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        """ Drop every series """
+        with self._lock:
+            self._values = {}
+
+    def collect(self) -> MetricFamily:
+        """ Family with one sample per series """
+        return self.name, self.kind, self.help_text, [
+            (dict(zip(self.labelnames, labels)), value) for labels, value in self.values().items()]
+
+
+class Gauge(Counter):
+    """ Last value set per label values """
+
+    kind = 'gauge'
+
+    def set(self, value: float, *labels: str):
+        """ Replace the value of the series of the given label values """
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """ Distribution of observations (typically seconds) per label values.
+
+    Each series is one list of per-bucket counts followed by the sum, so an observation is a
+    bisect and two increments under an uncontended lock (about a microsecond).
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        """ Record one observation for the given label values """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # one count per bucket, +Inf, then the sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def summaries(self) -> Dict[tuple, Dict[str, float]]:
+        """ Label values -> count, sum and mean of the observations """
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        summaries = {}
+        for labels, values in series.items():
+            count = sum(values[:-1])
+            summaries[labels] = {'count': count, 'sum': values[-1], 'mean': values[-1] / count if count else 0.0}
+        return summaries
+
+    def reset(self):
+        """ Drop every series """
+        with self._lock:
+            self._series = {}
+
+    def collect(self) -> MetricFamily:
+        """ Family with cumulative bucket, sum and count samples per series """
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        samples = []
+        for labels, values in series.items():
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                samples.append(({**base, 'le': _format_value(bound)}, cumulative, '_bucket'))
+            samples.append((base, values[-1], '_sum'))
+            samples.append((base, cumulative, '_count'))
+        return self.name, self.kind, self.help_text, samples
+
+
+class MetricsRegistry:
+    """ Metrics of this process.
+
+    Counters and histograms are updated on the hot path; values that already live in the
+    services (cache sizes, pool usage, queue depth) are read by collectors only when the
+    metrics are scraped.
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        """ New registered counter """
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """ New registered gauge """
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = ()) -> Histogram:
+        """ New registered histogram, with the default latency buckets unless given """
+        return self._register(Histogram(name, help_text, labelnames, buckets or METRICS_CONFIG['latency_buckets_s']))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def reset(self):
+        """ Zero every metric (a forked child starts counting from scratch) """
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self, collectors: Iterable[Callable[[], Iterable[MetricFamily]]] = ()) -> str:
+        """ Every metric, plus the families returned by collectors, in the Prometheus text format """
+        families = [metric.collect() for metric in self._metrics]
+        for collector in collectors:
+            families.extend(collector())
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample in samples:
+                labels, value = sample[0], sample[1]
+                suffix = sample[2] if len(sample) > 2 else ''
+                lines.append(f'{name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """ {name="value",...} with label values escaped """
+    if not labels:
+        return ''
+    pairs = ','.join('{}="{}"'.format(key, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+                     for key, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def _format_value(value: float) -> str:
+    """ Sample value in the exposition format """
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+METRICS = MetricsRegistry()
+
+REQUEST_SECONDS = METRICS.histogram(
+    'foodhealth_http_request_duration_seconds', 'API request latency by route', ('route', 'method', 'status'))
+LOOKUP_SECONDS = METRICS.histogram(
+    'foodhealth_lookup_duration_seconds', 'Nutrition lookup latency by the source that answered', ('source',))
+USDA_REQUESTS = METRICS.counter(
+    'foodhealth_usda_requests_total', 'USDA API lookups by outcome (sent, over_budget, no_api_key)', ('outcome',))
+USDA_RATE_LIMIT_REMAINING = METRICS.gauge(
+    'foodhealth_usda_rate_limit_remaining', 'Requests left on the USDA API key as last reported by the API')
+DB_CONNECTIONS = METRICS.counter(
+    'foodhealth_db_connections_total', 'MySQL connections opened by the blocking database service', ('result',))
+RESULT_CACHE_REQUESTS = METRICS.counter(
+    'foodhealth_result_cache_requests_total', 'Whole-response cache lookups by endpoint and result', ('endpoint', 'result'))
+ADMISSION_REJECTIONS = METRICS.counter(
+    'foodhealth_admission_rejections_total',
+    'Requests turned away by reason (rate_limited: 429, overloaded or queue_full: 503)', ('reason',))
+ADMISSION_QUEUE_SECONDS = METRICS.histogram(
+    'foodhealth_admission_queue_seconds', 'Time requests waited for a concurrency slot')
+
+
+def record_usda_rate_limit(headers):
+    """ Remember the quota the USDA API (api.data.gov) reports in its response headers """
+    remaining = headers.get('X-RateLimit-Remaining')
+    if remaining is not None and str(remaining).isdigit():
+        USDA_RATE_LIMIT_REMAINING.set(float(remaining))
+
+
+def service_metrics(services) -> List[MetricFamily]:
+    """ Gauges read from the services already built in this process (scraping builds none) """
+    families = []
+    if services.is_built('nutrition_service'):
+        nutrition_service = services.nutrition_service
+        cache = nutrition_service.cache.stats()
+        families.append(('foodhealth_nutrition_cache_requests_total', 'counter',
+                         'Nutrition cache lookups by result',
+                         [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]))
+        families.append(('foodhealth_nutrition_cache_entries', 'gauge', 'Foods held in the nutrition cache',
+                         [({}, cache['entries'])]))
+        families.append(('foodhealth_usda_budget_remaining', 'gauge',
+                         'USDA requests this process may still send before it stops calling the API',
+                         [({}, nutrition_service.usda_budget_remaining())]))
+    if services.is_built('result_cache'):
+        result_cache = services.result_cache.stats()
+        families.append(('foodhealth_result_cache_entries', 'gauge', 'Responses held in the result cache',
+                         [({}, result_cache['entries'])]))
+        families.append(('foodhealth_result_cache_bytes', 'gauge', 'Payload and encoded body bytes in the result cache',
+                         [({}, result_cache['bytes'])]))
+    if services.is_built('async_db_service'):
+        pool = services.async_db_service.pool_stats()
+        if pool:
+            families.append(('foodhealth_db_pool_connections', 'gauge', 'aiomysql pool connections by state',
+                             [({'state': state}, pool[state]) for state in ('size', 'free', 'max')]))
+    if services.is_built('db_service'):
+        depth = services.db_service.count_job_items()
+        if depth is not None:
+            families.append(('foodhealth_job_queue_items', 'gauge', 'Batch job foods waiting or being looked up',
+                             [({'status': status}, depth.get(status, 0)) for status in ('pending', 'running')]))
+    return families
+
+
+def stats_summary(services) -> Dict[str, Any]:
+    """ JSON summary of the same counters for /api/nutrition-stats """
+    families = {name: samples for name, _, _, samples in service_metrics(services)}
+
+    def gauge(name: str, **labels) -> Optional[float]:
+        for sample_labels, value in families.get(name, []):
+            if sample_labels == labels:
+                return value
+        return None
+
+    def latency(summaries: Dict[tuple, Dict[str, float]], key) -> Dict[str, Dict[str, float]]:
+        return {key(labels): {'count': int(summary['count']), 'mean_ms': round(summary['mean'] * 1000, 3)}
+                for labels, summary in summaries.items()}
+
+    hits = gauge('foodhealth_nutrition_cache_requests_total', result='hit') or 0
+    misses = gauge('foodhealth_nutrition_cache_requests_total', result='miss') or 0
+    lookups = LOOKUP_SECONDS.summaries()
+    usda = USDA_REQUESTS.values()
+    connections = DB_CONNECTIONS.values()
+    pool_size = gauge('foodhealth_db_pool_connections', state='size')
+    return {
+        'lookups': {
+            'total': int(sum(summary['count'] for summary in lookups.values())),
+            'by_source': latency(lookups, lambda labels: labels[0])
+        },
+        'cache': {
+            'hits': int(hits),
+            'misses': int(misses),
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'entries': gauge('foodhealth_nutrition_cache_entries')
+        },
+        'usda': {
+            'requests': {labels[0]: int(count) for labels, count in usda.items()},
+            'budget_remaining': gauge('foodhealth_usda_budget_remaining'),
+            'rate_limit_remaining': USDA_RATE_LIMIT_REMAINING.values().get(())
+        },
+        'database': {
+            'connections_opened': int(connections.get(('opened',), 0)),
+            'connection_failures': int(connections.get(('failed',), 0)),
+            'pool': None if pool_size is None else {
+                'size': pool_size,
+                'free': gauge('foodhealth_db_pool_connections', state='free'),
+                'max': gauge('foodhealth_db_pool_connections', state='max')
+            }
+        },
+        'jobs': {
+            'pending_items': gauge('foodhealth_job_queue_items', status='pending'),
+            'running_items': gauge('foodhealth_job_queue_items', status='running')
+        },
+        'requests': latency(REQUEST_SECONDS.summaries(), lambda labels: f'{labels[1]} {labels[0]} {labels[2]}')
+    }
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=METRICS.reset)
@@ -0,0 +1,240 @@
+""" Nearest-neighbour index over the nutrient space """
+
+import heapq
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from models.nutrition import NutritionInfo
+
+NUTRIENT_FIELDS = ('calories_per_100g', 'sugar_g', 'saturated_fat_g', 'sodium_mg')
+
+
+class _Node:
+    """ KD-tree node holding one normalized nutrient vector """
+    __slots__ = ('point', 'name', 'risk_score', 'axis', 'left', 'right', 'alive', 'min_risk')
+
+    def __init__(self, point: Tuple[float, ...], name: str, risk_score: float, axis: int):
+        self.point = point
+        self.name = name
+        self.risk_score = risk_score
+        self.axis = axis
+        self.left = None
+        self.right = None
+        self.alive = True
+        # Lowest risk score in this subtree, used to prune healthier-than queries
+        self.min_risk = risk_score
+
+
+class NutrientKDTree:
+    """ KD-tree with incremental inserts and filtered k-nearest-neighbour queries """
+
+    def __init__(self, dimensions: int = len(NUTRIENT_FIELDS)):
+        self.dimensions = dimensions
+        self.root = None
+        self._size = 0
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return self._size - self._dead
+
+    def insert(self, point: Tuple[float, ...], name: str, risk_score: float) -> _Node:
+        """ Insert a point, rebuilding the tree when it becomes too unbalanced """
+        if self.root is None:
+            self.root = _Node(point, name, risk_score, 0)
+            self._size = 1
+            return self.root
+
+        node = self.root
+        depth = 1
+        while True:
+            depth += 1
+            if risk_score < node.min_risk:
+                node.min_risk = risk_score
+            child_axis = (node.axis + 1) % self.dimensions
+            if point[node.axis] < node.point[node.axis]:
+                if node.left is None:
+                    node.left = new_node = _Node(point, name, risk_score, child_axis)
+                    break
+                node = node.left
+            else:
+                if node.right is None:
+                    node.right = new_node = _Node(point, name, risk_score, child_axis)
+                    break
+                node = node.right
+
+        self._size += 1
+        # Rebuild when the insertion path is far deeper than a balanced tree would be
+        if depth > 2 * math.log2(self._size) + 4:
+            self.rebuild()
+        return new_node
+
+    def extend(self, entries: List[Tuple[Tuple[float, ...], str, float]]) -> List[_Node]:
+        """ Bulk insert (point, name, risk_score) entries with a single rebuild """
+        nodes = [_Node(point, name, risk_score, 0) for point, name, risk_score in entries]
+        if nodes:
+            self.rebuild(extra=nodes)
+        return nodes
+
+    def remove(self, node: _Node):
+        """ Tombstone a node; it is dropped on the next rebuild """
+        if node.alive:
+            node.alive = False
+            self._dead += 1
+            if self._dead > self._size // 2:
+                self.rebuild()
+
+    def rebuild(self, extra: Optional[List[_Node]] = None):
+        """ Rebuild a balanced tree from all live nodes plus any extra nodes """
+        nodes = list(extra or [])
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            if node.alive:
+                nodes.append(node)
+            if node.left:
+                stack.append(node.left)
+            if node.right:
+                stack.append(node.right)
+
+        self.root = self._build(nodes, 0)
+        self._size = len(nodes)
+        self._dead = 0
+
+    def _build(self, nodes: List[_Node], depth: int) -> Optional[_Node]:
+        """ Build a balanced subtree by splitting on the median """
+        if not nodes:
+            return None
+        axis = depth % self.dimensions
+        nodes.sort(key=lambda n: n.point[axis])
+        median = len(nodes) // 2
+        node = nodes[median]
+        node.axis = axis
+        node.left = self._build(nodes[:median], depth + 1)
+        node.right = self._build(nodes[median + 1:], depth + 1)
+        node.min_risk = min([node.risk_score] + [child.min_risk for child in (node.left, node.right) if child])
+        return node
+
+    def nearest(self, point: Tuple[float, ...], k: int, max_risk: float,
+                exclude: str = '') -> List[Tuple[float, _Node]]:
+        """ Return up to k (distance, node) pairs closest to point with risk_score below max_risk """
+        best = []  # max-heap of (-dist, counter, node)
+        worst = math.inf
+        counter = 0
+        # Each entry carries the distance from point to the subtree's region
+        root = self.root
+        stack = [(root, 0.0)] if root is not None and root.min_risk < max_risk else []
+        pop, push = stack.pop, stack.append
+        while stack:
+            node, bound = pop()
+            if bound > worst:
+                continue
+
+            node_point = node.point
+            if node.risk_score < max_risk and node.alive and node.name != exclude:
+                dist = math.dist(point, node_point)
+                if dist < worst:
+                    counter += 1
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, counter, node))
+                    else:
+                        heapq.heapreplace(best, (-dist, counter, node))
+                    if len(best) == k:
+                        worst = -best[0][0]
+
+            axis = node.axis
+            diff = point[axis] - node_point[axis]
+            if diff < 0:
+                near, far = node.left, node.right
+            else:
+                near, far = node.right, node.left
+            # Far side is pushed first so the near side is searched first; subtrees
+            # with no food below max_risk or beyond the current k-th distance are skipped
+            if far is not None and far.min_risk < max_risk:
+                far_bound = -diff if diff < 0 else diff
+                if far_bound < bound:
+                    far_bound = bound
+                if far_bound <= worst:
+                    push((far, far_bound))
+            if near is not None and near.min_risk < max_risk:
+                push((near, bound))
+
+        return sorted(((-d, n) for d, _, n in best), key=lambda pair: pair[0])
+
+
+class FoodAlternativesIndex:
+    """ Per-category nutrient index used to find similar but healthier foods.
+
+    Safe to share between threads: rebuilds relink nodes in place, so every read and
+    write of the trees holds the index lock.
+    """
+
+    def __init__(self, nutrient_scales: Dict[str, float]):
+        self.nutrient_scales = nutrient_scales
+        self._trees: Dict[str, NutrientKDTree] = {}
+        self._nodes: Dict[str, Tuple[str, _Node]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._nodes)
+
+    def vectorize(self, nutrition_info: NutritionInfo) -> Tuple[float, ...]:
+        """ Normalize a food's nutrients into a vector """
+        return tuple(float(getattr(nutrition_info, field) or 0) / self.nutrient_scales[field]
+                     for field in NUTRIENT_FIELDS)
+
+    def add_food(self, nutrition_info: NutritionInfo, risk_score: float):
+        """ Add or replace a food in the index; a food already indexed unchanged is left alone """
+        key = nutrition_info.food_name.lower()
+        category = nutrition_info.category or 'unknown'
+        point = self.vectorize(nutrition_info)
+        with self._lock:
+            entry = self._nodes.get(key)
+            if entry:
+                indexed_category, node = entry
+                if (indexed_category == category and node.point == point and node.risk_score == risk_score
+                        and node.name == nutrition_info.food_name):
+                    return
+            self._discard(key)
+            tree = self._trees.setdefault(category, NutrientKDTree())
+            node = tree.insert(point, nutrition_info.food_name, risk_score)
+            self._nodes[key] = (category, node)
+
+    def add_foods(self, scored_foods: List[Tuple[NutritionInfo, float]]):
+        """ Bulk-load (nutrition_info, risk_score) pairs, rebuilding each category once """
+        by_category: Dict[str, list] = {}
+        keys: Dict[str, list] = {}
+        for nutrition_info, risk_score in scored_foods:
+            key = nutrition_info.food_name.lower()
+            category = nutrition_info.category or 'unknown'
+            by_category.setdefault(category, []).append(
+                (self.vectorize(nutrition_info), nutrition_info.food_name, risk_score))
+            keys.setdefault(category, []).append(key)
+
+        with self._lock:
+            for category, entries in by_category.items():
+                for key in keys[category]:
+                    self._discard(key)
+                tree = self._trees.setdefault(category, NutrientKDTree())
+                for key, node in zip(keys[category], tree.extend(entries)):
+                    # A later duplicate in the same batch wins
+                    self._discard(key)
+                    self._nodes[key] = (category, node)
+
+    def nearest_healthier(self, nutrition_info: NutritionInfo, risk_score: float, k: int) -> List[str]:
+        """ Return up to k foods in the same category closest in nutrients with a lower risk score """
+        point = self.vectorize(nutrition_info)
+        with self._lock:
+            tree = self._trees.get(nutrition_info.category or 'unknown')
+            if tree is None:
+                return []
+            matches = tree.nearest(point, k, risk_score, exclude=nutrition_info.food_name)
+            return [node.name for _, node in matches]
+
+    def _discard(self, key: str):
+        """ Remove a previously indexed food; the caller holds the lock """
+        entry = self._nodes.pop(key, None)
+        if entry:
+            category, node = entry
+            self._trees[category].remove(node)
@@ -0,0 +1,113 @@
+""" In-process cache of resolved foods with their HTTP entity tags """
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from models.nutrition import NutritionInfo
+from utils.http_cache import nutrition_etag
+
+
+class NutritionCache:
+    """ LRU map of food name to nutrition information and its ETag.
+
+    A food found under another name (USDA saves 'apple' as 'Apple, raw') is also held under
+    the name that was looked up, so repeating that lookup hits. Entries, aliases included,
+    are refreshed through the database food listener whenever this process saves a food;
+    the TTL bounds how long a change saved by another process can go unseen.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.max_entries = config['max_entries']
+        self.ttl_seconds = config['ttl_seconds']
+        self._entries: OrderedDict = OrderedDict()
+        # Stored name -> other names the food was looked up under, and back
+        self._aliases: Dict[str, set] = {}
+        self._alias_of: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, food_name: str) -> Optional[NutritionInfo]:
+        """ Cached nutrition information, or None on a miss or an expired entry """
+        entry = self._get_entry(food_name)
+        return entry[0] if entry else None
+
+    def get_etag(self, food_name: str) -> Optional[str]:
+        """ ETag of a live entry, or None, without counting a hit or miss (the lookup that follows counts) """
+        with self._lock:
+            entry = self._entries.get(food_name.strip().lower())
+        return entry[1] if entry is not None and entry[2] >= time.monotonic() else None
+
+    def contains(self, food_name: str) -> bool:
+        """ Whether a live entry exists, without counting a hit or miss or changing its recency """
+        with self._lock:
+            entry = self._entries.get(food_name.strip().lower())
+        return entry is not None and entry[2] >= time.monotonic()
+
+    def put(self, nutrition_info: NutritionInfo, looked_up_as: Optional[str] = None):
+        """ Store (or refresh) a food under its name and, if given, the name it was looked up as.
+
+        Also used as the database food listener; refreshing a food refreshes its aliases.
+        """
+        key = nutrition_info.food_name.strip().lower()
+        entry = (nutrition_info, nutrition_etag(nutrition_info), time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            # A food now stored under a name that was an alias takes the name over
+            self._unlink_alias(key)
+            aliases = self._aliases.get(key, set())
+            alias = looked_up_as.strip().lower() if looked_up_as is not None else key
+            if alias != key:
+                self._unlink_alias(alias)
+                aliases.add(alias)
+                self._aliases[key] = aliases
+                self._alias_of[alias] = key
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            for alias in aliases:
+                self._entries[alias] = entry
+                self._entries.move_to_end(alias)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._unlink_alias(evicted)
+
+    def invalidate(self, food_name: str):
+        """ Drop a food and its aliases so the next lookup reads the database """
+        key = food_name.strip().lower()
+        with self._lock:
+            self._entries.pop(key, None)
+            for alias in self._aliases.pop(key, ()):
+                self._entries.pop(alias, None)
+                self._alias_of.pop(alias, None)
+
+    def stats(self) -> Dict[str, int]:
+        """ Hit and miss counts and current size """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+    def _get_entry(self, food_name: str) -> Optional[tuple]:
+        """ Live entry for a food, marking it recently used """
+        key = food_name.strip().lower()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _unlink_alias(self, name: str):
+        """ Stop refreshing name as an alias of another food (lock held) """
+        key = self._alias_of.pop(name, None)
+        if key is not None:
+            aliases = self._aliases.get(key)
+            if aliases is not None:
+                aliases.discard(name)
+                if not aliases:
+                    del self._aliases[key]
@@ -0,0 +1,215 @@
+""" On-demand sampling profiler for a running server or CLI process """
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config.settings import PROFILER_CONFIG
+
+
+class SamplingProfiler:
+    """ Samples the stack of every thread at a fixed interval for a number of seconds.
+
+    Sampling runs on its own daemon thread and only reads sys._current_frames(), so the
+    profiled code is not instrumented: at the default 10 ms interval the cost is a short GIL
+    hold a hundred times a second. Stacks are aggregated in memory and written in the
+    collapsed format ("thread;outer;...;inner count" per line) read by flamegraph.pl,
+    speedscope and similar tools. Allocation tracking is opt-in: tracemalloc hooks every
+    allocation and can slow allocation-heavy code several times over, so it runs only when
+    asked for (at one frame per trace) and its top sites are written next to the stacks.
+    """
+
+    def __init__(self, seconds: float, interval_ms: float = None, allocations: bool = False,
+                 config: Optional[Dict[str, Any]] = None):
+        self.config = config or PROFILER_CONFIG
+        self.profile_id = uuid.uuid4().hex[:12]
+        self.seconds = seconds
+        self.interval_s = (interval_ms or self.config['interval_ms']) / 1000.0
+        self.allocations = allocations
+        self.status = 'pending'
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.allocation_stats: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._owns_tracemalloc = False
+
+    @property
+    def collapsed_path(self) -> str:
+        """ File receiving the collapsed stacks """
+        return os.path.join(self.config['output_dir'], f'profile-{os.getpid()}-{self.profile_id}.collapsed')
+
+    @property
+    def allocations_path(self) -> str:
+        """ File receiving the top allocation sites """
+        return os.path.join(self.config['output_dir'], f'profile-{os.getpid()}-{self.profile_id}.alloc.txt')
+
+    def start(self):
+        """ Begin sampling in the background """
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(self.config['tracemalloc_frames'])
+            self._owns_tracemalloc = True
+        self.status = 'running'
+        self.started_at = datetime.now()
+        self._thread = threading.Thread(target=self._run, name=f'profiler-{self.profile_id}', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True):
+        """ End sampling early (e.g. when the CLI command finishes) and write the output """
+        self._stop.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        """ Sampling loop, then aggregation and output """
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                self._sample(own_ident)
+                self._stop.wait(self.interval_s)
+            self._finish()
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+            print(f"❌ Profiler error: {e}")
+        finally:
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+            self.finished_at = datetime.now()
+
+    def _sample(self, own_ident: int):
+        """ Add the current stack of every other thread """
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f'thread-{ident}').replace(';', ':'))
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _label(self, code) -> str:
+        """ 'function (file.py:line)' for a code object, cached """
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, 'co_qualname', code.co_name)
+            label = f'{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def _finish(self):
+        """ Snapshot allocations and write both output files """
+        if self.allocations and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            ))
+            self.allocation_stats = [{
+                'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                'size_kb': round(stat.size / 1024, 1),
+                'count': stat.count
+            } for stat in snapshot.statistics('lineno')[:self.config['top_n']]]
+
+        os.makedirs(self.config['output_dir'], exist_ok=True)
+        with open(self.collapsed_path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        if self.allocations:
+            with open(self.allocations_path, 'w', encoding='utf-8') as f:
+                for stat in self.allocation_stats:
+                    f.write(f"{stat['size_kb']:>10.1f} KiB {stat['count']:>8} blocks  {stat['location']}\n")
+        self.status = 'completed'
+        print(f"🔥 Profile {self.profile_id}: {self.samples} samples -> {self.collapsed_path}")
+
+    def collapsed(self) -> str:
+        """ Stacks in the collapsed (folded) format """
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def top_functions(self) -> List[Dict[str, Any]]:
+        """ Functions by samples on top of the stack (self) and anywhere in it (total) """
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        samples = sum(self.stacks.values()) or 1
+        return [{
+            'function': function,
+            'self_pct': round(100.0 * own[function] / samples, 2),
+            'total_pct': round(100.0 * total[function] / samples, 2)
+        } for function, _ in total.most_common(self.config['top_n'])]
+
+    def summary(self) -> Dict[str, Any]:
+        """ Status and, once completed, the hottest functions and allocation sites """
+        result = {
+            'profile_id': self.profile_id,
+            'status': self.status,
+            'pid': os.getpid(),
+            'seconds': self.seconds,
+            'interval_ms': self.interval_s * 1000,
+            'samples': self.samples,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'error': self.error
+        }
+        if self.status == 'completed':
+            result.update({
+                'collapsed_path': self.collapsed_path,
+                'allocations_path': self.allocations_path if self.allocations else None,
+                'top_functions': self.top_functions(),
+                'top_allocations': self.allocation_stats
+            })
+        return result
+
+
+class ProfilerRegistry:
+    """ Profiles run by this process; at most one samples at a time """
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self._profiles: Dict[str, SamplingProfiler] = {}
+        self._lock = threading.Lock()
+
+    def start(self, seconds: float, interval_ms: float = None, allocations: bool = False) -> Optional[SamplingProfiler]:
+        """ Start a profile, or return None if one is already running """
+        with self._lock:
+            if any(profile.status == 'running' for profile in self._profiles.values()):
+                return None
+            profile = SamplingProfiler(seconds, interval_ms, allocations)
+            self._profiles[profile.profile_id] = profile
+            while len(self._profiles) > self.keep:
+                self._profiles.pop(next(iter(self._profiles)))
+            profile.start()
+            return profile
+
+    def get(self, profile_id: str) -> Optional[SamplingProfiler]:
+        """ A recent profile by id """
+        return self._profiles.get(profile_id)
+
+    def reset(self):
+        """ Forget profiles (a forked child does not inherit the sampling thread) """
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+
+PROFILES = ProfilerRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=PROFILES.reset)
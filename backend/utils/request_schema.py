@@ -0,0 +1,250 @@
+""" Declarative request schemas compiled into single-pass parsers that return model objects """
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from models.user import UserProfile
+from models.nutrition import DietaryPattern
+from utils.validators import InputValidator
+
+# Upper bounds given by name are looked up in the limits passed to parse (batch jobs raise them)
+DEFAULT_LIMITS = {'max_foods': 20, 'max_days': 30}
+
+Bound = Union[int, float, str]
+
+
+class FieldError(ValueError):
+    """ Raised by a field parser with every problem it found in its value """
+
+    def __init__(self, *messages: str):
+        super().__init__('; '.join(messages))
+        self.messages = list(messages)
+
+
+def _bound(bound: Bound, limits: Dict[str, Any]):
+    """ A bound given as a number or as the name of a limit """
+    return limits[bound] if isinstance(bound, str) else bound
+
+
+def integer(label: str, low: Bound, high: Bound, unit: str = '') -> Callable:
+    """ Parser for a whole number within [low, high] """
+    def parse(value, limits):
+        try:
+            value = int(value)
+        except (ValueError, TypeError):
+            raise FieldError(f"{label} must be a valid number")
+        lower, upper = _bound(low, limits), _bound(high, limits)
+        if not (lower <= value <= upper):
+            raise FieldError(f"{label} must be between {lower} and {upper}{unit}")
+        return value
+    return parse
+
+
+def number(label: str, low: Bound, high: Bound, unit: str = '') -> Callable:
+    """ Parser for a float within [low, high] """
+    def parse(value, limits):
+        try:
+            value = float(value)
+        except (ValueError, TypeError):
+            raise FieldError(f"{label} must be a valid number")
+        lower, upper = _bound(low, limits), _bound(high, limits)
+        if not (lower <= value <= upper):
+            raise FieldError(f"{label} must be between {lower} and {upper}{unit}")
+        return value
+    return parse
+
+
+def choice(label: str, choices: Sequence[str], lower: bool = False) -> Callable:
+    """ Parser for one of a fixed set of strings, optionally lowercased first """
+    allowed = frozenset(choices)
+    message = f"{label} must be one of: {', '.join(choices)}"
+
+    def parse(value, limits):
+        if not isinstance(value, str):
+            raise FieldError(message)
+        if lower:
+            value = value.strip().lower()
+        if value not in allowed:
+            raise FieldError(message)
+        return value
+    return parse
+
+
+def conditions(label: str) -> Callable:
+    """ Parser for health conditions given as a list or comma-separated text """
+    def parse(value, limits):
+        if not isinstance(value, (str, list)):
+            raise FieldError(f"{label} must be a list or comma-separated text")
+        if isinstance(value, list) and not all(isinstance(item, str) for item in value):
+            raise FieldError(f"{label} must contain text only")
+        is_valid, error_msg, cleaned = InputValidator.validate_health_conditions(value)
+        if not is_valid:
+            raise FieldError(f"{label}: {error_msg}")
+        return cleaned
+    return parse
+
+
+def food_list(max_items: Bound) -> Callable:
+    """ Parser for food names given as a list or comma-separated text; names are stripped and lowercased """
+    def parse(value, limits):
+        if isinstance(value, str):
+            value = [food for food in value.split(',') if food.strip()]
+        if not isinstance(value, list):
+            raise FieldError("Foods must be a list or comma-separated text")
+        foods = value
+        if not foods:
+            raise FieldError("At least one food item must be provided")
+        upper = _bound(max_items, limits)
+        if len(foods) > upper:
+            raise FieldError(f"Cannot analyze more than {upper} foods at once")
+        cleaned, errors = [], []
+        for food in foods:
+            if not isinstance(food, str):
+                errors.append(f"Invalid food {food!r}: Food name must be text.")
+                continue
+            is_valid, error_msg = InputValidator.validate_food_name(food)
+            if not is_valid:
+                errors.append(f"Invalid food '{food}': {error_msg}")
+            cleaned.append(food.strip().lower())
+        if errors:
+            raise FieldError(*dict.fromkeys(errors))
+        return cleaned
+    return parse
+
+
+def number_list(label: str) -> Callable:
+    """ Parser for numbers given as a list or comma-separated text (ranges are checked against other fields) """
+    def parse(value, limits):
+        if isinstance(value, str):
+            value = [item for item in value.split(',') if item.strip()]
+        if not isinstance(value, list):
+            raise FieldError(f"{label} must be a list or comma-separated numbers")
+        if not value:
+            raise FieldError(f"{label} cannot be empty")
+        try:
+            return [float(item) for item in value]
+        except (ValueError, TypeError):
+            raise FieldError(f"{label} must be valid numbers")
+    return parse
+
+
+def index_list(label: str) -> Callable:
+    """ Parser for a list of whole numbers (ranges are checked against other fields) """
+    def parse(value, limits):
+        if not isinstance(value, list):
+            raise FieldError(f"{label} must be a list with one entry per food")
+        try:
+            return [int(item) for item in value]
+        except (ValueError, TypeError):
+            raise FieldError(f"{label} must contain whole numbers")
+    return parse
+
+
+class Field:
+    """ One request field: its key in the body, the model attribute it fills and its parser """
+
+    __slots__ = ('source', 'name', 'parse', 'required', 'default')
+
+    def __init__(self, source: str, parse: Callable, name: Optional[str] = None,
+                 required: bool = True, default: Any = None):
+        self.source = source
+        self.name = name or source
+        self.parse = parse
+        self.required = required
+        self.default = default
+
+
+class Schema:
+    """ A request schema compiled once into a flat plan.
+
+    parse walks the plan a single time: each field is looked up, coerced and range-checked,
+    then the cross-field checks whose inputs all parsed run on the coerced values. Every
+    problem is collected rather than stopping at the first, and a valid body comes back as
+    the model object built from the coerced values.
+    """
+
+    def __init__(self, title: str, fields: List[Field], build: Callable[[Dict[str, Any]], Any],
+                 checks: Sequence[Tuple[Tuple[str, ...], Callable]] = ()):
+        self.title = title
+        self.build = build
+        # Defaults are copied per request, since list defaults end up inside the model
+        self.plan = tuple((field.source, field.name, field.parse, field.required, field.default) for field in fields)
+        self.checks = tuple((frozenset(requires), check) for requires, check in checks)
+
+    def parse(self, data: Any, limits: Optional[Dict[str, Any]] = None) -> Tuple[Any, List[str]]:
+        """ Returns (model, []) for a valid body or (None, error messages) """
+        if not isinstance(data, dict):
+            return None, ["Request body must be a JSON object"]
+        limits = {**DEFAULT_LIMITS, **limits} if limits else DEFAULT_LIMITS
+        values, errors, failed = {}, [], set()
+        for source, name, parse, required, default in self.plan:
+            value = data.get(source)
+            if value is None:
+                if required:
+                    errors.append(f"Missing required field: {source}")
+                    failed.add(name)
+                else:
+                    values[name] = list(default) if isinstance(default, list) else default
+                continue
+            try:
+                values[name] = parse(value, limits)
+            except FieldError as e:
+                errors.extend(e.messages)
+                failed.add(name)
+        for requires, check in self.checks:
+            if not (requires & failed):
+                errors.extend(check(values, limits))
+        if errors:
+            return None, errors
+        return self.build(values), []
+
+
+def format_errors(title: str, errors: List[str]) -> str:
+    """ All messages of one schema as a single error string """
+    return f"{title} validation error: {'; '.join(errors)}"
+
+
+def _check_portions(values: Dict[str, Any], limits: Dict[str, Any]) -> List[str]:
+    """ One portion per food, each between 1 and 2000 grams """
+    foods, portions = values['daily_foods'], values['portion_sizes_g']
+    if len(foods) != len(portions):
+        return ["Number of foods must match number of portion sizes"]
+    return [f"Portion size for '{food}' must be between 1 and 2000 grams"
+            for food, portion in zip(foods, portions) if not (1 <= portion <= 2000)]
+
+
+def _check_indices(values: Dict[str, Any], limits: Dict[str, Any]) -> List[str]:
+    """ Day and meal indices, when given, cover every food and fall within the tracked days and meals """
+    errors = []
+    count = len(values['daily_foods'])
+    for name, upper in (('day_indices', values['days_tracked']), ('meal_indices', max(values['meal_frequency'], 10))):
+        indices = values[name]
+        if indices is None:
+            continue
+        if len(indices) != count:
+            errors.append(f"{name} must be a list with one entry per food")
+        elif any(not (0 <= index < upper) for index in indices):
+            errors.append(f"{name} values must be between 0 and {upper - 1}")
+    return errors
+
+
+USER_PROFILE_SCHEMA = Schema('Profile', [
+    Field('age', integer('Age', 1, 120, ' years')),
+    Field('gender', choice('Gender', ['male', 'female', 'other'], lower=True)),
+    Field('weight', number('Weight', 20, 500, ' kg'), name='weight_kg'),
+    Field('height', number('Height', 50, 250, ' cm'), name='height_cm'),
+    Field('activity_level', choice('Activity level', ['sedentary', 'light', 'moderate', 'active', 'very_active'])),
+    Field('family_history', conditions('Family history'), required=False, default=[]),
+    Field('current_conditions', conditions('Current conditions'), required=False, default=[]),
+], build=lambda values: UserProfile(**values))
+
+DIETARY_PATTERN_SCHEMA = Schema('Dietary', [
+    Field('daily_foods', food_list('max_foods')),
+    Field('portion_sizes', number_list('Portion sizes'), name='portion_sizes_g'),
+    Field('meal_frequency', integer('Meal frequency', 1, 10), required=False, default=3),
+    Field('days_tracked', integer('Days tracked', 1, 'max_days'), required=False, default=1),
+    Field('day_indices', index_list('day_indices'), required=False),
+    Field('meal_indices', index_list('meal_indices'), required=False),
+], build=lambda values: DietaryPattern(**values), checks=[
+    (('daily_foods', 'portion_sizes_g'), _check_portions),
+    (('daily_foods', 'days_tracked', 'meal_frequency', 'day_indices', 'meal_indices'), _check_indices),
+])
@@ -0,0 +1,176 @@
+""" In-process cache of whole analyze and assessment responses keyed on their canonical input """
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from models.nutrition import NutritionInfo
+from utils.metrics import RESULT_CACHE_REQUESTS
+from utils.serialization import dumps_json, encode_response
+
+
+class CachedResult:
+    """ One cached response: its payload, the objects to persist on a hit and its encoded bodies """
+
+    __slots__ = ('key', 'payload', 'records', 'tags', 'expires', 'bodies', 'size')
+
+    def __init__(self, key: str, payload: Dict[str, Any], records: Any, tags: frozenset, expires: float, size: int):
+        self.key = key
+        self.payload = payload
+        self.records = records
+        self.tags = tags
+        self.expires = expires
+        # (Accept, Accept-Encoding) -> (body, headers), so a hit skips serialization and compression
+        self.bodies: Dict[Tuple[Optional[str], Optional[str]], Tuple[bytes, Dict[str, str]]] = {}
+        self.size = size
+
+
+class ResultCache:
+    """ LRU map of canonical request hash to response, bounded by entry count and bytes.
+
+    The key hashes the endpoint, the validated and normalized input (cleaned food names,
+    parsed profile and diary) and the live scoring settings, so changing a threshold makes
+    every older entry unreachable. Each entry is tagged with the foods it looked up, under the
+    names requested and the names the foods were stored under (a USDA food is saved under
+    its description, e.g. 'Apple, raw'), and, for food analyses, the categories whose
+    alternatives it listed. Saving a food (through the database food listener) drops exactly
+    the entries tagged with its name or category, and a response computed while one of its
+    own tags changed is not stored. The TTL bounds how long a food changed by another
+    process can go unseen.
+    """
+
+    MAX_TRACKED_TAGS = 100000 # invalidated tags remembered before they are forgotten wholesale
+
+    def __init__(self, config: Dict[str, Any], settings: Callable[[], List[Any]]):
+        self.config = config
+        self.settings = settings
+        self._entries: 'OrderedDict[str, CachedResult]' = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._bytes = 0
+        # Ticks on every invalidation; each invalidated tag remembers the tick it last changed at,
+        # so put can tell whether anything the response depends on changed after generation()
+        self._clock = 0
+        self._changed: Dict[str, int] = {}
+        # Responses computed before this tick are never stored (set by clear and tag pruning)
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """ Whether responses are cached (RESULT_CACHE_ENABLED) """
+        return self.config['enabled']
+
+    def key(self, endpoint: str, normalized_input: Any) -> str:
+        """ Hash of the endpoint, its normalized input and the current scoring settings """
+        material = orjson.dumps([endpoint, normalized_input, self.settings()],
+                                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        return hashlib.sha256(material).hexdigest()
+
+    def generation(self) -> int:
+        """ Token taken before computing a response and handed back to put """
+        return self._clock
+
+    def get(self, endpoint: str, key: str) -> Optional[CachedResult]:
+        """ Live entry for a key, marking it recently used """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        RESULT_CACHE_REQUESTS.inc(endpoint, 'miss' if entry is None else 'hit')
+        return entry
+
+    def put(self, key: str, generation: int, payload: Dict[str, Any], records: Any = None,
+            foods: Iterable[str] = (), categories: Iterable[str] = ()) -> Optional[CachedResult]:
+        """ Store a response computed for a key, tagged with the foods and categories it depends on.
+
+        foods are matched case-insensitively; pass both the requested names and the names the
+        foods were stored under. Nothing is stored if one of those foods or categories was saved
+        since generation was taken: the response may predate the change (including a food the
+        request itself fetched and saved). Saves of unrelated foods do not matter.
+        """
+        tags = frozenset([f'food:{food.strip().lower()}' for food in foods]
+                         + [f'category:{category}' for category in categories])
+        entry = CachedResult(key, payload, records, tags, time.monotonic() + self.config['ttl_seconds'],
+                             len(dumps_json(payload)))
+        with self._lock:
+            if generation < self._floor or any(self._changed.get(tag, -1) > generation for tag in tags):
+                return None
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self._evict()
+        return entry
+
+    def encoded(self, entry: CachedResult, accept: Optional[str], accept_encoding: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+        """ Body and headers of an entry for a request's Accept headers, encoded once per representation """
+        variant = (accept, accept_encoding)
+        encoded = entry.bodies.get(variant)
+        if encoded is None:
+            encoded = encode_response(entry.payload, accept, accept_encoding)
+            with self._lock:
+                # Entries already evicted or invalidated are not grown (their bytes are no longer counted)
+                if (self._entries.get(entry.key) is entry and variant not in entry.bodies
+                        and len(entry.bodies) < self.config['max_representations']):
+                    entry.bodies[variant] = encoded
+                    entry.size += len(encoded[0])
+                    self._bytes += len(encoded[0])
+                    self._evict()
+        return encoded
+
+    def invalidate_food(self, nutrition_info: NutritionInfo):
+        """ Drop entries that looked this food up or listed alternatives from its category; the food listener """
+        tags = (f'food:{nutrition_info.food_name.strip().lower()}', f'category:{nutrition_info.category}')
+        with self._lock:
+            self._clock += 1
+            if len(self._changed) >= self.MAX_TRACKED_TAGS:
+                # Forgetting tags would let stale puts through, so refuse every put in flight instead
+                self._changed.clear()
+                self._floor = self._clock
+            for tag in tags:
+                self._changed[tag] = self._clock
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        """ Drop every entry """
+        with self._lock:
+            self._clock += 1
+            self._floor = self._clock
+            self._changed.clear()
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """ Entry count and bytes held """
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+    def _remove(self, key: str):
+        """ Unlink an entry and its tags (lock held) """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _evict(self):
+        """ Drop least recently used entries beyond the count and byte limits (lock held) """
+        while self._entries and (len(self._entries) > self.config['max_entries']
+                                 or self._bytes > self.config['max_bytes']):
+            self._remove(next(iter(self._entries)))
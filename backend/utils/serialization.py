@@ -0,0 +1,133 @@
+""" Response serialization shared by the Flask and ASGI servers: fast JSON or MessagePack, then compression """
+
+import gzip
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+import brotli
+import msgpack
+import orjson
+
+from config.settings import SERIALIZATION_CONFIG
+from utils.http_cache import representation_etag, body_etag
+from utils.tracing import traced
+
+MEDIA_JSON = 'application/json'
+MEDIA_MSGPACK = 'application/msgpack'
+
+# Accept values understood for each format
+MEDIA_TYPES = {
+    MEDIA_JSON: MEDIA_JSON,
+    'application/msgpack': MEDIA_MSGPACK,
+    'application/x-msgpack': MEDIA_MSGPACK,
+    'application/vnd.msgpack': MEDIA_MSGPACK,
+}
+
+# Content codings in order of preference when the client accepts several equally
+ENCODINGS = ('br', 'gzip')
+
+_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def to_primitive(obj: Any) -> Any:
+    """ Fallback for values the encoders do not handle natively (DB decimals, numpy, model dataclasses) """
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if type(obj).__module__ == 'numpy' and hasattr(obj, 'tolist'):
+        # numpy scalars and arrays, checked by module so serializing never imports numpy
+        return obj.tolist()
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return asdict(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not serializable')
+
+
+def dumps_json(payload: Any) -> bytes:
+    """ JSON bytes via orjson """
+    return orjson.dumps(payload, default=to_primitive, option=_JSON_OPTIONS)
+
+
+def dumps_msgpack(payload: Any) -> bytes:
+    """ MessagePack bytes """
+    return msgpack.packb(payload, default=to_primitive, use_bin_type=True, datetime=False)
+
+
+def serialize(payload: Any, media_type: str = MEDIA_JSON) -> bytes:
+    """ Payload in the given media type """
+    return dumps_msgpack(payload) if media_type == MEDIA_MSGPACK else dumps_json(payload)
+
+
+def _quality_values(header: Optional[str]) -> Dict[str, float]:
+    """ Token -> q value from an Accept or Accept-Encoding header """
+    values = {}
+    for part in (header or '').split(','):
+        token, *params = [item.strip() for item in part.split(';')]
+        if not token:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        values[token.lower()] = quality
+    return values
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """ MessagePack when the client prefers it, JSON otherwise (including no or wildcard Accept) """
+    best, best_quality = MEDIA_JSON, 0.0
+    for token, quality in _quality_values(accept).items():
+        media_type = MEDIA_TYPES.get(token)
+        if media_type and quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def negotiate_encoding(accept_encoding: Optional[str], size: int) -> Optional[str]:
+    """ Content coding for a body of size bytes, or None to send it uncompressed """
+    if size < SERIALIZATION_CONFIG['compress_min_bytes']:
+        return None
+    accepted = _quality_values(accept_encoding)
+    candidates = [(accepted.get(coding, accepted.get('*', 0.0)), -rank, coding)
+                  for rank, coding in enumerate(ENCODINGS)]
+    quality, _, coding = max(candidates)
+    return coding if quality > 0 else None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """ Body in the given content coding """
+    if encoding == 'br':
+        return brotli.compress(body, quality=SERIALIZATION_CONFIG['brotli_quality'])
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=SERIALIZATION_CONFIG['gzip_level'])
+    return body
+
+
+@traced('serialize.response')
+def encode_response(payload: Any, accept: Optional[str], accept_encoding: Optional[str],
+                    etag: Optional[str] = None, hash_body: bool = False) -> Tuple[bytes, Dict[str, str]]:
+    """ Serialize and compress a payload for a request's Accept headers.
+
+    Returns the body and its Content-Type, Content-Encoding, Vary and (when etag is given
+    or hash_body is set) ETag headers. Entity tags are made per representation, so JSON,
+    MessagePack and each compressed variant are never confused by caches.
+    """
+    media_type = negotiate_media_type(accept)
+    body = serialize(payload, media_type)
+    if hash_body:
+        etag = body_etag(body)
+    encoding = negotiate_encoding(accept_encoding, len(body))
+    headers = {'Content-Type': media_type, 'Vary': 'Accept, Accept-Encoding'}
+    if encoding:
+        body = compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+    if etag:
+        headers['ETag'] = representation_etag(etag, media_type, encoding)
+    return body, headers
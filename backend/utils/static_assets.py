@@ -0,0 +1,168 @@
+""" Frontend page and static files held in memory, precompressed and served under content-hashed URLs """
+
+import gzip
+import hashlib
+import mimetypes
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import brotli
+
+from utils.http_cache import body_etag, representation_etag
+from utils.serialization import negotiate_encoding
+
+# src/href attributes of the page, rewritten to hashed URLs when they name a static file
+ASSET_REFERENCE = re.compile(r'(?P<attr>src|href)="(?P<url>[^"?#]+)"')
+
+
+class StaticAsset:
+    """ One file: identity and compressed bodies with their entity tags """
+
+    __slots__ = ('content_type', 'bodies', 'etag', 'hashed_path')
+
+    def __init__(self, content: bytes, content_type: str, hashed_path: Optional[str], config: Dict[str, Any]):
+        self.content_type = content_type
+        self.hashed_path = hashed_path
+        self.etag = body_etag(content)
+        self.bodies: Dict[Optional[str], bytes] = {None: content}
+        compressed = {
+            'br': brotli.compress(content, quality=config['brotli_quality']),
+            'gzip': gzip.compress(content, compresslevel=config['gzip_level'], mtime=0),
+        }
+        for coding, body in compressed.items():
+            # Variants that do not save bytes (tiny or already compressed files) are not kept
+            if len(body) < len(content):
+                self.bodies[coding] = body
+
+    def variant(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str], str]:
+        """ Body, content coding and entity tag for a request's Accept-Encoding """
+        coding = negotiate_encoding(accept_encoding, len(self.bodies[None]))
+        if coding not in self.bodies:
+            coding = None
+        return self.bodies[coding], coding, representation_etag(self.etag, encoding=coding)
+
+
+class AssetBundle:
+    """ The index page and every file under the static folder, read and compressed once.
+
+    Each static file is served at its plain path and at a content-hashed one
+    (``css/styles.3f2a9c1b04de.css``); the page refers to the hashed URLs, which never change
+    content and can be cached forever, while the page itself is revalidated with its ETag so
+    a deploy is picked up on the next load. Nothing is read until the bundle is first needed;
+    after that serving touches no files. With watch enabled (development) the folder is
+    polled and the bundle rebuilt when a file changes.
+    """
+
+    def __init__(self, template_path: Path, static_dir: Path, fallback_html: str, config: Dict[str, Any]):
+        self.template_path = Path(template_path)
+        self.static_dir = Path(static_dir)
+        self.fallback_html = fallback_html
+        self.config = config
+        self.index: Optional[StaticAsset] = None
+        self._files: Dict[str, StaticAsset] = {}
+        self._hashed: Dict[str, StaticAsset] = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """ Read, hash and compress every file and rewrite the page's asset URLs """
+        files, hashed = {}, {}
+        if self.static_dir.is_dir():
+            for path in sorted(self.static_dir.rglob('*')):
+                if not path.is_file():
+                    continue
+                relative = path.relative_to(self.static_dir).as_posix()
+                content = path.read_bytes()
+                stem, dot, suffix = relative.rpartition('.')
+                digest = hashlib.sha256(content).hexdigest()[:self.config['hash_length']]
+                hashed_path = f'{stem}.{digest}.{suffix}' if dot else f'{relative}.{digest}'
+                asset = StaticAsset(content, self._content_type(relative), hashed_path, self.config)
+                files[relative] = asset
+                hashed[hashed_path] = asset
+
+        try:
+            html = self.template_path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            html = self.fallback_html
+        html = ASSET_REFERENCE.sub(lambda match: self._rewrite(match, files), html)
+
+        index = StaticAsset(html.encode('utf-8'), 'text/html; charset=utf-8', None, self.config)
+        # Swapped in together, so a reload never serves a page pointing at missing files
+        self._files, self._hashed, self.index = files, hashed, index
+        self._signature = self._scan()
+        print(f"📦 Loaded {len(files)} static files and the index page into memory")
+
+    def ensure_loaded(self):
+        """ Load the bundle on first use; concurrent first requests wait for the one load """
+        if self.index is not None:
+            return
+        with self._lock:
+            if self.index is None:
+                self.load()
+
+    def get(self, path: str) -> Tuple[Optional[StaticAsset], bool]:
+        """ Asset at a static path and whether the path is content-hashed (immutable) """
+        asset = self._hashed.get(path)
+        if asset is not None:
+            return asset, True
+        return self._files.get(path), False
+
+    def url(self, path: str) -> str:
+        """ Hashed URL of a static file (the plain URL if it is not bundled) """
+        asset = self._files.get(path)
+        return f"{self.config['url_prefix']}/{asset.hashed_path if asset else path}"
+
+    def reload_if_changed(self):
+        """ Rebuild the bundle when watching and a file changed since the last check (throttled) """
+        if not self.config['watch']:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.config['watch_interval_s']:
+            return
+        with self._lock:
+            if now - self._checked_at < self.config['watch_interval_s']:
+                return
+            self._checked_at = now
+            if self._scan() != self._signature:
+                self.load()
+
+    def _scan(self):
+        """ Paths, sizes and modification times of the page and the static files """
+        paths = [self.template_path]
+        if self.static_dir.is_dir():
+            paths.extend(path for path in self.static_dir.rglob('*') if path.is_file())
+        signature = []
+        for path in paths:
+            try:
+                stat = path.stat()
+                signature.append((str(path), stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append((str(path), None, None))
+        return tuple(sorted(signature))
+
+    def _rewrite(self, match, files: Dict[str, StaticAsset]) -> str:
+        """ Replace a reference to a bundled file with its hashed URL """
+        url = match.group('url')
+        relative = url
+        while relative.startswith(('./', '../')):
+            relative = relative.split('/', 1)[1]
+        relative = relative.lstrip('/')
+        prefix = self.config['url_prefix'].strip('/') + '/'
+        if relative.startswith(prefix):
+            relative = relative[len(prefix):]
+        asset = files.get(relative)
+        if asset is None:
+            return match.group(0)
+        return f'{match.group("attr")}="{self.config["url_prefix"]}/{asset.hashed_path}"'
+
+    @staticmethod
+    def _content_type(path: str) -> str:
+        """ Content type by extension, with a charset for text """
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        return content_type
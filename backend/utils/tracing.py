@@ -0,0 +1,405 @@
+""" Request-scoped tracing: spans around database, cache, external-source, scoring and serialization calls """
+
+import contextvars
+import functools
+import inspect
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config.settings import TRACING_CONFIG
+
+# Trace of the request being handled and the innermost open span; asyncio tasks and
+# asyncio.to_thread inherit both, thread pools need contextvars.copy_context().run
+_current_trace = contextvars.ContextVar('trace', default=None)
+_current_span = contextvars.ContextVar('span', default=None)
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_ERROR = 2
+
+
+class Span:
+    """ One timed operation; start and end are wall-clock nanoseconds as OTLP expects """
+
+    __slots__ = ('name', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key: str, value: Any):
+        """ Add or replace an attribute """
+        self.attributes[key] = value
+
+    def end(self):
+        """ Record the end time (only the first call counts) """
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ns(self) -> int:
+        """ Time from start to end, or to now while the span is open """
+        return (self.end_ns or time.time_ns()) - self.start_ns
+
+
+class _NoopSpan:
+    """ Stand-in handed out when the request is not traced """
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """ Spans of one request. Spans may be added from several threads and tasks at once """
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+                 sampled: bool = True, debug: bool = False, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.sampled = sampled
+        self.debug = debug
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+        self.root = self.start_span(name, parent_id, attributes or {})
+
+    def start_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Span:
+        """ Open a span in this trace (kept up to max_spans, counted as dropped after that) """
+        span = Span(name, parent_id, attributes)
+        with self._lock:
+            if len(self.spans) < TRACING_CONFIG['max_spans']:
+                self.spans.append(span)
+            else:
+                self.dropped_spans += 1
+        return span
+
+    def self_times_ms(self) -> Dict[str, float]:
+        """ Wall-clock time each category (the span name up to the first dot) spent in its own work.
+
+        A span's own work is its interval minus the intervals of its children; a category's
+        time is the union of its spans' own work, so concurrent lookups are counted once
+        rather than summed, and the request's own remainder is reported as 'app'.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        now = time.time_ns()
+        children: Dict[str, List[tuple]] = {}
+        for span in spans:
+            if span.parent_id:
+                children.setdefault(span.parent_id, []).append((span.start_ns, span.end_ns or now))
+        own: Dict[str, List[tuple]] = {}
+        for span in spans:
+            category = 'app' if span is self.root else span.name.split('.', 1)[0]
+            interval = [(span.start_ns, span.end_ns or now)]
+            own.setdefault(category, []).extend(_subtract(interval, _merge(children.get(span.span_id, []))))
+        return {category: sum(end - start for start, end in _merge(intervals)) / 1e6
+                for category, intervals in own.items()}
+
+    def server_timing(self) -> str:
+        """ Server-Timing header value: own time per category plus the request total """
+        parts = [f'{category};dur={ms:.2f}' for category, ms in sorted(self.self_times_ms().items(),
+                                                                         key=lambda item: -item[1])]
+        parts.append(f'total;dur={self.root.duration_ns / 1e6:.2f}')
+        return ', '.join(parts)
+
+    def debug_payload(self) -> Dict[str, Any]:
+        """ Breakdown included in the response body of debug requests """
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            'trace_id': self.trace_id,
+            'total_ms': round(self.root.duration_ns / 1e6, 3),
+            'breakdown_ms': {category: round(ms, 3) for category, ms in self.self_times_ms().items()},
+            'spans': [{
+                'name': span.name,
+                'span_id': span.span_id,
+                'parent_id': span.parent_id,
+                'start_ms': round((span.start_ns - self.root.start_ns) / 1e6, 3),
+                'duration_ms': round(span.duration_ns / 1e6, 3),
+                'attributes': span.attributes,
+                **({'error': span.error} if span.error else {})
+            } for span in spans],
+            'dropped_spans': self.dropped_spans
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """ The trace as an OTLP/JSON ExportTraceServiceRequest """
+        with self._lock:
+            spans = list(self.spans)
+        return {'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': TRACING_CONFIG['service_name'],
+                                                         'process.pid': os.getpid()})},
+            'scopeSpans': [{
+                'scope': {'name': 'food-health-app'},
+                'spans': [{
+                    'traceId': self.trace_id,
+                    'spanId': span.span_id,
+                    **({'parentSpanId': span.parent_id} if span.parent_id else {}),
+                    'name': span.name,
+                    'kind': SPAN_KIND_SERVER if span is self.root else SPAN_KIND_INTERNAL,
+                    'startTimeUnixNano': str(span.start_ns),
+                    'endTimeUnixNano': str(span.end_ns or span.start_ns),
+                    'attributes': _otlp_attributes(span.attributes),
+                    'status': {'code': STATUS_ERROR, 'message': span.error} if span.error else {}
+                } for span in spans]
+            }]
+        }]}
+
+
+def _merge(intervals: List[tuple]) -> List[tuple]:
+    """ Sorted, non-overlapping union of (start, end) intervals """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract(intervals: List[tuple], holes: List[tuple]) -> List[tuple]:
+    """ Parts of merged intervals not covered by merged holes """
+    result = []
+    for start, end in intervals:
+        for hole_start, hole_end in holes:
+            if hole_end <= start or hole_start >= end:
+                continue
+            if hole_start > start:
+                result.append((start, hole_start))
+            start = max(start, hole_end)
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """ OTLP key/value list; values keep their type where OTLP has one """
+    items = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {'boolValue': value}
+        elif isinstance(value, int):
+            typed = {'intValue': str(value)}
+        elif isinstance(value, float):
+            typed = {'doubleValue': value}
+        else:
+            typed = {'stringValue': str(value)}
+        items.append({'key': key, 'value': typed})
+    return items
+
+
+class span:
+    """ Context manager timing a block as a child of the current span.
+
+    Outside a traced request it only checks a context variable and yields NOOP_SPAN, so
+    instrumented code costs well under a microsecond when tracing is off.
+    """
+
+    __slots__ = ('name', 'attributes', '_span', '_token')
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self._span = None
+        self._token = None
+
+    def __enter__(self):
+        trace = _current_trace.get()
+        if trace is None:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        self._span = trace.start_span(self.name, parent.span_id if parent else None, self.attributes)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._span is not None:
+            if exc is not None:
+                self._span.error = f'{exc_type.__name__}: {exc}'
+            self._span.end()
+            _current_span.reset(self._token)
+        return False
+
+
+def traced(name: str):
+    """ Decorator running a function (or coroutine function) inside span(name) """
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_trace() -> Optional[Trace]:
+    """ Trace of the request being handled, or None if it is not traced """
+    return _current_trace.get()
+
+
+def with_debug_trace(payload: Any) -> Any:
+    """ payload plus the trace breakdown under '_trace' when the request asked for it """
+    trace = _current_trace.get()
+    if trace is None or not trace.debug or not isinstance(payload, dict):
+        return payload
+    return {**payload, '_trace': trace.debug_payload()}
+
+
+def is_debug_request(query_value: Optional[str], header_value: Optional[str]) -> bool:
+    """ Whether ?debug=trace or the X-Debug-Trace header asks for the trace breakdown """
+    return query_value == 'trace' or (header_value or '').strip().lower() in ('1', 'true')
+
+
+def parse_traceparent(header: Optional[str]):
+    """ (trace_id, parent span id, sampled) from a W3C traceparent header, or None """
+    if not header:
+        return None
+    parts = header.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def begin_request_trace(name: str, traceparent: Optional[str] = None, debug: bool = False,
+                        **attributes) -> Optional[Trace]:
+    """ Start tracing the current request if it is sampled (or asks for a debug breakdown).
+
+    An incoming traceparent joins the caller's trace and follows its sampling decision;
+    otherwise TRACING_CONFIG['sample_rate'] decides. Returns None when not traced.
+    """
+    parent = parse_traceparent(traceparent)
+    if parent:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id = None, None
+        sampled = random.random() < TRACING_CONFIG['sample_rate']
+    debug = debug and TRACING_CONFIG['debug_payload']
+    if not (sampled or debug):
+        _current_trace.set(None)
+        _current_span.set(None)
+        return None
+    trace = Trace(name, trace_id, parent_id, sampled, debug, attributes)
+    _current_trace.set(trace)
+    _current_span.set(trace.root)
+    return trace
+
+
+def end_request_trace(trace: Optional[Trace], status_code: Optional[int] = None):
+    """ Close the request's root span, queue the trace for export if sampled and clear the context """
+    _current_trace.set(None)
+    _current_span.set(None)
+    if trace is None:
+        return
+    if status_code is not None:
+        trace.root.set_attribute('http.status_code', status_code)
+        if status_code >= 500:
+            trace.root.error = f'HTTP {status_code}'
+    trace.root.end()
+    if trace.sampled:
+        EXPORTER.export(trace)
+
+
+class SpanExporter:
+    """ Writes finished traces as OTLP/JSON, off the request path.
+
+    Traces are appended one per line to TRACING_CONFIG['export_path'] and/or POSTed to an
+    OTLP/HTTP collector at TRACING_CONFIG['export_url'] by a background thread. When the
+    queue is full, traces are dropped rather than slowing requests down.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self._reset_state()
+
+    def _reset_state(self):
+        """ Fresh queue and no thread (at start and in forked children) """
+        self._queue = queue.Queue(maxsize=self.config['export_queue'])
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        """ Whether any export destination is configured """
+        return bool(self.config.get('export_path') or self.config.get('export_url'))
+
+    def export(self, trace: Trace):
+        """ Queue a finished trace """
+        if not self.enabled:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0):
+        """ Wait until queued traces are written (tests, shutdown) """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_thread(self):
+        """ Start the export thread on first use """
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """ Export loop: one OTLP/JSON request per trace """
+        from utils.serialization import dumps_json
+        while True:
+            trace = self._queue.get()
+            try:
+                body = dumps_json(trace.to_otlp())
+                if self.config.get('export_path'):
+                    with open(self.config['export_path'], 'ab') as f:
+                        f.write(body + b'\n')
+                if self.config.get('export_url'):
+                    import requests
+                    requests.post(self.config['export_url'], data=body, timeout=self.config['export_timeout_s'],
+                                  headers={'Content-Type': 'application/json'})
+            except Exception as e:
+                print(f"❌ Trace export error: {e}")
+            finally:
+                self._queue.task_done()
+
+
+EXPORTER = SpanExporter(TRACING_CONFIG)
+
+if hasattr(os, 'register_at_fork'):
+    # The exporter thread does not survive a fork; children start their own on first export
+    os.register_at_fork(after_in_child=EXPORTER._reset_state)
@@ -2,8 +2,10 @@
 
 import re
 from typing import Union, Tuple, List, Dict, Any
-from models.user import UserProfile
-from models.nutrition import DietaryPattern
+from config.settings import COHORT_CONFIG, UNCERTAINTY_CONFIG, OPTIMIZER_CONFIG, SESSION_CONFIG, JOB_CONFIG, PROFILER_CONFIG
+
+# Letters, digits, spaces and common punctuation; compiled once since every food name is matched
+FOOD_NAME_PATTERN = re.compile(r'^[a-zA-Z0-9\s\-\(\)\.,\'&]+$')
 
 class InputValidator:
     """ Handles input validation for the Food Health App """
@@ -18,14 +20,13 @@ class InputValidator:
         if len(food_name) < 2 or len(food_name) > 100:
             return False, "Food name must be between 2 and 100 characters."
         
-        pattern = r'^[a-zA-Z0-9\s\-\(\)\.,\'&]+$'
-        if not re.match(pattern, food_name):
+        if not FOOD_NAME_PATTERN.match(food_name):
             return False, "Food name contains invalid characters. Use only letters, numbers, spaces, and common punctuation."
         
         return True, "Valid"
     
     @staticmethod
-    def validate_food_list(foods: Union[str, List[str]]) -> Tuple[bool, str, List[str]]:
+    def validate_food_list(foods: Union[str, List[str]], max_foods: int = 20) -> Tuple[bool, str, List[str]]:
         """Validate and clean a list of foods"""
         if isinstance(foods, str):
             foods = [f.strip() for f in foods.split(',') if f.strip()]
@@ -33,8 +34,8 @@ class InputValidator:
         if not foods:
             return False, "At least one food item must be provided", []
         
-        if len(foods) > 20:
-            return False, "Cannot analyze more than 20 foods at once", []
+        if len(foods) > max_foods:
+            return False, f"Cannot analyze more than {max_foods} foods at once", []
         
         cleaned_foods = []
         for food in foods:
@@ -46,105 +47,194 @@ class InputValidator:
         return True, "Valid", cleaned_foods
     
     @staticmethod
-    def validate_user_profile_data(data: Dict[str, Any]) -> Tuple[bool, str]:
-        """Validate user profile data"""
-        required_fields = ['age', 'gender', 'weight', 'height', 'activity_level']
+    def validate_cohort_data(data: Dict[str, Any]) -> Tuple[bool, str, Dict[str, List], Dict[str, List[float]]]:
+        """Validate columnar cohort data and split it into profile and daily intake columns"""
+        if not isinstance(data, dict):
+            return False, "Cohort data must be an object of columns", {}, {}
+        
+        profile_fields = ['age', 'gender', 'weight', 'height', 'activity_level']
+        intake_fields = ['calories', 'sugar_g', 'saturated_fat_g', 'sodium_mg']
+        
+        for field in profile_fields + intake_fields:
+            if not isinstance(data.get(field), list):
+                return False, f"Missing required column: {field}", {}, {}
         
-        # Check required fields
-        for field in required_fields:
-            if field not in data or data[field] is None:
-                return False, f"Missing required field: {field}"
+        size = len(data['age'])
+        if size == 0:
+            return False, "Cohort must contain at least one profile", {}, {}
+        if size > COHORT_CONFIG['max_profiles']:
+            return False, f"Cannot assess more than {COHORT_CONFIG['max_profiles']} profiles at once", {}, {}
+        
+        family_history = data.get('family_history', [[] for _ in range(size)])
+        columns = profile_fields + intake_fields
+        if not isinstance(family_history, list) or any(len(data[field]) != size for field in columns) or len(family_history) != size:
+            return False, "All cohort columns must have the same length", {}, {}
         
-        # Validate age
         try:
-            age = int(data['age'])
-            if not (1 <= age <= 120):
-                return False, "Age must be between 1 and 120 years"
+            ages = [int(age) for age in data['age']]
+            weights = [float(weight) for weight in data['weight']]
+            heights = [float(height) for height in data['height']]
+            intake = {field: [float(value) for value in data[field]] for field in intake_fields}
         except (ValueError, TypeError):
-            return False, "Age must be a valid number"
+            return False, "Cohort numeric columns must contain valid numbers", {}, {}
         
-        # Validate gender
+        # Normalized as the single-profile schema does, so 'Male' is scored as male
+        genders = [g.strip().lower() if isinstance(g, str) else g for g in data['gender']]
         valid_genders = ['male', 'female', 'other']
-        if data['gender'].lower() not in valid_genders:
-            return False, f"Gender must be one of: {', '.join(valid_genders)}"
+        valid_activities = ['sedentary', 'light', 'moderate', 'active', 'very_active']
+        checks = [
+            (all(1 <= age <= 120 for age in ages), "Age must be between 1 and 120 years"),
+            (all(20 <= weight <= 500 for weight in weights), "Weight must be between 20 and 500 kg"),
+            (all(50 <= height <= 250 for height in heights), "Height must be between 50 and 250 cm"),
+            (all(g in valid_genders for g in genders),
+             f"Gender must be one of: {', '.join(valid_genders)}"),
+            (all(level in valid_activities for level in data['activity_level']),
+             f"Activity level must be one of: {', '.join(valid_activities)}"),
+            (all(value >= 0 for values in intake.values() for value in values), "Intake values cannot be negative")
+        ]
+        for passed, error_msg in checks:
+            if not passed:
+                return False, error_msg, {}, {}
+        
+        clean_family_history = []
+        for history in family_history:
+            if not isinstance(history, (str, list)) and history is not None:
+                return False, "Family history validation error: Each entry must be a list or comma-separated text", {}, {}
+            is_valid, error_msg, cleaned = InputValidator.validate_health_conditions(history or [])
+            if not is_valid:
+                return False, f"Family history validation error: {error_msg}", {}, {}
+            clean_family_history.append(cleaned)
+        
+        profiles = {
+            'age': ages,
+            'gender': genders,
+            'weight_kg': weights,
+            'height_cm': heights,
+            'activity_level': list(data['activity_level']),
+            'family_history': clean_family_history
+        }
+        return True, "Valid", profiles, intake
+    
+    @staticmethod
+    def validate_uncertainty_option(option: Any) -> Tuple[bool, str, int]:
+        """Validate the optional uncertainty flag; returns the number of Monte Carlo draws (0 = off)"""
+        if option is None or option is False:
+            return True, "Valid", 0
+        if option is True:
+            return True, "Valid", UNCERTAINTY_CONFIG['default_draws']
         
-        # Validate weight
         try:
-            weight = float(data['weight'])
-            if not (20 <= weight <= 500):
-                return False, "Weight must be between 20 and 500 kg"
+            draws = int(option)
         except (ValueError, TypeError):
-            return False, "Weight must be a valid number"
+            return False, "Uncertainty must be true/false or a number of draws", 0
+        
+        if not (0 <= draws <= UNCERTAINTY_CONFIG['max_draws']):
+            return False, f"Uncertainty draws must be between 0 and {UNCERTAINTY_CONFIG['max_draws']}", 0
+        
+        return True, "Valid", draws
+    
+    @staticmethod
+    def validate_optimizer_options(data: Dict[str, Any]) -> Tuple[bool, str, str, int]:
+        """Validate diet optimizer options; returns the target risk level and change budget"""
+        target_level = data.get('target_level', OPTIMIZER_CONFIG['default_target_level'])
+        valid_levels = ['low', 'moderate', 'high']
+        if target_level not in valid_levels:
+            return False, f"Target level must be one of: {', '.join(valid_levels)}", '', 0
         
-        # Validate height
         try:
-            height = float(data['height'])
-            if not (50 <= height <= 250):
-                return False, "Height must be between 50 and 250 cm"
+            max_changes = int(data.get('max_changes', OPTIMIZER_CONFIG['max_changes']))
+            if not (1 <= max_changes <= 20):
+                return False, "Max changes must be between 1 and 20", '', 0
         except (ValueError, TypeError):
-            return False, "Height must be a valid number"
+            return False, "Max changes must be a valid number", '', 0
         
-        # Validate activity level
-        valid_activities = ['sedentary', 'light', 'moderate', 'active', 'very_active']
-        if data['activity_level'] not in valid_activities:
-            return False, f"Activity level must be one of: {', '.join(valid_activities)}"
+        return True, "Valid", target_level, max_changes
+    
+    @staticmethod
+    def validate_intake_entry(data: Dict[str, Any]) -> Tuple[bool, str, str, float]:
+        """Validate a single session intake entry; returns the cleaned food name and portion in grams"""
+        if not data or 'food' not in data or 'portion_g' not in data:
+            return False, "Intake entry needs 'food' and 'portion_g'", '', 0.0
         
-        return True, "Valid"
+        food = data['food']
+        if not isinstance(food, str):
+            return False, "Food must be a string", '', 0.0
+        is_valid, error_msg = InputValidator.validate_food_name(food)
+        if not is_valid:
+            return False, error_msg, '', 0.0
+        
+        try:
+            portion = float(data['portion_g'])
+            if not (1 <= portion <= 2000):
+                return False, "Portion size must be between 1 and 2000 grams", '', 0.0
+        except (ValueError, TypeError):
+            return False, "Portion size must be a valid number", '', 0.0
+        
+        return True, "Valid", food.strip().lower(), portion
     
     @staticmethod
-    def validate_dietary_pattern_data(data: Dict[str, Any]) -> Tuple[bool, str]:
-        """Validate dietary pattern data"""
-        required_fields = ['daily_foods', 'portion_sizes']
+    def validate_session_options(data: Dict[str, Any]) -> Tuple[bool, str, int, int]:
+        """Validate assessment session options; returns days tracked and meal frequency"""
+        try:
+            days_tracked = int(data.get('days_tracked', 1))
+            if not (1 <= days_tracked <= 30):
+                return False, "Days tracked must be between 1 and 30", 0, 0
+        except (ValueError, TypeError):
+            return False, "Days tracked must be a valid number", 0, 0
         
-        for field in required_fields:
-            if field not in data:
-                return False, f"Missing required field: {field}"
+        try:
+            meal_frequency = int(data.get('meal_frequency', 3))
+            if not (1 <= meal_frequency <= 10):
+                return False, "Meal frequency must be between 1 and 10", 0, 0
+        except (ValueError, TypeError):
+            return False, "Meal frequency must be a valid number", 0, 0
         
-        # Validate foods
-        is_valid, error_msg, cleaned_foods = InputValidator.validate_food_list(data['daily_foods'])
-        if not is_valid:
-            return False, error_msg
-        
-        # Validate portion sizes
-        portion_sizes = data['portion_sizes']
-        if isinstance(portion_sizes, str):
-            try:
-                portion_sizes = [float(p.strip()) for p in portion_sizes.split(',') if p.strip()]
-            except ValueError:
-                return False, "Portion sizes must be valid numbers"
-        
-        if not portion_sizes:
-            return False, "Portion sizes cannot be empty"
-        
-        if len(cleaned_foods) != len(portion_sizes):
-            return False, "Number of foods must match number of portion sizes"
-        
-        for i, portion in enumerate(portion_sizes):
-            try:
-                portion = float(portion)
-                if not (1 <= portion <= 2000):
-                    return False, f"Portion size for '{cleaned_foods[i]}' must be between 1 and 2000 grams"
-            except (ValueError, TypeError):
-                return False, f"Invalid portion size for '{cleaned_foods[i]}'"
-        
-        # Validate optional fields
-        if 'meal_frequency' in data:
-            try:
-                meal_freq = int(data['meal_frequency'])
-                if not (1 <= meal_freq <= 10):
-                    return False, "Meal frequency must be between 1 and 10"
-            except (ValueError, TypeError):
-                return False, "Meal frequency must be a valid number"
-        
-        if 'days_tracked' in data:
-            try:
-                days = int(data['days_tracked'])
-                if not (1 <= days <= 30):
-                    return False, "Days tracked must be between 1 and 30"
-            except (ValueError, TypeError):
-                return False, "Days tracked must be a valid number"
+        entries = data.get('entries', [])
+        if not isinstance(entries, list) or len(entries) > SESSION_CONFIG['max_entries']:
+            return False, f"Entries must be a list of at most {SESSION_CONFIG['max_entries']} items", 0, 0
         
-        return True, "Valid"
+        return True, "Valid", days_tracked, meal_frequency
+    
+    @staticmethod
+    def validate_job_request(data: Dict[str, Any]) -> Tuple[bool, str, str]:
+        """Validate the envelope of a batch job request; returns the job type"""
+        if not isinstance(data, dict):
+            return False, "Job request must be a JSON object", ''
+        
+        job_type = data.get('type', 'foods')
+        if job_type not in JOB_CONFIG['job_types']:
+            return False, f"Job type must be one of: {', '.join(JOB_CONFIG['job_types'])}", ''
+        
+        if job_type == 'foods' and 'foods' not in data:
+            return False, "Missing required field: foods", ''
+        
+        return True, "Valid", job_type
+    
+    @staticmethod
+    def validate_profile_request(data: Dict[str, Any]) -> Tuple[bool, str, float, float, bool]:
+        """Validate a profiler request; returns seconds, sampling interval (ms) and whether to track allocations"""
+        if not isinstance(data, dict):
+            return False, "Profile request must be a JSON object", 0.0, 0.0, False
+        
+        try:
+            seconds = float(data.get('seconds', PROFILER_CONFIG['default_seconds']))
+            if not (0 < seconds <= PROFILER_CONFIG['max_seconds']):
+                return False, f"Seconds must be between 0 and {PROFILER_CONFIG['max_seconds']}", 0.0, 0.0, False
+        except (ValueError, TypeError):
+            return False, "Seconds must be a valid number", 0.0, 0.0, False
+        
+        try:
+            interval_ms = float(data.get('interval_ms', PROFILER_CONFIG['interval_ms']))
+            if not (PROFILER_CONFIG['min_interval_ms'] <= interval_ms <= 1000):
+                return False, f"Interval must be between {PROFILER_CONFIG['min_interval_ms']} and 1000 ms", 0.0, 0.0, False
+        except (ValueError, TypeError):
+            return False, "Interval must be a valid number", 0.0, 0.0, False
+        
+        allocations = data.get('allocations', False)
+        if not isinstance(allocations, bool):
+            return False, "Allocations must be true or false", 0.0, 0.0, False
+        
+        return True, "Valid", seconds, interval_ms, allocations
     
     @staticmethod
     def sanitize_string(input_string: str, max_length: int = 255) -> str:
@@ -185,6 +275,8 @@ class InputValidator:
         ]
         
         for condition in conditions:
+            if not isinstance(condition, str):
+                return False, "Conditions must be text", []
             condition = InputValidator.sanitize_string(condition.lower(), 50)
             if len(condition) < 2:
                 return False, f"Condition '{condition}' is too short", []
@@ -71,31 +71,80 @@ async function analyzeFoods() {
     }
             
     const resultsContainer = document.getElementById('food-results');
-    const foods = input.split(',').map(f => f.trim());
+    const foods = input.split(',').map(f => f.trim()).filter(f => f);
             
     showLoading(resultsContainer, 'Analyzing your foods...');
             
     try {
-        const response = await fetch(`${API_BASE_URL}/analyze-foods`, {
+        // Ask for NDJSON so each food is shown as soon as the server has looked it up
+        const response = await fetch(`${API_BASE_URL}/analyze-foods?stream=ndjson`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({ foods: foods })
-        });        
-        const data = await response.json();
-                
-        if (data.success) {
-            displayFoodResults(data.results);
-        } else {
-            showError(resultsContainer, data.error || 'Failed to analyze foods');
+        });
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('application/x-ndjson') || !response.body) {
+            // Validation errors (and servers without streaming) answer with plain JSON
+            const data = await response.json();
+            if (data.success) {
+                displayFoodResults(data.results);
+            } else {
+                showError(resultsContainer, data.error || 'Failed to analyze foods');
+            }
+            return;
         }
+
+        startFoodResults(foods);
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => handleFoodEvent(JSON.parse(line)));
+        }
+        if (buffer.trim()) handleFoodEvent(JSON.parse(buffer));
     } catch (error) {
         console.error('Error:', error);
         showError(resultsContainer, 'Failed to connect to the server. Please make sure the Flask backend is running.');
     }
 }
 
+// Lay out one placeholder per food so streamed results land in request order
+function startFoodResults(foods) {
+    const resultsContainer = document.getElementById('food-results');
+    resultsContainer.innerHTML = `
+        <div class="results-container">
+            ${foodResultsHeader()}
+            ${foods.map((food, index) => `
+                <div id="food-result-${index}">
+                    <div class="loading" style="margin-bottom: 25px;">
+                        <div class="spinner"></div>
+                        <p>Looking up ${food}...</p>
+                    </div>
+                </div>
+            `).join('')}
+            <div id="food-results-summary"></div>
+        </div>
+    `;
+}
+
+function handleFoodEvent(event) {
+    if (event.event === 'result') {
+        const slot = document.getElementById(`food-result-${event.index}`);
+        if (slot) slot.innerHTML = renderFoodResult(event);
+    } else if (event.event === 'summary') {
+        document.getElementById('food-results-summary').innerHTML = renderFoodSummary(event.found, event.risky, event.safe);
+    } else if (event.event === 'error') {
+        showError(document.getElementById('food-results-summary'), event.error || 'Failed to analyze foods');
+    }
+}
+
 // Update the displayFoodResults function to use artisan style classes
 function displayFoodResults(results) {
     const resultsContainer = document.getElementById('food-results');
@@ -105,6 +154,34 @@ function displayFoodResults(results) {
         return;
     }
 
+    let html = `
+        <div class="results-container">
+            ${foodResultsHeader()}
+    `;
+            
+    results.forEach(result => {
+        html += renderFoodResult(result);
+    });
+            
+    // Add summary
+    const foundResults = results.filter(r => r.nutrition);
+    const riskyFoods = foundResults.filter(r => r.risk_assessment && r.risk_assessment.is_risky);
+    const safeFoods = foundResults.filter(r => r.risk_assessment && !r.risk_assessment.is_risky);
+    html += renderFoodSummary(foundResults.length, riskyFoods.length, safeFoods.length);
+            
+    html += '</div>';
+    resultsContainer.innerHTML = html;
+}
+
+function foodResultsHeader() {
+    return `
+            <h3 style="text-align: center; font-style: italic; color: var(--primary-dark); border-bottom: 1px dashed var(--border); padding-bottom: 10px; margin-bottom: 25px;">
+                Analysis Results
+            </h3>
+    `;
+}
+
+function renderFoodResult(result) {
     // Define risk level styles based on artisan theme
     const riskStyles = {
         low: {
@@ -124,139 +201,125 @@ function displayFoodResults(results) {
         }
     };
 
-    let html = `
-        <div class="results-container">
-            <h3 style="text-align: center; font-style: italic; color: var(--primary-dark); border-bottom: 1px dashed var(--border); padding-bottom: 10px; margin-bottom: 25px;">
-                Analysis Results
-            </h3>
-    `;
-            
-    results.forEach(result => {
-        if (result.nutrition) {
-            const riskLevel = getRiskLevel(result.risk_assessment.risk_score);
-            const style = riskStyles[riskLevel.class.replace('risk-', '')];
-            
-            html += `
-                <div class="food-result" style="margin-bottom: 25px; padding: 20px; background: white; border-radius: 4px; border: 1px solid var(--border); box-shadow: var(--shadow);">
-                    <div class="food-name" style="font-size: 1.3rem; font-weight: 600; color: var(--primary-dark); margin-bottom: 15px;">
-                        ${result.nutrition.name}
-                    </div>        
-                    
-                    <div class="nutrition-info" style="display: grid; grid-template-columns: repeat(auto-fit, minmax(100px, 1fr)); gap: 15px; margin-bottom: 20px;">
-                        <div class="nutrition-item" style="text-align: center; padding: 10px; background: var(--bg); border-radius: 4px;">
-                            <div class="nutrition-value" style="font-size: 1.2rem; font-weight: 700; color: var(--primary);">
-                                ${result.nutrition.calories_per_100g.toFixed(0)}
-                            </div>
-                            <div class="nutrition-label" style="font-size: 0.9rem; color: var(--text-light);">
-                                Calories
-                            </div>
+    if (result.nutrition) {
+        const riskLevel = getRiskLevel(result.risk_assessment.risk_score);
+        const style = riskStyles[riskLevel.class.replace('risk-', '')];
+        
+        return `
+            <div class="food-result" style="margin-bottom: 25px; padding: 20px; background: white; border-radius: 4px; border: 1px solid var(--border); box-shadow: var(--shadow);">
+                <div class="food-name" style="font-size: 1.3rem; font-weight: 600; color: var(--primary-dark); margin-bottom: 15px;">
+                    ${result.nutrition.name}
+                </div>        
+                
+                <div class="nutrition-info" style="display: grid; grid-template-columns: repeat(auto-fit, minmax(100px, 1fr)); gap: 15px; margin-bottom: 20px;">
+                    <div class="nutrition-item" style="text-align: center; padding: 10px; background: var(--bg); border-radius: 4px;">
+                        <div class="nutrition-value" style="font-size: 1.2rem; font-weight: 700; color: var(--primary);">
+                            ${result.nutrition.calories_per_100g.toFixed(0)}
                         </div>
-                        <div class="nutrition-item" style="text-align: center; padding: 10px; background: var(--bg); border-radius: 4px;">
-                            <div class="nutrition-value" style="font-size: 1.2rem; font-weight: 700; color: var(--primary);">
-                                ${result.nutrition.sugar_g.toFixed(1)}g
-                            </div>
-                            <div class="nutrition-label" style="font-size: 0.9rem; color: var(--text-light);">
-                                Sugar
-                            </div>
+                        <div class="nutrition-label" style="font-size: 0.9rem; color: var(--text-light);">
+                            Calories
                         </div>
-                        <div class="nutrition-item" style="text-align: center; padding: 10px; background: var(--bg); border-radius: 4px;">
-                            <div class="nutrition-value" style="font-size: 1.2rem; font-weight: 700; color: var(--primary);">
-                                ${result.nutrition.saturated_fat_g.toFixed(1)}g
-                            </div>
-                            <div class="nutrition-label" style="font-size: 0.9rem; color: var(--text-light);">
-                                Sat Fat
-                            </div>
+                    </div>
+                    <div class="nutrition-item" style="text-align: center; padding: 10px; background: var(--bg); border-radius: 4px;">
+                        <div class="nutrition-value" style="font-size: 1.2rem; font-weight: 700; color: var(--primary);">
+                            ${result.nutrition.sugar_g.toFixed(1)}g
                         </div>
-                        <div class="nutrition-item" style="text-align: center; padding: 10px; background: var(--bg); border-radius: 4px;">
-                            <div class="nutrition-value" style="font-size: 1.2rem; font-weight: 700; color: var(--primary);">
-                                ${result.nutrition.sodium_mg.toFixed(0)}mg
-                            </div>
-                            <div class="nutrition-label" style="font-size: 0.9rem; color: var(--text-light);">
-                                Sodium
-                            </div>
+                        <div class="nutrition-label" style="font-size: 0.9rem; color: var(--text-light);">
+                            Sugar
                         </div>
                     </div>
-                    
-                    <div style="margin: 15px 0; padding: 10px; background: ${style.bg}; border-radius: 4px; border-left: 4px solid ${style.color};">
-                        <span style="font-weight: 600; color: ${style.color};">
-                            ${riskLevel.level.toUpperCase()} Risk (Score: ${result.risk_assessment.risk_score})
-                        </span>
-                        <span style="margin-left: 10px; color: var(--text-light); font-size: 0.9rem;">
-                            Source: ${result.nutrition.source}
-                        </span>
+                    <div class="nutrition-item" style="text-align: center; padding: 10px; background: var(--bg); border-radius: 4px;">
+                        <div class="nutrition-value" style="font-size: 1.2rem; font-weight: 700; color: var(--primary);">
+                            ${result.nutrition.saturated_fat_g.toFixed(1)}g
+                        </div>
+                        <div class="nutrition-label" style="font-size: 0.9rem; color: var(--text-light);">
+                            Sat Fat
+                        </div>
                     </div>
-                    
-                    ${Object.keys(result.risk_assessment.risk_factors).length > 0 ? `
-                        <div style="margin: 15px 0; padding: 15px; background: var(--bg); border-radius: 4px;">
-                            <strong style="color: var(--primary-dark);">Risk Factors:</strong> 
-                            <ul style="margin-top: 8px; list-style-type: disc; padding-left: 20px;">
-                                ${Object.entries(result.risk_assessment.risk_factors).map(([factor, level]) => 
-                                    `<li style="margin-bottom: 5px;">${factor}: <span style="font-weight: 600;">${level}</span></li>`
-                                ).join('')}
-                            </ul>
+                    <div class="nutrition-item" style="text-align: center; padding: 10px; background: var(--bg); border-radius: 4px;">
+                        <div class="nutrition-value" style="font-size: 1.2rem; font-weight: 700; color: var(--primary);">
+                            ${result.nutrition.sodium_mg.toFixed(0)}mg
                         </div>
-                    ` : ''}
-                    
-                    ${result.risk_assessment.alternatives.length > 0 ? `
-                        <div class="alternatives" style="margin: 20px 0 10px; padding: 15px; background: rgba(42, 157, 143, 0.1); border-radius: 4px; border-left: 4px solid var(--success);">
-                            <h4 style="color: var(--success); font-weight: 600; margin-bottom: 10px;">
-                                🌱 Healthier Alternatives:
-                            </h4>
-                            <div class="alternatives-list" style="display: flex; flex-wrap: wrap; gap: 8px;">
-                                ${result.risk_assessment.alternatives.map(alt => `
-                                    <span class="alternative-item" style="padding: 6px 12px; background: white; border-radius: 4px; border: 1px solid var(--success); color: var(--success); font-size: 0.9rem;">
-                                        ${alt}
-                                    </span>
-                                `).join('')}
-                            </div>
+                        <div class="nutrition-label" style="font-size: 0.9rem; color: var(--text-light);">
+                            Sodium
                         </div>
-                    ` : ''}
+                    </div>
                 </div>
-            `;
-        } else {
-            html += `
-                <div class="food-result" style="margin-bottom: 25px; padding: 20px; background: white; border-radius: 4px; border: 1px solid var(--border); box-shadow: var(--shadow);">
-                    <div class="food-name" style="font-size: 1.3rem; font-weight: 600; color: var(--danger);">
-                        ${result.food_name}
+                
+                <div style="margin: 15px 0; padding: 10px; background: ${style.bg}; border-radius: 4px; border-left: 4px solid ${style.color};">
+                    <span style="font-weight: 600; color: ${style.color};">
+                        ${riskLevel.level.toUpperCase()} Risk (Score: ${result.risk_assessment.risk_score})
+                    </span>
+                    <span style="margin-left: 10px; color: var(--text-light); font-size: 0.9rem;">
+                        Source: ${result.nutrition.source}
+                    </span>
+                </div>
+                
+                ${Object.keys(result.risk_assessment.risk_factors).length > 0 ? `
+                    <div style="margin: 15px 0; padding: 15px; background: var(--bg); border-radius: 4px;">
+                        <strong style="color: var(--primary-dark);">Risk Factors:</strong> 
+                        <ul style="margin-top: 8px; list-style-type: disc; padding-left: 20px;">
+                            ${Object.entries(result.risk_assessment.risk_factors).map(([factor, level]) => 
+                                `<li style="margin-bottom: 5px;">${factor}: <span style="font-weight: 600;">${level}</span></li>`
+                            ).join('')}
+                        </ul>
+                    </div>
+                ` : ''}
+                
+                ${result.risk_assessment.alternatives.length > 0 ? `
+                    <div class="alternatives" style="margin: 20px 0 10px; padding: 15px; background: rgba(42, 157, 143, 0.1); border-radius: 4px; border-left: 4px solid var(--success);">
+                        <h4 style="color: var(--success); font-weight: 600; margin-bottom: 10px;">
+                            🌱 Healthier Alternatives:
+                        </h4>
+                        <div class="alternatives-list" style="display: flex; flex-wrap: wrap; gap: 8px;">
+                            ${result.risk_assessment.alternatives.map(alt => `
+                                <span class="alternative-item" style="padding: 6px 12px; background: white; border-radius: 4px; border: 1px solid var(--success); color: var(--success); font-size: 0.9rem;">
+                                    ${alt}
+                                </span>
+                            `).join('')}
+                        </div>
                     </div>
-                    <p style="color: var(--text-light); margin-top: 10px;">
-                        ❌ ${result.error || 'Nutrition data not found for this food item.'}
-                    </p>
+                ` : ''}
+            </div>
+        `;
+    } else {
+        return `
+            <div class="food-result" style="margin-bottom: 25px; padding: 20px; background: white; border-radius: 4px; border: 1px solid var(--border); box-shadow: var(--shadow);">
+                <div class="food-name" style="font-size: 1.3rem; font-weight: 600; color: var(--danger);">
+                    ${result.food_name}
                 </div>
-            `;
-        }
-    });
-            
-    // Add summary
-    const foundResults = results.filter(r => r.nutrition);
-    const riskyFoods = foundResults.filter(r => r.risk_assessment && r.risk_assessment.is_risky);
-    const safeFoods = foundResults.filter(r => r.risk_assessment && !r.risk_assessment.is_risky);
-            
-    html += `
+                <p style="color: var(--text-light); margin-top: 10px;">
+                    ❌ ${result.error || 'Nutrition data not found for this food item.'}
+                </p>
+            </div>
+        `;
+    }
+}
+
+function renderFoodSummary(found, risky, safe) {
+    return `
         <div style="margin-top: 30px; padding: 20px; background: var(--bg); border-radius: 4px; border: 1px solid var(--border);">
             <h4 style="color: var(--primary-dark); font-weight: 600; margin-bottom: 15px; text-align: center;">
                 📊 Summary
             </h4>
             <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(150px, 1fr)); gap: 15px; text-align: center;">
                 <div>
-                    <div style="font-size: 1.5rem; font-weight: bold; color: var(--primary);">${foundResults.length}</div>
+                    <div style="font-size: 1.5rem; font-weight: bold; color: var(--primary);">${found}</div>
                     <div style="color: var(--text-light);">Total foods</div>
                 </div>
                 <div>
-                    <div style="font-size: 1.5rem; font-weight: bold; color: var(--danger);">${riskyFoods.length}</div>
+                    <div style="font-size: 1.5rem; font-weight: bold; color: var(--danger);">${risky}</div>
                     <div style="color: var(--text-light);">Risky foods</div>
                 </div>
                 <div>
-                    <div style="font-size: 1.5rem; font-weight: bold; color: var(--success);">${safeFoods.length}</div>
+                    <div style="font-size: 1.5rem; font-weight: bold; color: var(--success);">${safe}</div>
                     <div style="color: var(--text-light);">Safe foods</div>
                 </div>
             </div>
         </div>
     `;
-            
-    html += '</div>';
-    resultsContainer.innerHTML = html;
 }
+
 function getRiskLevel(riskScore) {
     if (riskScore === 0) return { level: 'low', class: 'risk-low' };
     if (riskScore < 3) return { level: 'medium', class: 'risk-medium' };